@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the startup time of a show with a large media config.
+
+A media config of 5000 cues with merge keys is written, and loaded with
+the pure Python YAML loader, with the libyaml one, compiled with no
+snapshot and loaded from its snapshot. Startup is the time to load the
+media config and build the playlist of a provider with no player, parsing
+it with the pure Python loader as before, compiling it and from its
+snapshot.
+
+    python benchmarks/bench_config_load.py --cues 5000
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from dmx_trigger.media_config import load_media_config
+from dmx_trigger.provider import provider_from_config
+
+# scenes per theme
+SCENES = 250
+
+
+def write_show(directory, cues, files):
+    """Write a media config of cues entries using files unique files.
+
+    :param str directory: where to create the media config and the files
+    :param int cues: number of cues
+    :param int files: number of unique files
+    :rtype str
+    """
+    media = os.path.join(directory, "media")
+    os.makedirs(media, exist_ok=True)
+    for i in range(files):
+        open(os.path.join(media, "{:05d}-clip.mkv".format(i)), "w").close()
+    lines = ["---", "backend: none", "", "dirs:",
+        "  dirl: &dirl", "    dir: {}".format(media), "    playmode: 'loop'",
+        "  dird: &dird", "    dir: {}".format(media), "", "playlist:"]
+    for theme in range((cues + SCENES - 1) // SCENES):
+        lines.append("  {}:".format(theme))
+        lines.append("    <<: *{}".format("dirl" if theme % 2 else "dird"))
+        lines.append("    name: 'Theme {}'".format(theme))
+        lines.append("    files:")
+        for scene in range(min(SCENES, cues - theme * SCENES)):
+            lines.append("      - {:05d}-clip.mkv".format((theme * SCENES + scene) % files))
+    filename = os.path.join(directory, "media_list.yaml")
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return filename
+
+
+def timed(func, repeat):
+    """Median time of func in ms."""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the startup time of a large media config.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--cues", type=int, default=5000,
+            help="number of cues of the show")
+    parser.add_argument("--files", type=int, default=500,
+            help="number of unique media files")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+            help="runs of every measure")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = write_show(directory, args.cues, args.files)
+        cache_dir = os.path.join(directory, "cache")
+        with open(filename, "rb") as f:
+            data = f.read()
+        results = [("yaml SafeLoader", timed(lambda: yaml.load(data, Loader=yaml.SafeLoader), args.repeat))]
+        if hasattr(yaml, "CSafeLoader"):
+            results.append(("yaml CSafeLoader", timed(lambda: yaml.load(data, Loader=yaml.CSafeLoader), args.repeat)))
+        results.append(("compile, no snapshot", timed(lambda: load_media_config(filename, cache_dir=None), args.repeat)))
+        load_media_config(filename, cache_dir=cache_dir)
+        results.append(("snapshot", timed(lambda: load_media_config(filename, cache_dir=cache_dir), args.repeat)))
+
+        def startup(cache_dir):
+            provider_from_config(load_media_config(filename, cache_dir=cache_dir)).close()
+
+        def startup_yaml():
+            # parse with the pure Python loader, no compilation nor snapshot
+            with open(filename) as f:
+                provider_from_config(yaml.load(f, Loader=yaml.SafeLoader)).close()
+        results.append(("startup, SafeLoader", timed(startup_yaml, args.repeat)))
+        results.append(("startup, no snapshot", timed(lambda: startup(None), args.repeat)))
+        results.append(("startup, snapshot", timed(lambda: startup(cache_dir), args.repeat)))
+
+    print("media config of {} cues, {} unique files".format(args.cues, args.files))
+    for name, ms in results:
+        print("{:<24} {:>10.1f} ms".format(name, ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cue switch latency of every player backend.
+
+Cue frames are fed to a monitor driving a provider of each backend, with a
+LatencyTracker stamping the frames. For every cue we wait for the backend
+to report the first frame, and print the percentiles of the time from the
+frame to the player call and to the playing and first frame events.
+
+On headless machines the none backend, the vlc stand-in and the mpv
+stand-in are used:
+    python benchmarks/bench_cue_switch.py -n 500
+On the target machine, with the real players and a media config:
+    python benchmarks/bench_cue_switch.py --real --media ~/.config/media_list.yaml
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BACKENDS = ["none", "vlc", "mpv"]
+STAGES = ("player_call", "playing", "vout")
+
+
+def measure(media_config, cues, count, timeout):
+    """Switch count cues and return the latency percentiles by stage.
+
+    :param dict media_config: media config selecting the backend
+    :param list cues: (theme, scene) cues to cycle through
+    :param int count: number of cue switches
+    :param float timeout: seconds to wait for the first frame of a cue
+    :rtype dict
+    """
+    from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+    from dmx_trigger.latency import LatencyTracker
+    from dmx_trigger.provider import provider_from_config
+
+    tracker = LatencyTracker(interval=0)
+    provider = provider_from_config(media_config, latency=tracker)
+    monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False, latency=tracker)
+    vout = tracker.histograms["vout"]
+    frame = bytearray(512)
+    frame[CHANNEL['RELEASE']] = 255
+    try:
+        for i in range(count):
+            frame[CHANNEL['THEME']], frame[CHANNEL['SCENE']] = cues[i % len(cues)]
+            shown = vout.count
+            monitor.newdata(frame)
+            deadline = time.monotonic() + timeout
+            while vout.count == shown and time.monotonic() < deadline:
+                time.sleep(0.0002)
+    finally:
+        provider.close()
+    percentiles = tracker.percentiles()
+    return {stage: percentiles[stage] for stage in STAGES}
+
+
+def synthetic_config(directory, size, backend, mpv_binary, load_ms):
+    """Media config of synthetic cues for the stand-in players."""
+    from run_suite import media_config
+
+    config = media_config(directory, size, preload=True)
+    config["backend"] = backend
+    config["mpv"] = {
+        "binary": mpv_binary,
+        "socket": os.path.join(directory, "mpv.sock"),
+        "flags": ["--fake-load-ms={}".format(load_ms)],
+    }
+    return config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the cue switch latency of every player backend.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--cues", type=int, default=500,
+            help="number of cue switches per backend")
+    parser.add_argument("-b", "--backend", action="append", choices=BACKENDS,
+            help="backend to measure, all by default")
+    parser.add_argument("--real", action="store_true",
+            help="use the real players instead of the stand-ins")
+    parser.add_argument("--media",
+            help="media config to use with --real")
+    parser.add_argument("--timeout", type=float, default=2.0,
+            help="seconds to wait for the first frame of a cue")
+    parser.add_argument("--load-ms", type=float, default=0.0,
+            help="first frame delay of the mpv stand-in")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    if args.real and not args.media:
+        sys.exit("--real needs --media")
+    if not args.real:
+        # stand-ins first, so that they are used even if the real modules exist
+        sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+    sys.path.insert(1, os.path.join(BENCH_DIR, ".."))
+    sys.path.insert(2, BENCH_DIR)
+    from dmx_trigger.media_config import load_media_config
+
+    print("{:<6} {:<12} {:>9} {:>9} {:>9} {:>9} {:>7}".format(
+        "player", "stage", "p50 ms", "p90 ms", "p99 ms", "max ms", "count"))
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backend or BACKENDS:
+            if args.real:
+                config = load_media_config(os.path.expanduser(args.media))
+                config["backend"] = backend
+            else:
+                config = synthetic_config(directory, 64, backend,
+                    os.path.join(BENCH_DIR, "fakes", "mpv.py"), args.load_ms)
+            cues = [(int(theme), scene) for theme in config["playlist"]
+                for scene in range(len(config["playlist"][theme]["files"]))]
+            try:
+                result = measure(config, cues, args.cues, args.timeout)
+            except Exception as e:
+                print("{:<6} unavailable: {}".format(backend, e))
+                continue
+            for stage, values in result.items():
+                print("{:<6} {:<12} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>7}".format(
+                    backend, stage, values["p50"], values["p90"], values["p99"], values["max"], values["count"]))
+
+
+if __name__ == "__main__":
+    main()
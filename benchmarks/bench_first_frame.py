@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure DMX to first frame latency with and without media preloading.
+
+It needs a working libvlc and a display, so it has to be run on the target
+machine with the real media config:
+    python benchmarks/bench_first_frame.py --media ~/.config/media_list.yaml
+
+For every cue in the playlist we send a DMX frame selecting it with release
+up, and time how long it takes until libvlc reports the video output.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import vlc
+
+from dmx_trigger.config import load_config
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+from dmx_trigger.video_provider import VLCVideoProviderDir
+
+
+def measure(media_config, cues, timeout):
+    """Return the DMX to first frame latencies in ms for each cue."""
+    provider = VLCVideoProviderDir(media_config=media_config)
+    monitor = DMX512Monitor(1, DMX_CALLBACK, provider)
+    vout = threading.Event()
+    events = provider.vlc["player"].event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerVout, lambda event: vout.set())
+
+    latencies = []
+    frame = bytearray(512)
+    for theme, scene in cues:
+        # drop release so that the next frame triggers the cue
+        frame[CHANNEL['RELEASE']] = 0
+        monitor.newdata(frame)
+        vout.clear()
+        frame[CHANNEL['THEME']] = theme
+        frame[CHANNEL['SCENE']] = scene
+        frame[CHANNEL['RELEASE']] = 255
+        start = time.monotonic()
+        monitor.newdata(frame)
+        if vout.wait(timeout):
+            latencies.append((time.monotonic() - start) * 1000)
+        # let it play a little
+        time.sleep(0.5)
+    provider.vlc["player"].stop()
+    return latencies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark DMX to first frame latency.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--media", dest="media_file",
+            help="the media config file",
+            default=(os.environ.get("DMX_TRIGGER_MEDIA") or
+            "~/.config/media_list.yaml"))
+    parser.add_argument("-c", "--cues", type=int, default=20,
+            help="maximum number of cues to play")
+    parser.add_argument("-t", "--timeout", type=float, default=5.0,
+            help="seconds to wait for the first frame")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    media_file = os.path.abspath(os.path.expanduser(args.media_file))
+    for preload in (False, True):
+        media_config = load_config(media_file)
+        media_config["vlc"]["preload"] = preload
+        playlist = media_config["playlist"]
+        cues = [(p, idx) for p in playlist for idx in range(len(playlist[p]["files"]))
+            if p < 256 and idx < 256][:args.cues]
+        latencies = measure(media_config, cues, args.timeout)
+        if latencies:
+            print("preload={}: {} cues, median {:.1f} ms, max {:.1f} ms".format(
+                preload, len(latencies), statistics.median(latencies), max(latencies)))
+        else:
+            print("preload={}: no video output".format(preload))
+
+
+if __name__ == "__main__":
+    main()
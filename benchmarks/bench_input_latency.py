@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure end to end latency of the DMX inputs.
+
+A local packet generator sends frames changing the theme channel and we time
+how long it takes until the video provider callback is called:
+    python benchmarks/bench_input_latency.py -n 1000
+    python benchmarks/bench_input_latency.py -n 1000 --ola
+
+The OLA path needs a running olad and the OLA python bindings.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import os
+import socket
+import statistics
+import struct
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dmx_trigger.dmx_input import (OLAInput, SACNInput, ArtNetInput, SACN_ACN_ID,
+    SACN_VECTOR_ROOT_DATA, SACN_VECTOR_FRAMING_DATA, ARTNET_ID, ARTNET_OP_DMX)
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK
+
+CID = uuid.uuid4().bytes
+
+
+def sacn_packet(universe, sequence, data):
+    """Build an E1.31 data packet."""
+    count = len(data) + 1
+    return (struct.pack("!HH12sHI16s", 0x0010, 0, SACN_ACN_ID, 0x7000 | (110 + count),
+            SACN_VECTOR_ROOT_DATA, CID) +
+        struct.pack("!HI64sBHBBH", 0x7000 | (88 + count), SACN_VECTOR_FRAMING_DATA,
+            b"bench", 100, 0, sequence, 0, universe) +
+        struct.pack("!HBBHHHB", 0x7000 | (11 + count), 0x02, 0xa1, 0, 1, count, 0) +
+        bytes(data))
+
+
+def artnet_packet(universe, sequence, data):
+    """Build an Art-Net OpDmx packet."""
+    return (ARTNET_ID + struct.pack("<H", ARTNET_OP_DMX) +
+        struct.pack("!HBBBBH", 14, sequence, 0, universe & 0xff, universe >> 8, len(data)) +
+        bytes(data))
+
+
+class Probe(object):
+    """Video provider that signals when the theme changes."""
+    def __init__(self):
+        self.changed = threading.Event()
+
+    def set_theme(self, n, current=None):
+        self.changed.set()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: True
+
+
+def measure(dmx_input, send, n):
+    """Return the latencies in us of n frames sent with send."""
+    probe = Probe()
+    monitor = DMX512Monitor(1, DMX_CALLBACK, probe, control_thread=False, dmx_input=dmx_input)
+    thread = threading.Thread(target=monitor.run, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    latencies = []
+    data = bytearray(512)
+    for i in range(n):
+        data[0] = i % 255 + 1
+        probe.changed.clear()
+        start = time.perf_counter()
+        send(i, data)
+        if probe.changed.wait(1):
+            latencies.append((time.perf_counter() - start) * 1e6)
+    dmx_input.stop()
+    thread.join(2)
+    return latencies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark DMX input end to end latency.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--frames", type=int, default=1000,
+            help="number of frames to send")
+    parser.add_argument("-u", "--universe", type=int, default=1,
+            help="universe number")
+    parser.add_argument("--ola", action="store_true",
+            help="measure the OLA path too, needs olad")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    u = args.universe
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    inputs = [
+        ("sacn", SACNInput(u),
+            lambda i, data: sock.sendto(sacn_packet(u, i % 256, data), ("127.0.0.1", SACNInput.port))),
+        ("artnet", ArtNetInput(u),
+            lambda i, data: sock.sendto(artnet_packet(u, i % 255 + 1, data), ("127.0.0.1", ArtNetInput.port))),
+    ]
+    if args.ola:
+        from ola.ClientWrapper import ClientWrapper
+        import array
+        sender = ClientWrapper().Client()
+        inputs.append(("ola", OLAInput(u),
+            lambda i, data: sender.SendDmx(u, array.array("B", data))))
+    for name, dmx_input, send in inputs:
+        latencies = measure(dmx_input, send, args.frames)
+        if latencies:
+            print("{:<8} {} frames, median {:.1f} us, p99 {:.1f} us".format(name, len(latencies),
+                statistics.median(latencies), sorted(latencies)[int(len(latencies)*0.99)]))
+        else:
+            print("{:<8} no frames received".format(name))
+
+
+if __name__ == "__main__":
+    main()
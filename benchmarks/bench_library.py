@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the startup and update times of a large media library.
+
+A folder tree of numbered files is created, one folder per theme. We
+measure how long the provider takes to be ready and the library to be
+scanned, compared with the same cues listed in a media config, and how
+long a new or removed file takes to be applied.
+
+    python benchmarks/bench_library.py --files 20000
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from dmx_trigger.media_config import compile_media_config
+from dmx_trigger.provider import provider_from_config
+
+SCENES = 250
+
+
+def create_library(directory, files):
+    """Create files numbered files in theme folders, with some extra files.
+
+    :rtype dict
+    """
+    playlist = {}
+    for i in range(files):
+        theme, scene = divmod(i, SCENES)
+        folder = os.path.join(directory, "{:03d}-theme".format(theme))
+        if scene == 0:
+            os.makedirs(folder)
+            # files that do not give a cue are skipped
+            open(os.path.join(folder, "notes.txt"), "w").close()
+        name = "{:03d}-clip.mkv".format(scene)
+        open(os.path.join(folder, name), "w").close()
+        playlist.setdefault(theme, {"dir": folder, "files": []})["files"].append(name)
+    return playlist
+
+
+def wait(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("timeout")
+        time.sleep(0.0005)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the startup and update times of a media library.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--files", type=int, default=20000,
+            help="number of files in the library")
+    parser.add_argument("-u", "--updates", type=int, default=50,
+            help="number of files added and removed")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        playlist = create_library(directory, args.files)
+
+        start = time.perf_counter()
+        config = compile_media_config({"backend": "none", "playlist": playlist})
+        provider = provider_from_config(config)
+        listed = (time.perf_counter() - start) * 1000
+        provider.close()
+
+        start = time.perf_counter()
+        provider = provider_from_config({"backend": "none", "library": {"dir": directory}})
+        ready = (time.perf_counter() - start) * 1000
+        provider._library.scanned.wait()
+        scanned = (time.perf_counter() - start) * 1000
+        cues = len(provider._vlclist)
+
+        folder = os.path.join(directory, "000-theme")
+        added, removed = [], []
+        for i in range(args.updates):
+            path = os.path.join(folder, "{:03d}-a-new.mkv".format(i % SCENES))
+            cue = (0, i % SCENES)
+            entries = provider._vlclist
+            start = time.perf_counter()
+            open(path, "w").close()
+            wait(lambda: entries[cue].file == path)
+            added.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            os.remove(path)
+            wait(lambda: entries[cue].file != path)
+            removed.append((time.perf_counter() - start) * 1000)
+        provider.close()
+
+    print("library of {} files, {} cues".format(args.files, cues))
+    print("{:<28} {:>10.1f} ms".format("listed in the media config", listed))
+    print("{:<28} {:>10.1f} ms".format("library, provider ready", ready))
+    print("{:<28} {:>10.1f} ms".format("library, scanned", scanned))
+    print("{:<28} {:>10.2f} ms".format("file added, median", statistics.median(added)))
+    print("{:<28} {:>10.2f} ms".format("file removed, median", statistics.median(removed)))
+
+
+if __name__ == "__main__":
+    main()
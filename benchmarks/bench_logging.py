@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the logging overhead per DMX frame.
+
+Cue frames are fed to a monitor driving the video provider (on the vlc
+stand-in), which logs at INFO and DEBUG level on every frame. The time
+spent by the caller is compared with logging disabled, with the former
+multiprocessing.Queue handler and with the in-process ring buffer. The
+cost of a disabled call with eager str.format and with lazy arguments is
+measured too.
+
+    python benchmarks/bench_logging.py -n 20000
+    python benchmarks/bench_logging.py -n 2000 --fps 44
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+sys.path.insert(1, os.path.join(BENCH_DIR, ".."))
+
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+from dmx_trigger.utils.queue_listener_handler import QueueListenerHandler, RingBufferQueue
+from dmx_trigger.video_provider import VLCVideoProviderDir
+from run_suite import media_config
+
+
+def cue_frames(count=100):
+    frames = []
+    for i in range(count):
+        frame = bytearray(8)
+        frame[CHANNEL['SCENE']] = i
+        frame[CHANNEL['RELEASE']] = 255
+        frames.append(bytes(frame))
+    return frames
+
+
+def configure(queue):
+    """Route the dmx_trigger loggers through a queue handler, or disable them.
+
+    :param object queue: the handler queue, None disables logging
+    :rtype QueueListenerHandler
+    """
+    logger = logging.getLogger("dmx_trigger")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.propagate = False
+    if queue is None:
+        logger.setLevel(logging.WARNING)
+        return None
+    target = logging.StreamHandler(open(os.devnull, "w"))
+    target.setFormatter(logging.Formatter("%(asctime)s %(name)s: %(levelname)s: %(message)s"))
+    handler = QueueListenerHandler([target], queue=queue)
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    return handler
+
+
+def bench(provider, frames, n, fps=0):
+    """Feed n frames and return the caller time per frame in us.
+
+    With fps, frames are paced like a DMX source and only the time spent in
+    newdata is accounted, otherwise they are fed as fast as possible.
+    """
+    monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False)
+    count = len(frames)
+    spent = 0.0
+    for i in range(n):
+        start = time.perf_counter()
+        monitor.newdata(frames[i % count])
+        spent += time.perf_counter() - start
+        if fps:
+            time.sleep(1.0 / fps)
+    return spent * 1e6 / n
+
+
+def bench_disabled_call(n):
+    """Cost in ns of a disabled debug call, eager and lazy."""
+    setup = "import logging; logger = logging.getLogger('bench'); logger.setLevel(logging.INFO); a, b = 3, 4"
+    eager = timeit.timeit('logger.debug("Media play requested: {}.{}".format(a, b))', setup, number=n)
+    lazy = timeit.timeit('logger.debug("Media play requested: %s.%s", a, b)', setup, number=n)
+    return eager * 1e9 / n, lazy * 1e9 / n
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the logging overhead per DMX frame.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--frames", type=int, default=20000,
+            help="number of frames to feed")
+    parser.add_argument("--fps", type=int, default=0,
+            help="pace frames at this rate, 0 feeds them as fast as possible")
+    parser.add_argument("--maxsize", type=int, default=10000,
+            help="log queue size")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    frames = cue_frames()
+    with tempfile.TemporaryDirectory() as directory:
+        provider = VLCVideoProviderDir(media_config=media_config(directory, len(frames), preload=True))
+        queues = [
+            ("disabled", lambda: None),
+            ("multiprocessing.Queue", lambda: multiprocessing.Queue(-1)),
+            ("RingBufferQueue", lambda: RingBufferQueue(args.maxsize)),
+        ]
+        print("{:<24} {:>12} {:>10}".format("handler", "us/frame", "dropped"))
+        for name, factory in queues:
+            handler = configure(factory())
+            cost = bench(provider, frames, args.frames, args.fps)
+            dropped = handler.dropped if handler else 0
+            if handler:
+                handler.stop()
+            print("{:<24} {:>12.2f} {:>10}".format(name, cost, dropped))
+        configure(None)
+
+    eager, lazy = bench_disabled_call(args.frames * 10)
+    print("disabled debug call: str.format {:.0f} ns, lazy {:.0f} ns".format(eager, lazy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure memory use and lookup time of the media index.
+
+A synthetic playlist is built with many cues sharing a smaller set of files,
+as in a real show, and stored both as the former dict of dicts keyed by
+(theme, scene) and as a MediaIndex:
+    python benchmarks/bench_media_index.py -c 10000 -f 500
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dmx_trigger.media_index import MediaIndex
+
+
+def synthetic_playlist(cues, files):
+    """Return a list of (theme, scene, file, playmode) tuples."""
+    playlist = []
+    for pos in range(cues):
+        theme, scene = divmod(pos, 40)
+        # build a new string each time, as yaml loading does
+        file = "/home/pi/Videos/videos_ball-2021/{:03d}-some_long_clip_name-600s.mkv".format(pos % files)
+        playlist.append((theme, scene, file, "loop" if pos % 3 else "default"))
+    return playlist
+
+
+def build_dict(playlist):
+    vlclist = {}
+    for pos, (theme, scene, file, playmode) in enumerate(playlist):
+        vlclist[theme, scene] = {"file": file, "playmode": playmode, "pos": pos}
+    return vlclist
+
+
+def build_index(playlist):
+    vlclist = MediaIndex()
+    for theme, scene, file, playmode in playlist:
+        vlclist.add(theme, scene, file, playmode)
+    return vlclist
+
+
+def measure_memory(build, playlist):
+    """Return the memory used by the built index in KiB."""
+    tracemalloc.start()
+    vlclist = build(playlist)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / 1024, vlclist
+
+
+def measure_lookup(vlclist, cues, n):
+    """Return the mean time of a lookup in ns."""
+    start = time.perf_counter()
+    for cue in cues[:n]:
+        vlclist[cue]
+    return (time.perf_counter() - start) * 1e9 / n
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark media index memory and lookup time.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-c", "--cues", type=int, default=10000,
+            help="number of cues in the playlist (max 65536)")
+    parser.add_argument("-f", "--files", type=int, default=500,
+            help="number of unique files")
+    parser.add_argument("-n", "--lookups", type=int, default=1000000,
+            help="number of lookups")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    playlist = synthetic_playlist(args.cues, args.files)
+    keys = [(theme, scene) for theme, scene, file, playmode in playlist]
+    cues = [random.choice(keys) for i in range(args.lookups)]
+    print("{:<10} {:>12} {:>12}".format("index", "memory KiB", "lookup ns"))
+    for name, build in (("dict", build_dict), ("MediaIndex", build_index)):
+        memory, vlclist = measure_memory(build, playlist)
+        lookup = measure_lookup(vlclist, cues, args.lookups)
+        print("{:<10} {:>12.1f} {:>12.1f}".format(name, memory, lookup))
+
+
+if __name__ == "__main__":
+    main()
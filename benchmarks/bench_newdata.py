@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the CPU cost per frame of DMX512Monitor.newdata.
+
+olad pushes full 512 slot frames about 44 times a second, most of them
+identical to the previous one. We compare the former per channel loop with
+the current byte frame implementation for unchanged and changed frames.
+
+Run it on the target machine (a Raspberry Pi) to get meaningful numbers:
+    python benchmarks/bench_newdata.py -n 100000
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import array
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK
+
+
+class NullProvider(object):
+    """Video provider that accepts every callback and does nothing."""
+    def __getattr__(self, name):
+        return self._noop
+
+    def _noop(self, *args, **kwargs):
+        return True
+
+
+class LegacyMonitor(object):
+    """Reference implementation: per channel loop over a list of ints."""
+    def __init__(self, universe, dmx_cb, video_provider):
+        self.dmx_cb = dmx_cb
+        self.video_provider = video_provider
+        self.dmx_channel = [None]*512
+
+    def newdata(self, data):
+        changed = False
+        for c in self.dmx_cb:
+            idx, func = c
+            try:
+                if data[idx] != self.dmx_channel[idx]:
+                    changed = True
+                    getattr(self.video_provider, func)(data[idx], current=self.dmx_channel[idx])
+                    self.dmx_channel[idx] = data[idx]
+            except IndexError:
+                break
+        if changed:
+            self.video_provider.exec_pending()
+
+
+def bench(monitor, frames, n):
+    """Feed n frames cycling over frames and return the cost per frame in us."""
+    count = len(frames)
+    start = time.process_time()
+    for i in range(n):
+        monitor.newdata(frames[i % count])
+    return (time.process_time() - start) * 1e6 / n
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark DMX512Monitor.newdata CPU cost per frame.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--frames", type=int, default=200000,
+            help="number of frames to feed")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    provider = NullProvider()
+    # olad delivers an array('B') with the whole universe
+    base = array.array("B", [0]*512)
+    other = array.array("B", [0]*512)
+    other[0] = 1
+    other[3] = 10
+    scenarios = [
+        ("unchanged frame", [base]),
+        ("unmonitored change", [base, array.array("B", [0]*100 + [255] + [0]*411)]),
+        ("monitored change", [base, other]),
+    ]
+    print("{:<20} {:>12} {:>12}".format("scenario", "legacy us", "current us"))
+    for name, frames in scenarios:
+        legacy = bench(LegacyMonitor(1, DMX_CALLBACK, provider), frames, args.frames)
+        current = bench(DMX512Monitor(1, DMX_CALLBACK, provider), frames, args.frames)
+        print("{:<20} {:>12.3f} {:>12.3f}".format(name, legacy, current))
+
+
+if __name__ == "__main__":
+    main()
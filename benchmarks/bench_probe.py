@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure a cold probe of the media files, without a probe cache.
+
+libvlc parses media on its preparser threads, one unless the instance is
+created with --preparse-threads, however many threads ask for the parse.
+The vlc stand-in in benchmarks/fakes models that: each parse takes
+--parse-ms on one of the preparser threads. The numbers show how a probe
+scales with the workers, not how long a real file takes to be parsed.
+
+    python benchmarks/bench_probe.py --files 200 --parse-ms 20
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+
+import vlc
+
+from dmx_trigger.media_probe import MediaProbe
+
+
+def cold_probe(files, workers, preparse_threads):
+    """Return the ms taken to probe files without a cache."""
+    instance = vlc.Instance(["--preparse-threads={}".format(preparse_threads)])
+    probe = MediaProbe(instance, workers=workers)
+    start = time.perf_counter()
+    probe.probe(files)
+    return (time.perf_counter() - start) * 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark a cold probe of the media files.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-f", "--files", type=int, default=200,
+            help="number of files")
+    parser.add_argument("--parse-ms", type=float, default=20.0,
+            help="ms a parse takes on a preparser thread")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 4, 8],
+            help="probe workers")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    vlc.parse_ms = args.parse_ms
+    with tempfile.TemporaryDirectory() as directory:
+        files = []
+        for i in range(args.files):
+            files.append(os.path.join(directory, "{:03d}-clip.mkv".format(i)))
+            open(files[-1], "w").close()
+        print("cold probe of {} files, {:.0f} ms a parse".format(args.files, args.parse_ms))
+        print("{:>8} {:>20} {:>20}".format("workers", "1 preparser ms", "workers preparsers ms"))
+        for workers in args.workers:
+            print("{:>8} {:>20.0f} {:>20.0f}".format(workers, cold_probe(files, workers, 1),
+                cold_probe(files, workers, workers)))
+
+
+if __name__ == "__main__":
+    main()
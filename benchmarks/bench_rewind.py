@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare rewind latency seeking in place and reloading the media.
+
+It needs a working libvlc and a display, so it has to be run on the target
+machine with long files like the 600s/1200s ones in the media config:
+    python benchmarks/bench_rewind.py --media ~/.config/media_list.yaml 122.0
+
+Every cue is played, moved to its middle and then rewound, timing how long
+it takes until the player reports a time near zero.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dmx_trigger.config import load_config
+from dmx_trigger.video_provider import VLCVideoProviderDir
+
+# time threshold in ms to consider the media rewound
+REWOUND_MS = 1000
+
+
+def wait_time(player, test, timeout):
+    """Poll the player time until test is true, return False on timeout."""
+    limit = time.monotonic() + timeout
+    while time.monotonic() < limit:
+        if test(player.get_time()):
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def measure(provider, cue, rewind, repeat, timeout):
+    """Return the rewind latencies in ms for cue using the rewind function."""
+    provider.requested_theme, provider.requested_scene = cue
+    provider._play()
+    player = provider.vlc["player"]
+    latencies = []
+    for i in range(repeat):
+        wait_time(player, lambda t: t > 0, timeout)
+        player.set_position(0.5)
+        wait_time(player, lambda t: t > REWOUND_MS * 2, timeout)
+        provider._rewind = True
+        start = time.monotonic()
+        rewind()
+        # the player may be replaced, take it again
+        player = provider.vlc["player"]
+        if wait_time(player, lambda t: 0 <= t < REWOUND_MS, timeout):
+            latencies.append((time.monotonic() - start) * 1000)
+    return latencies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark rewind latency, seek vs reload.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--media", dest="media_file",
+            help="the media config file",
+            default=(os.environ.get("DMX_TRIGGER_MEDIA") or
+            "~/.config/media_list.yaml"))
+    parser.add_argument("-r", "--repeat", type=int, default=10,
+            help="rewinds per cue and path")
+    parser.add_argument("-t", "--timeout", type=float, default=5.0,
+            help="seconds to wait for the player")
+    parser.add_argument("cues", nargs="+",
+            help="cues to test as theme.scene")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    media_file = os.path.abspath(os.path.expanduser(args.media_file))
+    provider = VLCVideoProviderDir(media_config=load_config(media_file))
+    for c in args.cues:
+        cue = tuple(int(n) for n in c.split("."))
+        for name, rewind in (("seek", provider._rewind_media), ("reload", provider._play)):
+            latencies = measure(provider, cue, rewind, args.repeat, args.timeout)
+            if latencies:
+                print("{} {}: median {:.1f} ms, max {:.1f} ms".format(
+                    c, name, statistics.median(latencies), max(latencies)))
+            else:
+                print("{} {}: timed out".format(c, name))
+    provider.vlc["player"].stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the playback sync of several nodes on loopback.
+
+A leader and several follower processes with the none backend start the
+same cue, each one with its own simulated clock drift and start delay, and
+sync over multicast on 127.0.0.1. Every node samples its position, and the
+error of each follower is taken against the leader position at the same
+time. A follower without sync shows the drift that is corrected.
+
+    python benchmarks/bench_sync.py --duration 20
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import bisect
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+# name, drift in ppm, start delay in ms and whether it syncs
+FOLLOWERS = [
+    ("fast", 500, 30, True),
+    ("slow", -800, 0, True),
+    ("late", 0, 400, True),
+    ("unsynced", 500, 30, False),
+]
+# seconds between position samples
+SAMPLE_INTERVAL = 0.05
+
+
+def run_node(args):
+    """Play the cue at the start time and print the position samples."""
+    from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+    from dmx_trigger.media_config import compile_media_config
+    from dmx_trigger.provider import provider_from_config
+    from dmx_trigger.sync import sync_from_config
+
+    logging.disable(logging.WARNING)
+    config = compile_media_config({"backend": "none", "none": {"drift_ppm": args.drift_ppm},
+        "playlist": {0: {"dir": os.path.dirname(args.media), "files": [os.path.basename(args.media)]}}})
+    provider = provider_from_config(config)
+    monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False)
+    sync = None
+    if args.role != "none":
+        sync = sync_from_config({"enabled": True, "role": args.role, "port": args.port,
+            "interface": "127.0.0.1"}, provider)
+        sync.start()
+    frame = bytearray(512)
+    frame[CHANNEL['RELEASE']] = 255
+    time.sleep(max(0, args.start + args.delay_ms / 1000.0 - time.time()))
+    monitor.newdata(frame)
+    while time.time() < args.start + args.duration:
+        print(time.monotonic_ns(), provider._position(), flush=True)
+        time.sleep(SAMPLE_INTERVAL)
+    if sync:
+        sync.stop()
+        print("status", json.dumps(sync.status()), flush=True)
+    provider.close()
+
+
+def spawn(args, start, media, role, drift_ppm=0, delay_ms=0):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), "--node", role,
+        "--start", repr(start), "--duration", str(args.duration), "--port", str(args.port),
+        "--media", media, "--drift-ppm", str(drift_ppm), "--delay-ms", str(delay_ms)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+
+
+def collect(process):
+    """Return the position samples and sync status of a node.
+
+    :rtype tuple
+    """
+    out, _ = process.communicate()
+    samples, status = [], {}
+    for line in out.splitlines():
+        key, value = line.split(" ", 1)
+        if key == "status":
+            status = json.loads(value)
+        elif value != "None":
+            samples.append((int(key), float(value)))
+    return samples, status
+
+
+def errors(leader, samples, since):
+    """Error in ms of every sample taken after since, against the leader.
+
+    :rtype list
+    """
+    times = [t for t, _ in leader]
+    result = []
+    for t, position in samples:
+        i = bisect.bisect_left(times, t)
+        if t < since or i == 0 or i == len(times):
+            continue
+        (t0, p0), (t1, p1) = leader[i - 1], leader[i]
+        result.append(abs(position - (p0 + (p1 - p0) * (t - t0) / (t1 - t0))))
+    return sorted(result)
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the playback sync of several nodes on loopback.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-d", "--duration", type=float, default=20.0,
+            help="seconds played")
+    parser.add_argument("--port", type=int, default=5571 + os.getpid() % 1000,
+            help="sync UDP port")
+    parser.add_argument("--node", choices=["leader", "follower", "none"],
+            help=argparse.SUPPRESS)
+    parser.add_argument("--start", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--media", help=argparse.SUPPRESS)
+    parser.add_argument("--drift-ppm", type=float, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--delay-ms", type=float, default=0, help=argparse.SUPPRESS)
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    if args.node:
+        args.role = args.node
+        return run_node(args)
+    with tempfile.TemporaryDirectory() as directory:
+        media = os.path.join(directory, "000-clip.mkv")
+        open(media, "w").close()
+        # time for every node to start and join the group
+        start = time.time() + 1.0
+        leader = spawn(args, start, media, "leader")
+        followers = [(name, drift, delay, spawn(args, start, media, "follower" if synced else "none",
+            drift, delay)) for name, drift, delay, synced in FOLLOWERS]
+        leader_samples, _ = collect(leader)
+        results = [(name, drift, delay) + collect(process) for name, drift, delay, process in followers]
+
+    # the first seconds are taken to converge
+    since = leader_samples[0][0] + int(args.duration / 4 * 1e9)
+    print("{} s played, errors from {:.0f} s on".format(args.duration, args.duration / 4))
+    print("{:<9} {:>6} {:>6} {:>9} {:>9} {:>9} {:>9} {:>6} {:>6}".format(
+        "follower", "ppm", "delay", "no sync", "p50 ms", "p99 ms", "max ms", "seeks", "rates"))
+    for name, drift, delay, samples, status in results:
+        values = errors(leader_samples, samples, since)
+        print("{:<9} {:>6} {:>6} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>6} {:>6}".format(
+            name, drift, delay, delay + abs(drift) * args.duration / 1000.0,
+            percentile(values, 50), percentile(values, 99), values[-1] if values else float("nan"),
+            status.get("seeks", "-"), status.get("adjustments", "-")))
+
+
+if __name__ == "__main__":
+    main()
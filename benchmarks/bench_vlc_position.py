@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the error of the position the vlc backend reports for sync.
+
+libvlc get_time only changes every few hundred ms. The vlc stand-in in
+benchmarks/fakes keeps the exact media time and reports it the same way,
+in steps of --step-ms with a time changed event each. The position of the
+provider is sampled while playing, with a sync rate correction and a pause
+halfway, and compared with the exact time. Errors above the sync deadband
+make a follower hunt its rate or seek.
+
+    python benchmarks/bench_vlc_position.py --step-ms 250 --duration 10
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+
+import vlc
+
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+from dmx_trigger.media_config import compile_media_config
+from dmx_trigger.provider import provider_from_config
+from dmx_trigger.sync import DEFAULT_DEADBAND_MS
+
+# ms between position samples, at random
+SAMPLE_MS = (5, 25)
+PAUSE_MS = 300
+RATE_FACTOR = 1.03
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+def sample(provider, player, until, errors):
+    """Sample the reported and the raw position errors until a time."""
+    while time.monotonic() < until:
+        time.sleep(random.uniform(*SAMPLE_MS) / 1000.0)
+        exact = player.true_time()
+        errors["position"].append(abs(provider.sync_state()[2] - exact))
+        errors["get_time"].append(abs(player.get_time() - exact))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Benchmark the position error of the vlc backend.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-s", "--step-ms", type=float, default=250.0,
+            help="ms between get_time changes")
+    parser.add_argument("-d", "--duration", type=float, default=10.0,
+            help="seconds played")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    vlc.time_step_ms = args.step_ms
+    with tempfile.TemporaryDirectory() as directory:
+        open(os.path.join(directory, "000-clip.mkv"), "w").close()
+        config = compile_media_config({"backend": "vlc", "vlc": {"flags": [], "preload": True},
+            "playlist": {0: {"dir": directory, "files": ["000-clip.mkv"]}}})
+        provider = provider_from_config(config)
+        monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False)
+        frame = bytearray(512)
+        frame[CHANNEL['RELEASE']] = 255
+        monitor.newdata(frame)
+        player = provider.vlc["player"]
+        errors = {"position": [], "get_time": []}
+        start = time.monotonic()
+        sample(provider, player, start + args.duration / 2, errors)
+        provider.sync_correct(factor=RATE_FACTOR)
+        with provider._lock:
+            provider._set_pause(True)
+        time.sleep(PAUSE_MS / 1000.0)
+        with provider._lock:
+            provider._set_pause(False)
+        sample(provider, player, time.monotonic() + args.duration / 2, errors)
+        provider.close()
+
+    print("{} s played, get_time every {:.0f} ms, deadband {:.0f} ms".format(
+        args.duration, args.step_ms, DEFAULT_DEADBAND_MS))
+    print("{:<10} {:>9} {:>9} {:>9} {:>12}".format("source", "p50 ms", "p99 ms", "max ms", "> deadband"))
+    for name, values in errors.items():
+        values.sort()
+        over = sum(1 for value in values if value > DEFAULT_DEADBAND_MS) * 100.0 / len(values)
+        print("{:<10} {:>9.2f} {:>9.2f} {:>9.2f} {:>11.1f}%".format(
+            name, percentile(values, 50), percentile(values, 99), values[-1], over))
+
+
+if __name__ == "__main__":
+    main()
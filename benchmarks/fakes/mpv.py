@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Stand-in for the mpv binary to run the benchmarks on headless machines.
+
+It serves the JSON IPC on the --input-ipc-server socket, with only the
+commands used by dmx_trigger. Starting a playlist entry sends start-file at
+once and playback-restart after --fake-load-ms, as if the first frame was
+decoded.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+
+class FakeMPV(object):
+    def __init__(self, path, load_ms):
+        self._path = path
+        self._load = load_ms / 1000.0
+        self._lock = threading.Lock()
+        self._conn = None
+        self.playlist = []
+        self.observed = {}
+        self.props = {"pause": False, "eof-reached": False, "speed": 1.0, "loop-file": "no"}
+
+    def send(self, msg):
+        with self._lock:
+            self._conn.sendall(json.dumps(msg).encode() + b"\n")
+
+    def set_prop(self, name, value):
+        changed = self.props.get(name) != value
+        self.props[name] = value
+        if changed:
+            for observer, prop in self.observed.items():
+                if prop == name:
+                    self.send({"event": "property-change", "id": observer, "name": name, "data": value})
+
+    def restart(self):
+        time.sleep(self._load)
+        self.send({"event": "playback-restart"})
+
+    def command(self, args):
+        name = args[0]
+        if name == "observe_property":
+            self.observed[args[1]] = args[2]
+        elif name == "loadfile":
+            self.playlist.append(args[1])
+        elif name == "playlist-play-index":
+            if not 0 <= args[1] < len(self.playlist):
+                return "invalid parameter"
+            self.set_prop("eof-reached", False)
+            self.send({"event": "start-file", "playlist_entry_id": args[1] + 1})
+            threading.Thread(target=self.restart, daemon=True).start()
+        elif name == "seek":
+            self.set_prop("eof-reached", False)
+            threading.Thread(target=self.restart, daemon=True).start()
+        elif name == "set_property":
+            self.set_prop(args[1], args[2])
+        elif name == "quit":
+            return None
+        return "success"
+
+    def serve(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        server.bind(self._path)
+        server.listen(1)
+        self._conn, _ = server.accept()
+        for line in self._conn.makefile("rb"):
+            msg = json.loads(line)
+            error = self.command(msg["command"])
+            if error is None:
+                break
+            self.send({"error": error, "data": None})
+        self._conn.close()
+        server.close()
+        os.unlink(self._path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input-ipc-server", required=True)
+    parser.add_argument("--fake-load-ms", type=float, default=0.0)
+    args, _ = parser.parse_known_args()
+    FakeMPV(args.input_ipc_server, args.fake_load_ms).serve()
+
+
+if __name__ == "__main__":
+    main()
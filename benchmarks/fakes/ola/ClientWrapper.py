@@ -0,0 +1,48 @@
+# -*- coding: UTF-8 -*-
+"""
+Stand-in for ola.ClientWrapper.
+
+Run feeds the frames in ClientWrapper.frames to the registered callbacks, as
+fast as possible, and returns.
+"""
+
+import array
+
+
+class OlaClient(object):
+    REGISTER = 1
+    UNREGISTER = 0
+
+    def __init__(self):
+        self.universes = {}
+
+    def RegisterUniverse(self, universe, action, data_callback=None, callback=None):
+        self.universes[universe] = data_callback
+
+    def SendDmx(self, universe, data, callback=None):
+        if universe in self.universes:
+            self.universes[universe](array.array("B", data))
+
+
+class ClientWrapper(object):
+    # (universe, frame) tuples fed by Run
+    frames = []
+
+    def __init__(self):
+        self._client = OlaClient()
+        self._stop = False
+
+    def Client(self):
+        return self._client
+
+    def Run(self):
+        universes = self._client.universes
+        for universe, frame in self.frames:
+            if self._stop:
+                break
+            callback = universes.get(universe)
+            if callback:
+                callback(frame)
+
+    def Stop(self):
+        self._stop = True
@@ -0,0 +1,4 @@
+# -*- coding: UTF-8 -*-
+"""
+Stand-in for the OLA python bindings to run the benchmarks without olad.
+"""
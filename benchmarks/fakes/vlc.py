@@ -0,0 +1,327 @@
+# -*- coding: UTF-8 -*-
+"""
+Stand-in for python-vlc to run the benchmarks on headless machines.
+
+Only the API used by dmx_trigger is provided. Every call to a player, list
+player, media list or media is recorded in calls: name -> [count, last
+monotonic time].
+"""
+
+import threading
+import time
+
+calls = {}
+# ms a media parse takes on a preparser thread, 0 parses synchronously
+parse_ms = 0
+# ms between the time changes of a playing player, 0 keeps get_time at 0
+time_step_ms = 0
+
+
+def _record(name):
+    stats = calls.setdefault(name, [0, 0.0])
+    stats[0] += 1
+    stats[1] = time.monotonic()
+
+
+def reset():
+    calls.clear()
+
+
+class PlaybackMode(object):
+    default = 0
+    loop = 1
+    repeat = 2
+
+
+class MediaParseFlag(object):
+    local = 0
+    network = 1
+
+
+class MediaParsedStatus(object):
+    skipped = 1
+    failed = 2
+    timeout = 3
+    done = 4
+
+
+class TrackType(object):
+    unknown = -1
+    audio = 0
+    video = 1
+    ext = 2
+
+
+class State(object):
+    NothingSpecial = 0
+    Opening = 1
+    Buffering = 2
+    Playing = 3
+    Paused = 4
+    Stopped = 5
+    Ended = 6
+    Error = 7
+
+
+class EventType(object):
+    MediaParsedChanged = 3
+    MediaPlayerOpening = 258
+    MediaPlayerPlaying = 260
+    MediaPlayerPaused = 261
+    MediaPlayerStopped = 262
+    MediaPlayerEndReached = 265
+    MediaPlayerEncounteredError = 266
+    MediaPlayerTimeChanged = 267
+    MediaPlayerVout = 274
+
+
+class EventManager(object):
+    def __init__(self):
+        self._callbacks = {}
+
+    def event_attach(self, event_type, callback, *args, **kwargs):
+        self._callbacks.setdefault(event_type, []).append((callback, args, kwargs))
+        return 0
+
+    def event_detach(self, event_type):
+        self._callbacks.pop(event_type, None)
+
+    def send(self, event_type, event=None):
+        for callback, args, kwargs in self._callbacks.get(event_type, []):
+            callback(event, *args, **kwargs)
+
+
+class Event(object):
+    def __init__(self, **u):
+        self.u = type("EventUnion", (object,), u)
+
+
+class Media(object):
+    def __init__(self, mrl=None, *options, instance=None):
+        self.mrl = mrl
+        self.options = list(options)
+        self._events = EventManager()
+        self._parsed = 0
+        self._instance = instance
+
+    def add_option(self, option):
+        _record("media.add_option")
+        self.options.append(option)
+
+    def event_manager(self):
+        return self._events
+
+    def parse_with_options(self, flags, timeout):
+        _record("media.parse_with_options")
+        if parse_ms and self._instance is not None:
+            threading.Thread(target=self._parse, daemon=True).start()
+        else:
+            self._parse()
+        return 0
+
+    def _parse(self):
+        if parse_ms and self._instance is not None:
+            # as many parses at a time as preparser threads
+            with self._instance.preparser:
+                time.sleep(parse_ms / 1000.0)
+        self._parsed = MediaParsedStatus.done
+        self._events.send(EventType.MediaParsedChanged)
+
+    def get_parsed_status(self):
+        return self._parsed
+
+    def get_duration(self):
+        return 600000
+
+    def tracks_get(self):
+        return []
+
+
+class MediaList(object):
+    def __init__(self):
+        self._items = []
+
+    def add_media(self, media):
+        _record("media_list.add_media")
+        self._items.append(media)
+        return 0
+
+    def count(self):
+        return len(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def index_of_item(self, media):
+        try:
+            return self._items.index(media)
+        except ValueError:
+            return -1
+
+    def remove_index(self, idx):
+        _record("media_list.remove_index")
+        del self._items[idx]
+        return 0
+
+    def item_at_index(self, idx):
+        return self._items[idx]
+
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+
+class MediaPlayer(object):
+    def __init__(self):
+        self._events = EventManager()
+        self._media = None
+        self._rate = 1.0
+        self._state = State.NothingSpecial
+        # media time in ms at a monotonic_ns, and the one last reported
+        self._clock = (0.0, time.monotonic_ns())
+        self._reported = 0
+        self._ticker = None
+
+    def true_time(self):
+        """Exact media time in ms, get_time only reports it in steps."""
+        ms, t = self._clock
+        if self._state == State.Playing:
+            ms += (time.monotonic_ns() - t) / 1e6 * self._rate
+        return ms
+
+    def _rebase(self, ms=None):
+        self._clock = (self.true_time() if ms is None else ms, time.monotonic_ns())
+
+    def _tick(self):
+        while True:
+            time.sleep(time_step_ms / 1000.0)
+            if self._state == State.Playing:
+                self._reported = int(self.true_time())
+                self._events.send(EventType.MediaPlayerTimeChanged, Event(new_time=self._reported))
+
+    def event_manager(self):
+        return self._events
+
+    def set_fullscreen(self, b):
+        pass
+
+    def set_media(self, media):
+        _record("player.set_media")
+        self._media = media
+
+    def get_media(self):
+        return self._media
+
+    def play(self):
+        _record("player.play")
+        # a paused player resumes, any other one starts its media
+        if self._state == State.Paused:
+            self._rebase()
+        else:
+            self._rebase(0)
+            self._reported = 0
+        if time_step_ms and self._ticker is None:
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+        self._state = State.Playing
+        self._events.send(EventType.MediaPlayerPlaying)
+        self._events.send(EventType.MediaPlayerVout)
+        return 0
+
+    def pause(self):
+        _record("player.pause")
+        self._set_state(State.Paused if self._state == State.Playing else State.Playing)
+
+    def set_pause(self, do_pause):
+        _record("player.set_pause")
+        self._set_state(State.Paused if do_pause else State.Playing)
+
+    def stop(self):
+        _record("player.stop")
+        self._set_state(State.Stopped)
+
+    def _set_state(self, state):
+        if state != self._state:
+            self._rebase()
+            self._state = state
+            self._events.send({State.Playing: EventType.MediaPlayerPlaying,
+                State.Paused: EventType.MediaPlayerPaused,
+                State.Stopped: EventType.MediaPlayerStopped}[state])
+
+    def is_playing(self):
+        _record("player.is_playing")
+        return self._state == State.Playing
+
+    def get_state(self):
+        _record("player.get_state")
+        return self._state
+
+    def is_seekable(self):
+        return True
+
+    def set_time(self, t):
+        _record("player.set_time")
+        self._rebase(t)
+        self._reported = t
+
+    def set_position(self, pos):
+        _record("player.set_position")
+
+    def get_time(self):
+        return self._reported if time_step_ms else 0
+
+    def set_rate(self, rate):
+        _record("player.set_rate")
+        self._rebase()
+        self._rate = rate
+        return 0
+
+    def get_rate(self):
+        _record("player.get_rate")
+        return self._rate
+
+
+class MediaListPlayer(object):
+    def __init__(self):
+        self._player = MediaPlayer()
+        self._list = None
+
+    def get_media_player(self):
+        return self._player
+
+    def set_media_list(self, media_list):
+        self._list = media_list
+
+    def set_playback_mode(self, mode):
+        _record("list_player.set_playback_mode")
+
+    def play_item_at_index(self, idx):
+        _record("list_player.play_item_at_index")
+        self._player.set_media(self._list.item_at_index(idx))
+        return self._player.play()
+
+
+class Instance(object):
+    def __init__(self, *args):
+        self.args = args
+        flags = args[0] if args and isinstance(args[0], list) else args
+        threads = 1
+        for flag in flags:
+            if flag.startswith("--preparse-threads="):
+                threads = int(flag.split("=", 1)[1])
+        self.preparser = threading.Semaphore(threads)
+
+    def media_new(self, mrl, *options):
+        _record("instance.media_new")
+        return Media(mrl, *options, instance=self)
+
+    def media_list_new(self, mrls=None):
+        return MediaList()
+
+    def media_player_new(self, uri=None):
+        return MediaPlayer()
+
+    def media_list_player_new(self):
+        return MediaListPlayer()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite runnable on headless machines.
+
+The ola and vlc modules are replaced by the stand-ins in benchmarks/fakes,
+which record the calls made to them. We measure:
+    - ingestion: frames per second through the OLA input and the monitor
+    - dispatch: latency from a cue frame to the player play call
+    - frame_calls: libvlc calls made by frames changing several channels
+    - fader: media loaded by a theme fader move, with and without settle
+    - playlist: build time and memory for synthetic libraries
+Results are written as JSON, and can be compared with a previous run:
+    python benchmarks/run_suite.py -o new.json --compare old.json
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+import argparse
+import array
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# stand-ins first, so that they are used even if the real modules exist
+sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+sys.path.insert(1, os.path.join(BENCH_DIR, ".."))
+
+import vlc
+from ola.ClientWrapper import ClientWrapper
+
+from dmx_trigger.dmx_input import OLAInput
+from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK, CHANNEL
+from dmx_trigger.video_provider import VLCVideoProviderDir
+
+PLAYLIST_SIZES = [100, 1000, 10000, 100000]
+# scenes per theme in synthetic playlists, beyond 65536 entries the
+# playlist is out of the DMX range
+SCENES = 256
+
+
+def synthetic_library(directory, size, files=None):
+    """Create a media config with size entries and the files they use.
+
+    :param str directory: where to create the files
+    :param int size: number of playlist entries
+    :param int files: number of unique files, all different if None
+    :rtype dict
+    """
+    files = files or size
+    for i in range(files):
+        path = os.path.join(directory, "{:06d}-clip.mkv".format(i))
+        if not os.path.exists(path):
+            open(path, "w").close()
+    playlist = {}
+    for pos in range(size):
+        theme, scene = divmod(pos, SCENES)
+        entry = playlist.setdefault(theme, {"dir": directory, "files": []})
+        entry["files"].append("{:06d}-clip.mkv".format(pos % files))
+    return {"vlc": {"flags": []}, "playlist": playlist}
+
+
+def media_config(directory, size, **vlc_options):
+    config = synthetic_library(directory, size)
+    config["vlc"].update(vlc_options)
+    return config
+
+
+def bench_ingestion(directory, frames):
+    """Frames per second through the OLA input, with and without changes."""
+    provider = VLCVideoProviderDir(media_config=media_config(directory, 100))
+    results = {}
+    base = array.array("B", [0]*512)
+    noisy = [array.array("B", [0]*100 + [i % 256] + [0]*411) for i in range(256)]
+    cues = []
+    for i in range(256):
+        frame = array.array("B", [0]*512)
+        frame[CHANNEL['THEME']] = 0
+        frame[CHANNEL['SCENE']] = i % 100
+        frame[CHANNEL['RELEASE']] = 255
+        cues.append(frame)
+    scenarios = {
+        "unchanged": [base],
+        "unmonitored_change": noisy,
+        "cue_change": cues,
+    }
+    for name, pattern in scenarios.items():
+        for threaded in (False, True):
+            ClientWrapper.frames = [(1, pattern[i % len(pattern)]) for i in range(frames)]
+            monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=threaded, dmx_input=OLAInput(1))
+            start = time.perf_counter()
+            monitor.run()
+            elapsed = time.perf_counter() - start
+            key = "{}_{}".format(name, "threaded" if threaded else "inline")
+            results[key] = {"fps": round(frames / elapsed), "dropped": monitor.frames_dropped}
+    return results
+
+
+def bench_dispatch(directory, cues):
+    """Latency from newdata to the player play call, for each play mode."""
+    results = {}
+    modes = {
+        "list_player": {},
+        "preload": {"preload": True},
+    }
+    for name, options in modes.items():
+        provider = VLCVideoProviderDir(media_config=media_config(directory, 1000, **options))
+        monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False)
+        latencies = []
+        frame = bytearray(8)
+        for i in range(cues):
+            # select the cue, then release it
+            frame[CHANNEL['RELEASE']] = 0
+            monitor.newdata(frame)
+            frame[CHANNEL['THEME']], frame[CHANNEL['SCENE']] = divmod(i % 1000, SCENES)
+            monitor.newdata(frame)
+            frame[CHANNEL['RELEASE']] = 255
+            vlc.reset()
+            start = time.monotonic()
+            monitor.newdata(frame)
+            played = vlc.calls.get("player.play") or vlc.calls.get("player.set_pause")
+            if played:
+                latencies.append((played[1] - start) * 1e6)
+        results[name] = {
+            "cues": len(latencies),
+            "median_us": round(statistics.median(latencies), 1),
+            "max_us": round(max(latencies), 1),
+        }
+    return results
+
+
+def bench_frame_calls(directory):
+    """libvlc calls made for frames changing several channels at once."""
+    scenarios = {
+        "cue": {"SCENE": 1},
+        "cue_rate": {"SCENE": 1, "RATE": 10},
+        "cue_reset": {"SCENE": 1, "RESET": 10},
+        "cue_pause": {"SCENE": 1, "PAUSE": 10},
+        "rate": {"RATE": 10},
+        "rate_reset": {"RATE": 10, "RESET": 10},
+        "pause": {"PAUSE": 10},
+        "pause_resume": {"PAUSE": 10, "RESUME": 10},
+    }
+    results = {}
+    for name, changes in scenarios.items():
+        provider = VLCVideoProviderDir(media_config=media_config(directory, 10, preload=True))
+        monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=False)
+        # a cue playing, rewind is triggered by zero
+        frame = bytearray(8)
+        frame[CHANNEL['RELEASE']] = 255
+        frame[CHANNEL['REWIND']] = 255
+        monitor.newdata(frame)
+        for channel, value in changes.items():
+            frame[CHANNEL[channel]] = value
+        vlc.reset()
+        monitor.newdata(frame)
+        results[name] = {
+            "libvlc_calls": sum(count for count, _ in vlc.calls.values()),
+            "calls": sorted(vlc.calls),
+        }
+    return results
+
+
+def bench_fader(directory, steps=40, step_ms=5, settle_ms=30):
+    """Media loaded while the theme fader goes through steps values.
+
+    Release is up and a new value is sent every step_ms, the last one is
+    applied by the control thread once settled.
+    """
+    results = {}
+    for name, settle in (("immediate", None), ("settle", {"set_theme": settle_ms / 1000.0})):
+        provider = VLCVideoProviderDir(media_config=media_config(directory, steps * SCENES, preload=True))
+        monitor = DMX512Monitor(1, DMX_CALLBACK, provider, control_thread=True, settle=settle)
+        monitor.start()
+        frame = bytearray(8)
+        frame[CHANNEL['RELEASE']] = 255
+        monitor.newdata(frame)
+        time.sleep(0.05)
+        vlc.reset()
+        start = time.perf_counter()
+        for theme in range(1, steps):
+            frame[CHANNEL['THEME']] = theme
+            monitor.newdata(frame)
+            time.sleep(step_ms / 1000.0)
+        # wait for the last value to be applied
+        while provider.current_theme != steps - 1 and time.perf_counter() - start < 5:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        monitor.stop()
+        results[name] = {
+            "loads": vlc.calls.get("player.set_media", [0])[0],
+            "suppressed": monitor.settle_suppressed,
+            "sweep_ms": round(elapsed * 1000, 1),
+        }
+    return results
+
+
+def bench_playlist(directory, sizes):
+    """Playlist build time and memory for synthetic libraries."""
+    results = {}
+    for size in sizes:
+        for preload in (False, True):
+            config = media_config(directory, size, preload=preload)
+            start = time.perf_counter()
+            provider = VLCVideoProviderDir(media_config=config)
+            elapsed = time.perf_counter() - start
+            del provider
+            # tracing memory slows down the build, measure it apart
+            tracemalloc.start()
+            provider = VLCVideoProviderDir(media_config=config)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["{}{}".format(size, "_preload" if preload else "")] = {
+                "entries": len(provider._vlclist),
+                "build_ms": round(elapsed * 1000, 1),
+                "memory_kib": round(current / 1024),
+                "peak_kib": round(peak / 1024),
+            }
+            del provider
+    return results
+
+
+def version():
+    """Return the git version of the tree, if any."""
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+            cwd=BENCH_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, path=""):
+    """Print the ratio new/old of every numeric result."""
+    for key, value in new.items():
+        name = "{}.{}".format(path, key) if path else key
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            compare(old[key], value, name)
+        elif isinstance(value, (int, float)) and isinstance(old.get(key), (int, float)) and old[key]:
+            print("{:<50} {:>12} {:>12} {:>8.2f}".format(name, old[key], value, value / old[key]))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Run the benchmark suite with ola and vlc stand-ins.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-o", "--output", default="bench_output.json",
+            help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results to compare with")
+    parser.add_argument("--frames", type=int, default=100000,
+            help="frames for the ingestion benchmark")
+    parser.add_argument("--cues", type=int, default=1000,
+            help="cues for the dispatch benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=PLAYLIST_SIZES,
+            help="playlist sizes")
+    return(parser.parse_args())
+
+
+def main():
+    args = parse_args()
+    # the hot path logs a lot, keep it quiet
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = {
+        "version": version(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        results["ingestion"] = bench_ingestion(directory, args.frames)
+        results["dispatch"] = bench_dispatch(directory, args.cues)
+        results["frame_calls"] = bench_frame_calls(directory)
+        results["fader"] = bench_fader(directory)
+        results["playlist"] = bench_playlist(directory, args.sizes)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
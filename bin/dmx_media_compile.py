@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate a media config and compile its snapshot.
+
+All the problems of the media config are reported at once, and the exit
+status is not zero when there is any. When it is valid the snapshot is
+written, so that the next start of vlc_video_provider.py loads it without
+parsing the YAML file:
+    dmx_media_compile.py ~/.config/media_list.yaml
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+
+import os
+import argparse
+import sys
+
+from dmx_trigger.media_config import load_media_config, MediaConfigError, DEFAULT_CACHE_DIR
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Validate a media config and compile its snapshot.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+            help="the snapshot directory")
+    parser.add_argument("media_file", nargs="?",
+            help="the media config file",
+            default=(os.environ.get("DMX_TRIGGER_MEDIA") or
+            "~/.config/media_list.yaml"))
+
+    return(parser.parse_args())
+
+def main():
+    args = parse_args()
+    media_file = os.path.abspath(os.path.expanduser(args.media_file))
+    try:
+        config = load_media_config(media_file, cache_dir=args.cache_dir)
+    except MediaConfigError as e:
+        sys.exit(str(e))
+    playlist = config.get("playlist", {})
+    print("{}: {} themes, {} cues".format(media_file, len(playlist),
+        sum(len(entry["paths"]) for entry in playlist.values())))
+    for folder in config.get("library", []):
+        print("library {}, playmode {}".format(folder["dir"], folder["playmode"]))
+
+if __name__ == "__main__":
+    main()
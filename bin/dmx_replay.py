@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Replay a DMX trace recorded with vlc_video_provider.py --record.
+
+Frames are fed to the monitors of the configured outputs, driving the real
+video provider or a stub that only counts calls. A whole show can be
+replayed in seconds and profiled:
+    dmx_replay.py --stub --speed 0 --profile show.trace
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+
+
+import os
+import argparse
+import cProfile
+import pstats
+import time
+
+from dmx_trigger.dmx_monitor import DMX512Monitor, patch_from_config, settle_from_config, run_monitors
+from dmx_trigger.config import load_config
+from dmx_trigger.trace import TraceInput, StubVideoProvider
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+            description="Replay a DMX trace against the video provider.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--config", dest="config_file",
+            help="the configuration file",
+            default=(os.environ.get("DMX_TRIGGER_CONFIG") or
+            "~/.config/dmx_trigger.yaml"))
+    parser.add_argument("--media", dest="media_file",
+            help="the media config file",
+            default=(os.environ.get("DMX_TRIGGER_MEDIA") or
+            "~/.config/media_list.yaml"))
+    parser.add_argument(
+            "-u", "--universe",
+            type=int, default=1,
+            help="Universe number")
+    parser.add_argument("--speed", type=float, default=1.0,
+            help="replay speed, 0 is as fast as possible")
+    parser.add_argument("--stub", action="store_true",
+            help="use a stub video provider instead of vlc")
+    parser.add_argument("--profile", action="store_true",
+            help="print the replay profile")
+    parser.add_argument("trace", help="the trace file")
+
+    return(parser.parse_args())
+
+def main():
+    args = parse_args()
+    config = load_config(os.path.abspath(os.path.expanduser(args.config_file)))
+
+    outputs = config.get("outputs") or [{"patch": config.get("patch")}]
+    monitors = []
+    for output in outputs:
+        if args.stub:
+            video_provider = StubVideoProvider()
+        else:
+            from dmx_trigger.media_config import load_media_config
+            from dmx_trigger.provider import provider_from_config
+            media_file = os.path.abspath(os.path.expanduser(output.get("media", args.media_file)))
+            video_provider = provider_from_config(load_media_config(media_file))
+        address, dmx_cb = patch_from_config(output)
+        # settle windows are real time, they cannot apply as fast as possible
+        settle = settle_from_config(output) if args.speed else None
+        # process every frame, no coalescing, to replay deterministically
+        monitors.append(DMX512Monitor(output.get("universe", args.universe), dmx_cb, video_provider,
+            control_thread=False, address=address, settle=settle))
+
+    dmx_input = TraceInput(args.trace, speed=args.speed)
+    profile = cProfile.Profile() if args.profile else None
+    start = time.monotonic()
+    if profile:
+        profile.enable()
+    run_monitors(dmx_input, monitors)
+    if profile:
+        profile.disable()
+    elapsed = time.monotonic() - start
+
+    print("Replayed {} frames in {:.2f}s".format(dmx_input.frames, elapsed))
+    for monitor in monitors:
+        calls = getattr(monitor.video_provider, "calls", None)
+        if calls:
+            print("Universe {} address {}: {}".format(monitor.universe, monitor.address,
+                ", ".join("{} {}".format(name, stats[0]) for name, stats in sorted(calls.items()))))
+    if profile:
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(20)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBye!")
@@ -7,9 +7,15 @@ DMX controlled Media Server.
 * Configure a numbered playlist with:
   -a config file
   -listing and sorting a directory
-* Then receive DMX data to control the video play.
+* Then receive DMX data to control the video play, from olad or straight
+  from the network with the built-in sACN (E1.31) and Art-Net receivers.
+* Several outputs (screens), each with its universe, patch and media config,
+  can be driven by a single process sharing one DMX input.
+* Several nodes can keep the playback of their outputs in sync, following
+  the one configured as sync leader.
 
 We receive an array of DMX channel values (max 512)
+Channels are patched from the start address given in the config file:
 Channel 0: theme number
 Channel 1: theme's scene number
 Channel 2: release video
@@ -28,9 +34,16 @@ __license__ = "GPL 3.0"
 import os
 import argparse
 
-from dmx_trigger.dmx_monitor import DMX512Monitor, DMX_CALLBACK
-from dmx_trigger.video_provider import VLCVideoProviderDir
+from dmx_trigger.dmx_input import input_from_config
+from dmx_trigger.dmx_monitor import DMX512Monitor, patch_from_config, settle_from_config, run_monitors
+from dmx_trigger.provider import provider_from_config
+from dmx_trigger.player_process import ProcessVideoProvider
+from dmx_trigger.trace import TraceWriter
+from dmx_trigger.latency import LatencyTracker
+from dmx_trigger.status_server import StatusServer
 from dmx_trigger.config import load_config
+from dmx_trigger.media_config import load_media_config
+from dmx_trigger.sync import sync_from_config
 # running settings
 # from dmx_trigger.settings import settings
 
@@ -56,6 +69,8 @@ def parse_args():
             "-u", "--universe",
             type=int, default=1,
             help="Universe number")
+    parser.add_argument("--record", dest="trace_file",
+            help="record received DMX frames to this trace file")
     parser.add_argument(
             '--extension',
             default='mkv',
@@ -63,6 +78,42 @@ def parse_args():
 
     return(parser.parse_args())
 
+def build_output(output, universe, media_file, watch=True, isolate=False, config_file=None, latency=None):
+    """Create the monitor and video provider of an output.
+
+    :param dict output: output config, with optional universe, patch and media
+    :param int universe: default universe number
+    :param str media_file: default media config file
+    :param bool watch: reload the media config when it changes
+    :param bool isolate: run the player in a worker process
+    :param str config_file: config file to set up logging in the worker
+    :param dict latency: latency tracking config, with enabled and interval
+    :rtype DMX512Monitor
+    """
+    # each output tracks its own frames, player events stay in the worker when isolated
+    tracker = None
+    if latency and latency.get("enabled"):
+        tracker = LatencyTracker(interval=latency.get("interval", 60))
+    # convert to absolute path before forking to allow user and relative paths
+    media_file = os.path.abspath(os.path.expanduser(output.get("media", media_file)))
+
+    if isolate:
+        # the worker process loads the media config and owns the player
+        video_provider = ProcessVideoProvider(media_file, config_file=config_file, watch=watch)
+    else:
+        # load the validated media config, from its snapshot when up to date
+        media_config = load_media_config(media_file)
+        # setup the video provider of the configured backend, it has its own player
+        video_provider = provider_from_config(media_config, latency=tracker)
+        # apply media config changes without restarting
+        if watch:
+            video_provider.watch(media_file)
+
+    # listen for DMX512 values in the output universe and address
+    address, dmx_cb = patch_from_config(output)
+    return DMX512Monitor(output.get("universe", universe), dmx_cb, video_provider, address=address,
+        latency=tracker, settle=settle_from_config(output))
+
 def main():
     # read command line args
     args = parse_args()
@@ -76,20 +127,53 @@ def main():
     # always import after configuring logging (load_config does it)
     import logging
 
-    # convert to absolute path before forking to allow user and relative paths
-    media_file = os.path.abspath(os.path.expanduser(args.media_file))
-    # load media config file
-    media_config = load_config(media_file)
-
     # update settings with config params
     # settings.update(config)
 
-    # setup the video provider
-    video_provider = VLCVideoProviderDir(media_config=media_config)
-
-    # listen for DMX512 values in the specified universe
-    dmx_monitor = DMX512Monitor(args.universe, DMX_CALLBACK, video_provider)
-    dmx_monitor.run()
+    # one output per screen, or a single one with the root level patch
+    outputs = config.get("outputs") or [{"patch": config.get("patch")}]
+    monitors = [build_output(output, args.universe, args.media_file,
+        watch=config.get("media_watch", True), isolate=config.get("isolate_player", False),
+        config_file=config_file, latency=config.get("latency")) for output in outputs]
+
+    # all outputs share the same DMX input
+    dmx_input = input_from_config(config, args.universe)
+    recorder = None
+    if args.trace_file:
+        recorder = TraceWriter(os.path.abspath(os.path.expanduser(args.trace_file)))
+        # one monitor per universe records its frames
+        for monitor in {monitor.universe: monitor for monitor in monitors}.values():
+            monitor.recorder = recorder
+    server = None
+    status_config = config.get("status_server") or {}
+    if status_config.get("enabled"):
+        server = StatusServer(monitors, host=status_config.get("host", "127.0.0.1"),
+            port=status_config.get("port", 8080))
+        server.start()
+    # the output number identifies its stream, it must match in every node
+    syncs = []
+    for idx, monitor in enumerate(monitors):
+        if isinstance(monitor.video_provider, ProcessVideoProvider):
+            if (config.get("sync") or {}).get("enabled"):
+                logging.getLogger(args.logger or LOGGER).warning(
+                    "Sync is not available with isolate_player, output {} not synced".format(idx))
+            continue
+        sync = sync_from_config(config.get("sync"), monitor.video_provider, stream=idx)
+        if sync:
+            sync.start()
+            syncs.append(sync)
+    try:
+        run_monitors(dmx_input, monitors)
+    finally:
+        for sync in syncs:
+            sync.stop()
+        if server:
+            server.stop()
+        if recorder:
+            recorder.close()
+        for monitor in monitors:
+            if monitor.latency:
+                monitor.latency.dump()
 
 if __name__ == "__main__":
     try:
@@ -49,3 +49,5 @@ rm -rf %{eggname}.egg-info
 %{python3_sitelib}/%{srcname}-*.egg-info/
 %{python3_sitelib}/%{srcname}/
 %{_bindir}/vlc_video_provider.py
+%{_bindir}/dmx_replay.py
+%{_bindir}/dmx_media_compile.py
@@ -4,5 +4,5 @@
 __author__ = "Pau Aliagas <pau@newtral.org>"
 __copyright__ = "Copyright (c) 2021 Pau Aliagas"
 __license__ = "GPL 3.0"
-__all__ = ['config', 'dmx_monitor', 'video_provider']
+__all__ = ['config', 'dmx_monitor', 'media_index', 'video_provider']
 
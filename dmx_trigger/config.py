@@ -16,6 +16,9 @@ import os
 import warnings
 import yaml
 
+# the libyaml loader is much faster, when available
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 def load_config(filename, section=None):
     """
@@ -34,7 +37,7 @@ def load_config(filename, section=None):
     :rtype: dict
     """
     try:
-        config = yaml.load(open(filename), Loader=yaml.SafeLoader)
+        config = yaml.load(open(filename), Loader=YAML_LOADER)
     except IOError as e:
         raise Exception("non-existing config file '%s'" % filename)
     except yaml.YAMLError as e:
@@ -73,7 +76,7 @@ def load_config(filename, section=None):
             # load yaml logconfig file 1st, then old ini format
             logfile = loggers.get('file')
             try:
-                logconfig = yaml.load(open(logfile), Loader=yaml.SafeLoader)
+                logconfig = yaml.load(open(logfile), Loader=YAML_LOADER)
             except yaml.YAMLError as e:
                 # try old ini format
                 logconfig = None
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+DMX input sources.
+
+An input receives the frames of one or more universes and hands their slot
+data to the callbacks subscribed to each universe, DMX512Monitor.newdata.
+All universes of an input share one receiving loop. There are three sources:
+    - ola: frames from olad through the OLA client
+    - sacn: built-in E1.31 (streaming ACN) receiver
+    - artnet: built-in Art-Net receiver
+
+The built-in receivers read packets into a preallocated buffer and pass a
+memoryview of the slot data, so there is no copy before newdata.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['OLAInput', 'SACNInput', 'ArtNetInput', 'input_from_config']
+
+import logging
+import selectors
+import socket
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT = "ola"
+# max UDP packet we expect, both protocols fit in less
+PACKET_SIZE = 1024
+# seconds between checks for a stop request
+POLL_INTERVAL = 0.5
+
+SACN_PORT = 5568
+SACN_ACN_ID = b"ASC-E1.17\0\0\0"
+SACN_VECTOR_ROOT_DATA = 0x00000004
+SACN_VECTOR_FRAMING_DATA = 0x00000002
+SACN_OPTION_PREVIEW = 0x80
+SACN_OPTION_TERMINATED = 0x40
+SACN_DATA_OFFSET = 126
+
+ARTNET_PORT = 6454
+ARTNET_ID = b"Art-Net\0"
+ARTNET_OP_DMX = 0x5000
+ARTNET_DATA_OFFSET = 18
+
+
+class DMXInput(object):
+    """Base class of the DMX input sources."""
+
+    def __init__(self, universe=None):
+        self._universe = universe
+        self._callbacks = {}
+
+    def subscribe(self, universe, callback):
+        """Call callback with the slot data of every frame of universe.
+
+        :param int universe: universe number
+        :param callable callback: function taking the slot data
+        """
+        self._callbacks.setdefault(universe, []).append(callback)
+
+    def _dispatcher(self, universe):
+        """Return a single function calling all the callbacks of universe.
+
+        :param int universe: universe number
+        :rtype callable
+        """
+        callbacks = self._callbacks[universe]
+        if len(callbacks) == 1:
+            return callbacks[0]
+        def dispatch(data):
+            for callback in callbacks:
+                callback(data)
+        return dispatch
+
+    def run(self, callback=None):
+        """Receive frames and call the callbacks until stopped.
+
+        :param callable callback: optional function taking the slot data of
+            the default universe
+        """
+        if callback:
+            self.subscribe(self._universe, callback)
+        self._run()
+
+    def _run(self):
+        raise NotImplementedError
+
+    def stop(self):
+        """Make run return."""
+        raise NotImplementedError
+
+
+class OLAInput(DMXInput):
+    """Frames received from olad."""
+
+    def __init__(self, universe=None):
+        super().__init__(universe)
+        self._wrapper = None
+
+    def _run(self):
+        # import here so that other inputs do not need the OLA bindings
+        from ola.ClientWrapper import ClientWrapper
+
+        self._wrapper = ClientWrapper()
+        client = self._wrapper.Client()
+        for universe in self._callbacks:
+            client.RegisterUniverse(universe, client.REGISTER, self._dispatcher(universe))
+        self._wrapper.Run()
+
+    def stop(self):
+        if self._wrapper:
+            self._wrapper.Stop()
+
+
+class UDPInput(DMXInput):
+    """Base class of the built-in UDP receivers."""
+    port = None
+
+    def __init__(self, universe=None, interface="0.0.0.0", port=None):
+        super().__init__(universe)
+        self._interface = interface
+        if port:
+            self.port = port
+        self._stop = threading.Event()
+        self._buffer = bytearray(PACKET_SIZE)
+        self._view = memoryview(self._buffer)
+        # last sequence number by universe
+        self._sequence = {}
+        self.packets_in = self.packets_discarded = 0
+
+    def _socket(self):
+        """Create the bound socket.
+
+        :rtype socket.socket
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # several fixtures can listen to the same universe
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", self.port))
+        return sock
+
+    def _check_sequence(self, universe, sequence):
+        """Tell whether a packet is in order, as E1.31 defines it.
+
+        Packets up to 20 behind the last one are late and discarded.
+
+        :param int universe: universe number
+        :param int sequence: packet sequence number
+        :rtype bool
+        """
+        last = self._sequence.get(universe)
+        if last is not None:
+            diff = (sequence - last) % 256
+            if diff == 0 or diff > 256 - 20:
+                return False
+        self._sequence[universe] = sequence
+        return True
+
+    def _parse(self, size):
+        """Parse the packet in the buffer.
+
+        Returns the universe and a view of the slot data, or None if it
+        must be ignored.
+
+        :param int size: packet size
+        :rtype tuple
+        """
+        raise NotImplementedError
+
+    def _run(self):
+        sock = self._socket()
+        sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        dispatchers = {universe: self._dispatcher(universe) for universe in self._callbacks}
+        logger.info("Listening to {} universes {} on port {}".format(type(self).__name__, list(dispatchers), self.port))
+        try:
+            while not self._stop.is_set():
+                if not selector.select(POLL_INTERVAL):
+                    continue
+                # drain the socket, every packet is parsed in place
+                while True:
+                    try:
+                        size = sock.recv_into(self._buffer)
+                    except BlockingIOError:
+                        break
+                    self.packets_in += 1
+                    packet = self._parse(size)
+                    if packet is None or packet[0] not in dispatchers:
+                        self.packets_discarded += 1
+                    else:
+                        dispatchers[packet[0]](packet[1])
+        finally:
+            selector.close()
+            sock.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+class SACNInput(UDPInput):
+    """E1.31 (streaming ACN) receiver.
+
+    It joins the multicast group of the universe, unicast packets are
+    received too.
+    """
+    port = SACN_PORT
+
+    def _socket(self):
+        sock = super()._socket()
+        for universe in self._callbacks:
+            group = "239.255.{}.{}".format(universe >> 8, universe & 0xff)
+            mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(self._interface))
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            except OSError as e:
+                logger.warning("Could not join multicast group {}: {}".format(group, e))
+        return sock
+
+    def _parse(self, size):
+        buf = self._buffer
+        if (size <= SACN_DATA_OFFSET or
+            buf[4:16] != SACN_ACN_ID or
+            struct.unpack_from("!I", buf, 18)[0] != SACN_VECTOR_ROOT_DATA or
+            struct.unpack_from("!I", buf, 40)[0] != SACN_VECTOR_FRAMING_DATA):
+            return None
+        universe = struct.unpack_from("!H", buf, 113)[0]
+        options = buf[112]
+        # preview data is not for us, a terminated stream has no data
+        if options & (SACN_OPTION_PREVIEW | SACN_OPTION_TERMINATED):
+            return None
+        # only DMX (null start code) data
+        if buf[125] != 0:
+            return None
+        if not self._check_sequence(universe, buf[111]):
+            return None
+        # property value count includes the start code
+        count = struct.unpack_from("!H", buf, 123)[0] - 1
+        return universe, self._view[SACN_DATA_OFFSET:min(SACN_DATA_OFFSET + count, size)]
+
+
+class ArtNetInput(UDPInput):
+    """Art-Net receiver.
+
+    The universe is the 15 bit port address: net, sub-net and universe.
+    """
+    port = ARTNET_PORT
+
+    def _parse(self, size):
+        buf = self._buffer
+        if (size <= ARTNET_DATA_OFFSET or
+            buf[0:8] != ARTNET_ID or
+            struct.unpack_from("<H", buf, 8)[0] != ARTNET_OP_DMX):
+            return None
+        universe = buf[15] << 8 | buf[14]
+        # sequence zero means that sequencing is disabled
+        sequence = buf[12]
+        if sequence and not self._check_sequence(universe, sequence):
+            return None
+        length = struct.unpack_from("!H", buf, 16)[0]
+        return universe, self._view[ARTNET_DATA_OFFSET:min(ARTNET_DATA_OFFSET + length, size)]
+
+
+INPUTS = {"ola": OLAInput, "sacn": SACNInput, "artnet": ArtNetInput}
+
+def input_from_config(config, universe=None):
+    """Create the DMX input source defined in the config.
+
+        input:
+            type: sacn
+            interface: 192.168.1.10
+
+    :param dict config: the configuration
+    :param int universe: default universe number
+    :rtype DMXInput
+    :raises KeyError: when the input type is unknown
+    """
+    options = dict(config.get("input") or {})
+    name = options.pop("type", DEFAULT_INPUT)
+    try:
+        klass = INPUTS[name]
+    except KeyError:
+        raise KeyError("Unknown DMX input '%s'" % name)
+    return klass(universe, **options)
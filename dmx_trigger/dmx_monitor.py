@@ -2,29 +2,51 @@
 # -*- coding: utf-8 -*-
 
 """
-Receive DMX data from olad.
+Receive DMX data from olad or any other DMX input.
 
 We receive an array of DMX channel values (max 512).
 we trigger callback functions for each channel with the received value
 only when values change.
 Channels are always processed sequentially from 0 to the highest number.
 
+Frames are received in the input callback and published to a single slot
+mailbox. A control thread takes the newest frame and drives the video
+provider, so slow player calls never stall socket reads. Frames arriving
+while the provider is busy are coalesced and counted as dropped.
+
+Channels can have a settle window: a change is only applied once the value
+has been stable for the window, so that moving the theme or scene fader
+does not load every cue it goes through. Values that did not settle are
+counted as suppressed. While a cue channel (theme or scene) is settling,
+release and the other cue channel wait for it too, even if already settled,
+and are applied together, so that picking a cue loads it once. Channels
+without a window, like pause, are applied at once. With no control thread,
+values that have settled are applied when the next frame is received.
+
+The channels are patched at a start address, so that several fixtures can
+share one universe. Offsets from the start address:
 Channel 0: theme number
 Channel 1: theme's scene number
-Channel 2: faster/slower
-Channel 3: reset rate
-Channel 4: rewind (if value is zero)
-Channel 5: pause/unpause
-Channel 6: resume
+Channel 2: release video
+Channel 3: faster/slower
+Channel 4: reset rate
+Channel 5: rewind (if value is zero)
+Channel 6: pause/unpause
+Channel 7: resume
 """
 
 __author__ = "Pau Aliagas <linuxnow@gmail.com>"
 __copyright__ = "Copyright (c) 2021 Pau Aliagas"
 __license__ = "GPL 3.0"
-__all__ = ['DMX512Monitor']
+__all__ = ['DMX512Monitor', 'patch_from_config', 'settle_from_config', 'run_monitors']
 
 import logging
-from ola.ClientWrapper import ClientWrapper
+import threading
+import time
+from operator import itemgetter
+
+from dmx_trigger.dmx_input import OLAInput
+from dmx_trigger.utils.mailbox import LatestMailbox
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +55,10 @@ logger = logging.getLogger(__name__)
 # 2. program logic: we know that previous channels have been processed
 CHANNEL = {'THEME': 0, 'SCENE': 1, 'RELEASE': 2, 'RATE': 3, 'RESET': 4, 'REWIND': 5, 'PAUSE': 6, 'RESUME': 7}
 
+CALLBACK = {'THEME': "set_theme", 'SCENE': "set_scene", 'RELEASE': "release",
+    'RATE': "change_delta_rate", 'RESET': "reset_rate", 'REWIND': "rewind",
+    'PAUSE': "pause", 'RESUME': "resume"}
+
 DMX_CALLBACK=[ [CHANNEL['THEME'], "set_theme"],
     [CHANNEL['SCENE'], "set_scene"],
     [CHANNEL['RELEASE'], "release"],
@@ -42,38 +68,324 @@ DMX_CALLBACK=[ [CHANNEL['THEME'], "set_theme"],
     [CHANNEL['PAUSE'], "pause"],
     [CHANNEL['RESUME'], "resume"]]
 
+DMX_SLOTS = 512
+DEFAULT_ADDRESS = 0
+
+def patch_from_config(config):
+    """Get the DMX patch from the config.
+
+    The patch section has a start address (0 based slot) and an optional
+    channel map with the offset of each channel from the start address:
+
+        patch:
+            address: 16
+            channels:
+                theme: 0
+                scene: 1
+
+    Returns the start address and a list of [offset, callback] pairs in the
+    DMX_CALLBACK format.
+
+    :param dict config: the configuration
+    :rtype tuple
+    :raises KeyError: when an unknown channel is given
+    """
+    patch = config.get("patch") or {}
+    address = patch.get("address", DEFAULT_ADDRESS)
+    channels = patch.get("channels")
+    if not channels:
+        return address, DMX_CALLBACK
+    dmx_cb = []
+    for name, offset in channels.items():
+        try:
+            dmx_cb.append([offset, CALLBACK[name.upper()]])
+        except KeyError:
+            raise KeyError("Unknown DMX channel '%s' in patch" % name)
+    return address, dmx_cb
+
+def settle_from_config(config):
+    """Get the settle window of each channel from the config.
+
+    The patch section has an optional settle map with the window of each
+    channel in milliseconds:
+
+        patch:
+            settle:
+                theme: 30
+                scene: 30
+
+    Returns a dict of callback name to window in seconds.
+
+    :param dict config: the configuration
+    :rtype dict
+    :raises KeyError: when an unknown channel is given
+    """
+    patch = config.get("patch") or {}
+    settle = {}
+    for name, ms in (patch.get("settle") or {}).items():
+        try:
+            settle[CALLBACK[name.upper()]] = ms / 1000.0
+        except KeyError:
+            raise KeyError("Unknown DMX channel '%s' in settle" % name)
+    return settle
+
+def run_monitors(dmx_input, monitors):
+    """Feed several monitors from one input until it stops.
+
+    Each monitor gets the frames of its universe and drives its video
+    provider from its own control thread, so slow outputs do not delay
+    each other nor the input.
+
+    :param DMXInput dmx_input: the shared input
+    :param list monitors: DMX512Monitor instances
+    """
+    for monitor in monitors:
+        dmx_input.subscribe(monitor.universe, monitor.newdata)
+        if monitor._control_thread:
+            monitor.start()
+    try:
+        dmx_input.run()
+    finally:
+        for monitor in monitors:
+            monitor.stop()
+            # the last frame has been seen, apply what was still settling
+            monitor.flush_settled(force=True)
+
 class DMX512Monitor(object):
-    def __init__(self, universe, dmx_cb, video_provider):
+    def __init__(self, universe, dmx_cb, video_provider, control_thread=True, address=DEFAULT_ADDRESS, dmx_input=None, latency=None,
+            settle=None):
         self._universe = universe
+        self._input = dmx_input or OLAInput(universe)
         self.dmx_cb = dmx_cb
         self.video_provider = video_provider
-        # initialise empty list of channels
-        self.dmx_channel = [None]*512
+        self.address = address
+        # last frame received, kept as a compact byte string (max 512 slots)
+        self.dmx_frame = b""
+        # compile the patch into a dense table of bound methods by absolute slot
+        self._dispatch = self._build_dispatch_table(dmx_cb, address)
+        # monitored slots, sorted
+        self._channels = tuple(slot for slot, func in enumerate(self._dispatch) if func)
+        # gather all monitored values from a frame in a single C call
+        # itemgetter returns a scalar when given just one item
+        if not self._channels:
+            self._get_values = lambda frame: ()
+        elif len(self._channels) == 1:
+            getter = itemgetter(self._channels[0])
+            self._get_values = lambda frame: (getter(frame),)
+        else:
+            self._get_values = itemgetter(*self._channels)
+        # minimum frame length that contains every monitored channel
+        self._min_len = self._channels[-1] + 1 if self._channels else 0
+        # last processed value of each monitored channel
+        self.dmx_values = (None,)*len(self._channels)
+        # settle window in ns of each monitored channel, 0 when immediate
+        settle = settle or {}
+        names = {address + offset: func for offset, func in dmx_cb}
+        self._settle = tuple(int(settle.get(names[slot], 0)*1e9) for slot in self._channels)
+        # cue channels, and channels held while one of them is settling
+        self._cue = tuple(names[slot] in ("set_theme", "set_scene") for slot in self._channels)
+        self._held = tuple(cue or names[slot] == "release" for slot, cue in zip(self._channels, self._cue))
+        if any(self._settle):
+            self.process = self._process_settling
+        # channel index to (value, first seen ns) of the values settling
+        self._pending = {}
+        self._last_values = self.dmx_values
+        self._last_received = None
+        self.settle_suppressed = 0
+        # frames go through a latest wins mailbox to the control thread
+        self._control_thread = control_thread
+        self._mailbox = LatestMailbox()
+        self._worker = None
+        self.frames_in = 0
+        # optional TraceWriter recording every changed frame
+        self.recorder = None
+        # optional LatencyTracker timing frames up to the first video frame
+        self.latency = latency
+
+    def _build_dispatch_table(self, dmx_cb, address):
+        """Resolve the callbacks once into a table indexed by absolute slot.
+
+        :param list dmx_cb: [offset, callback name] pairs
+        :param int address: start address the offsets are relative to
+        :rtype list
+        :raises ValueError: when a channel falls outside the universe
+        """
+        dispatch = [None]*DMX_SLOTS
+        for offset, func in dmx_cb:
+            slot = address + offset
+            if not 0 <= slot < DMX_SLOTS:
+                raise ValueError("DMX channel {} at address {} is out of the universe".format(func, address))
+            dispatch[slot] = getattr(self.video_provider, func)
+        return dispatch
+
+    @property
+    def frames_dropped(self):
+        """Number of frames coalesced before the control thread saw them."""
+        return self._mailbox.dropped
 
     def newdata(self, data):
         # too much noise
         # logger.debug(data)
-        changed = False
 
-        # check data for monitored channels only and trigger callbacks
-        for c in self.dmx_cb:
-            idx, func = c
-            try:
-                # on change call function and update with new value when done
-                if data[idx] != self.dmx_channel[idx]:
-                    changed = True
-                    logger.info("Request change channel {} value from {} to {}".format(idx, self.dmx_channel[idx], data[idx]))
-                    getattr(self.video_provider, func)(data[idx], current=self.dmx_channel[idx])
-                    self.dmx_channel[idx] = data[idx]
-            except IndexError:
-                # either we have a bad channel or we have iterated data
+        # inputs hand us an array or a view of bytes, a copy is a plain memcpy
+        frame = bytes(data)
+        # identical frame: nothing to do, this is a single memcmp
+        if frame == self.dmx_frame:
+            # with no control thread, settled values wait for the next frame
+            if self._pending and not self._worker:
+                self.flush_settled()
+            return
+        self.dmx_frame = frame
+        self.frames_in += 1
+        received = time.monotonic_ns()
+        if self.recorder:
+            self.recorder.write(self._universe, frame)
+
+        # hand over to the control thread if running, otherwise process here
+        if self._worker:
+            self._mailbox.put((frame, received))
+        else:
+            self.process(frame, received)
+
+    def process(self, frame, received=None):
+        """Trigger callbacks for the monitored channels changed in frame.
+
+        :param bytes frame: DMX slot values
+        :param int received: monotonic_ns time the frame was received
+        """
+        # extract monitored values and compare them all at once
+        if len(frame) >= self._min_len:
+            values = self._get_values(frame)
+        else:
+            # partial frame: channels not transmitted keep their value
+            values = tuple(frame[idx] if idx < len(frame) else old
+                for idx, old in zip(self._channels, self.dmx_values))
+        if values == self.dmx_values:
+            return
+        self._dispatch_values(values, received)
+
+    def _dispatch_values(self, values, received):
+        """Trigger callbacks for the changed values, then exec_pending.
+
+        :param tuple values: new value of each monitored channel
+        :param int received: monotonic_ns time the frame was received
+        """
+        # trigger callbacks for changed channels only, in channel order
+        current = self.dmx_values
+        self.dmx_values = values
+        latency = self.latency
+        if latency and received is not None:
+            latency.frame(received)
+            latency.mark("callback")
+        dispatch = self._dispatch
+        for slot, value, old in zip(self._channels, values, current):
+            if value != old:
+                logger.info("Request change channel %s value from %s to %s", slot, old, value)
+                dispatch[slot](value, current=old)
+        # Call post callback function as something has changed
+        self.video_provider.exec_pending()
+
+    def _process_settling(self, frame, received=None):
+        """Process frame, applying changes of channels with a window once settled.
+
+        :param bytes frame: DMX slot values
+        :param int received: monotonic_ns time the frame was received
+        """
+        if len(frame) >= self._min_len:
+            values = self._get_values(frame)
+        else:
+            values = tuple(frame[idx] if idx < len(frame) else old
+                for idx, old in zip(self._channels, self._last_values))
+        now = received or time.monotonic_ns()
+        self._last_values = values
+        self._last_received = received
+        pending = self._pending
+        for idx, (value, old, window) in enumerate(zip(values, self.dmx_values, self._settle)):
+            if not window:
+                continue
+            settling = pending.get(idx)
+            if settling is not None and settling[0] != value:
+                # it moved on before settling
+                self.settle_suppressed += 1
+                logger.debug("Suppressed channel %s value %s", self._channels[idx], settling[0])
+                del pending[idx]
+                settling = None
+            if settling is None and value != old:
+                pending[idx] = (value, now)
+        self._commit(now)
+
+    def _commit(self, now, force=False):
+        """Apply the last values, but those still settling and held.
+
+        :param int now: monotonic_ns time
+        :param bool force: whether to apply the values still settling too
+        """
+        pending = self._pending
+        for idx, (value, since) in list(pending.items()):
+            if force or now - since >= self._settle[idx]:
+                del pending[idx]
+        if pending:
+            holding = any(self._cue[idx] for idx in pending)
+            values = tuple(old if idx in pending or (holding and held) else value for idx, (value, old, held)
+                in enumerate(zip(self._last_values, self.dmx_values, self._held)))
+        else:
+            values = self._last_values
+        if values != self.dmx_values:
+            self._dispatch_values(values, self._last_received)
+
+    def settle_timeout(self):
+        """Seconds until the next settle window ends, None if none is settling.
+
+        :rtype float
+        """
+        if not self._pending:
+            return None
+        end = min(since + self._settle[idx] for idx, (value, since) in self._pending.items())
+        return max(0, end - time.monotonic_ns()) / 1e9
+
+    def flush_settled(self, force=False):
+        """Apply the values whose settle window has ended.
+
+        :param bool force: whether to apply the values still settling too
+        """
+        if self._pending:
+            self._commit(time.monotonic_ns(), force=force)
+
+    def _control_loop(self):
+        """Drain the mailbox and drive the video provider until stopped."""
+        logger.debug("Control thread started")
+        while True:
+            # wake up when a settle window ends, even with no new frame
+            item = self._mailbox.get(self.settle_timeout())
+            if item is None and self._mailbox.closed:
                 break
-        # Call post callback function if anything has changed
-        if changed:
-            self.video_provider.exec_pending()
+            try:
+                if item is None:
+                    self.flush_settled()
+                else:
+                    self.process(*item)
+            except Exception as e:
+                logger.exception("Error processing frame: {}".format(e))
+        logger.debug("Control thread finished, {} frames in, {} dropped".format(self.frames_in, self.frames_dropped))
+
+    def start(self):
+        """Start the control thread."""
+        if self._worker:
+            return
+        self._worker = threading.Thread(target=self._control_loop, name="dmx_control", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the control thread once the pending frame is processed."""
+        if not self._worker:
+            return
+        self._mailbox.close()
+        self._worker.join()
+        self._worker = None
+
+    @property
+    def universe(self):
+        return self._universe
 
     def run(self):
-        wrapper = ClientWrapper()
-        client = wrapper.Client()
-        client.RegisterUniverse(self._universe, client.REGISTER, self.newdata)
-        wrapper.Run()
+        run_monitors(self._input, [self])
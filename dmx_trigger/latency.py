@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the latency from a DMX frame to the first video frame on screen.
+
+The monitor stamps every frame when it is received. The path of a frame is
+then marked at each stage: when its callbacks run, when exec_pending starts,
+when the player is asked to play, and when the player reports the media as
+playing and its first frame shown. The time from the frame to each stage goes
+into a histogram, percentiles are available on demand and dumped to the log
+periodically.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['LatencyTracker', 'STAGES']
+
+import logging
+import time
+
+from dmx_trigger.utils.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+# stages of the path of a frame, in order
+STAGES = ("callback", "exec_pending", "player_call", "playing", "vout")
+# stages reported by player events, once per cue
+EVENT_STAGES = ("playing", "vout")
+PERCENTILES = (50, 90, 99, 99.9)
+DEFAULT_INTERVAL = 60.0
+NS_PER_MS = 1000000.0
+
+
+class LatencyTracker(object):
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self._interval = int(interval * 1e9)
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        # receive time of the frame being processed, and of the last cue
+        self._frame_t = None
+        self._cue_t = None
+        self._pending_events = set()
+        self._last_dump = time.monotonic_ns()
+
+    def frame(self, t):
+        """Start tracking the frame received at t.
+
+        :param int t: monotonic_ns receive time
+        """
+        self._frame_t = t
+        if self._interval and t - self._last_dump >= self._interval:
+            self._last_dump = t
+            self.dump()
+
+    def mark(self, stage):
+        """Record the time from the current frame to stage.
+
+        :param str stage: one of STAGES
+        """
+        t = self._frame_t
+        if t is None:
+            return
+        now = time.monotonic_ns()
+        self.histograms[stage].record(now - t)
+        if stage == "player_call":
+            # the player events to come belong to this cue
+            self._cue_t = t
+            self._pending_events = set(EVENT_STAGES)
+
+    def event(self, stage):
+        """Record the time from the last cue to a player event.
+
+        Called from player threads, only the first event of a cue counts.
+
+        :param str stage: one of EVENT_STAGES
+        """
+        t = self._cue_t
+        if t is None or stage not in self._pending_events:
+            return
+        self._pending_events.discard(stage)
+        self.histograms[stage].record(time.monotonic_ns() - t)
+
+    def percentiles(self, percents=PERCENTILES):
+        """Latency percentiles of every stage, in milliseconds.
+
+        :param list percents: increasing percentiles, from 0 to 100
+        :rtype dict
+        """
+        result = {}
+        for stage in STAGES:
+            histogram = self.histograms[stage]
+            values = histogram.percentiles(percents)
+            result[stage] = dict(
+                [("p{:g}".format(percent), value / NS_PER_MS) for percent, value in zip(percents, values)],
+                count=histogram.count, sum=histogram.total / NS_PER_MS, max=histogram.max / NS_PER_MS)
+        return result
+
+    def dump(self):
+        """Log the percentiles of the stages with any sample."""
+        for stage, values in self.percentiles().items():
+            if not values["count"]:
+                continue
+            logger.info("Latency {}: {}".format(stage, " ".join(
+                "{}={:.2f}ms".format(key, value) for key, value in values.items() if key not in ("count", "sum"))
+                + " count={}".format(values["count"])))
+
+    def reset(self):
+        """Forget all recorded latencies."""
+        for histogram in self.histograms.values():
+            histogram.reset()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validated and compiled media config, cached as a binary snapshot.
+
+A media config is checked once when compiled: backend and player options,
+playlist positions, dirs, files and playmodes, and the library folders. Errors are reported all at
+once, instead of as warnings while the playlist is built. Paths are
+resolved at compile time, every playlist entry gets the absolute paths of
+its files.
+
+The compiled config is pickled in a snapshot named after the hash of the
+file contents, the working directory and the home directory, as relative
+and user paths depend on them. Later loads of the same file read the
+snapshot, with no YAML parsing nor merge key resolution. When the snapshot
+is stale the file is parsed with the libyaml loader when available.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['load_media_config', 'compile_media_config', 'MediaConfigError']
+
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import time
+import yaml
+
+from dmx_trigger.config import YAML_LOADER
+from dmx_trigger.media_index import MediaIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "~/.cache/dmx_trigger/media"
+# bump when the compiled format changes, older snapshots are ignored
+SNAPSHOT_VERSION = 1
+PLAYMODES = ("default", "loop", "repeat")
+BACKEND_NAMES = ("vlc", "mpv", "none")
+# player option types, in the section named after the backend
+OPTION_TYPES = {
+    "preload": bool,
+    "probe_workers": int,
+    "probe_cache": str,
+    "prefetch_mb": (int, float),
+    "prefetch_budget_mb": (int, float),
+    "flags": list,
+    "spawn": bool,
+    "binary": str,
+    "socket": str,
+    "connect_timeout": (int, float),
+    "drift_ppm": (int, float),
+}
+
+
+class MediaConfigError(ValueError):
+    """The media config does not validate, errors has all the problems."""
+
+    def __init__(self, filename, errors):
+        self.errors = errors
+        super().__init__("invalid media config '{}':\n  {}".format(filename, "\n  ".join(errors)))
+
+
+def _validate_options(config, errors):
+    """Check the backend and the player options.
+
+    :param dict config: the media config
+    :param list errors: where to add the problems found
+    """
+    backend = config.get("backend", BACKEND_NAMES[0])
+    if backend not in BACKEND_NAMES:
+        errors.append("backend: {} is not one of {}".format(backend, ", ".join(BACKEND_NAMES)))
+    for name in BACKEND_NAMES:
+        options = config.get(name)
+        if options is None:
+            continue
+        if not isinstance(options, dict):
+            errors.append("{}: must be a mapping".format(name))
+            continue
+        for key, value in options.items():
+            expected = OPTION_TYPES.get(key)
+            # a bool is an int too, but never the other way round
+            if expected and (not isinstance(value, expected) or
+                    (isinstance(value, bool) and expected is not bool)):
+                errors.append("{}.{}: {!r} has the wrong type".format(name, key, value))
+        flags = options.get("flags")
+        if isinstance(flags, list):
+            for flag in flags:
+                if not isinstance(flag, str):
+                    errors.append("{}.flags: {!r} is not a string".format(name, flag))
+    if backend == "vlc" and not isinstance(config.get("vlc", {}).get("flags"), list):
+        errors.append("vlc.flags: a list of flags is needed")
+
+
+def _compile_playlist(playlist, errors):
+    """Check the playlist and resolve the paths of its files.
+
+    :param dict playlist: theme number to dir, files and playmode
+    :param list errors: where to add the problems found
+    :rtype dict
+    """
+    compiled = {}
+    if not isinstance(playlist, dict):
+        errors.append("playlist: must be a mapping of theme numbers")
+        return compiled
+    for theme, entry in playlist.items():
+        if not isinstance(theme, int) or not MediaIndex.in_range(theme, 0):
+            errors.append("playlist.{}: theme is not a DMX value".format(theme))
+            continue
+        if not isinstance(entry, dict):
+            errors.append("playlist.{}: must be a mapping".format(theme))
+            continue
+        dir = entry.get("dir")
+        files = entry.get("files")
+        playmode = entry.get("playmode", PLAYMODES[0])
+        if not isinstance(dir, str):
+            errors.append("playlist.{}.dir: a directory is needed".format(theme))
+            continue
+        if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+            errors.append("playlist.{}.files: must be a list of file names".format(theme))
+            continue
+        if not MediaIndex.in_range(theme, len(files) - 1):
+            errors.append("playlist.{}.files: {} files, scenes are out of the DMX range".format(theme, len(files)))
+        if playmode not in PLAYMODES:
+            errors.append("playlist.{}.playmode: {} is not one of {}".format(theme, playmode, ", ".join(PLAYMODES)))
+        dir = os.path.abspath(os.path.expanduser(dir))
+        compiled[theme] = dict(entry, dir=dir, playmode=playmode,
+            paths=[os.path.abspath(os.path.expanduser(os.path.join(dir, f))) for f in files])
+    return compiled
+
+
+def _compile_library(library, errors):
+    """Check the library folders and resolve their paths.
+
+    :param list library: folders, a single one can be given as a mapping
+    :param list errors: where to add the problems found
+    :rtype list
+    """
+    if isinstance(library, dict):
+        library = [library]
+    if not isinstance(library, list):
+        errors.append("library: must be a list of folders")
+        return []
+    compiled = []
+    for i, folder in enumerate(library):
+        if not isinstance(folder, dict) or not isinstance(folder.get("dir"), str):
+            errors.append("library.{}: a mapping with a dir is needed".format(i))
+            continue
+        playmode = folder.get("playmode", PLAYMODES[0])
+        if playmode not in PLAYMODES:
+            errors.append("library.{}.playmode: {} is not one of {}".format(i, playmode, ", ".join(PLAYMODES)))
+        compiled.append(dict(folder, dir=os.path.abspath(os.path.expanduser(folder["dir"])), playmode=playmode))
+    return compiled
+
+
+def compile_media_config(config, filename="<config>"):
+    """Validate a parsed media config and resolve its paths.
+
+    :param dict config: the parsed media config
+    :param str filename: file name for the error messages
+    :rtype dict
+    :raises MediaConfigError: with all the problems found
+    """
+    errors = []
+    if not isinstance(config, dict):
+        raise MediaConfigError(filename, ["must be a mapping"])
+    _validate_options(config, errors)
+    if "playlist" not in config and "library" not in config:
+        errors.append("playlist: missing, and there is no library")
+    compiled = dict(config)
+    if "playlist" in config:
+        compiled["playlist"] = _compile_playlist(config["playlist"], errors)
+    if "library" in config:
+        compiled["library"] = _compile_library(config["library"], errors)
+    if errors:
+        raise MediaConfigError(filename, errors)
+    return compiled
+
+
+def _snapshot_file(filename, data, cache_dir):
+    """Snapshot file name of the contents of filename.
+
+    :param str filename: the media config file
+    :param bytes data: its contents
+    :param str cache_dir: snapshot directory
+    :rtype str
+    """
+    key = hashlib.sha256(data)
+    key.update("\0{}\0{}\0{}".format(SNAPSHOT_VERSION, os.getcwd(), os.path.expanduser("~")).encode())
+    return os.path.join(cache_dir, "{}.{}.pickle".format(os.path.basename(filename), key.hexdigest()[:32]))
+
+
+def _save_snapshot(snapshot, config):
+    """Write the snapshot atomically and remove the stale ones of the file.
+
+    :param str snapshot: snapshot file name
+    :param dict config: the compiled media config
+    """
+    tmp = snapshot + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+    except (IOError, OSError) as e:
+        logger.warning("Media config snapshot {} not saved: {}".format(snapshot, e))
+        return
+    prefix = snapshot.rsplit(".", 2)[0]
+    for stale in glob.glob(glob.escape(prefix) + ".*.pickle"):
+        if stale != snapshot:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_media_config(filename, cache_dir=DEFAULT_CACHE_DIR):
+    """Load a compiled media config, from its snapshot when up to date.
+
+    :param str filename: the media config file
+    :param str cache_dir: snapshot directory, None to always compile
+    :rtype dict
+    :raises MediaConfigError: when the media config does not validate
+    """
+    start = time.monotonic()
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+    except IOError as e:
+        raise Exception("non-existing config file '%s'" % filename)
+    snapshot = _snapshot_file(filename, data, os.path.expanduser(cache_dir)) if cache_dir else None
+    if snapshot:
+        try:
+            with open(snapshot, "rb") as f:
+                config = pickle.load(f)
+            logger.info("Media config {} loaded from snapshot in {:.1f} ms".format(
+                filename, (time.monotonic() - start) * 1000))
+            return config
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Media config snapshot {} not loaded: {}".format(snapshot, e))
+    try:
+        config = yaml.load(data, Loader=YAML_LOADER)
+    except yaml.YAMLError as e:
+        raise yaml.YAMLError("invalid config file '%s': %s" % (filename, e))
+    config = compile_media_config(config, filename)
+    if snapshot:
+        _save_snapshot(snapshot, config)
+    logger.info("Media config {} compiled in {:.1f} ms".format(filename, (time.monotonic() - start) * 1000))
+    return config
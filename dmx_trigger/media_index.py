@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compact index of the media to play, addressed by theme and scene.
+
+Theme and scene come from DMX channels, so both range from 0 to 255. Cues
+are kept in a dict by (theme, scene), as fast to look up as the former dict
+of dicts and smaller at any size, since a dense 256x256 table costs 512 KiB
+even for a few cues and is slower to index from Python. Entries have slots
+and file paths are interned, so that a file used by many cues is stored
+once, and so is its media for each playmode. Paths no cue uses are dropped.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['MediaEntry', 'MediaIndex']
+
+# DMX values range
+DMX_VALUES = 256
+
+
+class MediaEntry(object):
+    """A cue in the media index."""
+    __slots__ = ("file", "playmode", "media", "info")
+
+    def __init__(self, file, playmode, media=None, info=None):
+        self.file = file
+        self.playmode = playmode
+        self.media = media
+        # metadata: duration, codec, width and height
+        self.info = info
+
+    def __repr__(self):
+        return "MediaEntry(file={!r}, playmode={!r})".format(self.file, self.playmode)
+
+
+class MediaIndex(object):
+    """Cues indexed by (theme, scene), both in the DMX values range."""
+
+    def __init__(self):
+        self._index = {}
+        # interned paths, cues using each path and shared media by
+        # (path, playmode)
+        self._files = {}
+        self._file_refs = {}
+        self._media = {}
+        # entries using each shared media
+        self._refs = {}
+
+    @staticmethod
+    def in_range(theme, scene):
+        """Tell whether the cue can be addressed with DMX values.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        :rtype bool
+        """
+        return 0 <= theme < DMX_VALUES and 0 <= scene < DMX_VALUES
+
+    def intern(self, file):
+        """Return the single stored copy of the file path.
+
+        :param str file: full path file name
+        :rtype str
+        """
+        return self._files.setdefault(file, file)
+
+    def _unref_file(self, file):
+        """Drop the interned path once no cue uses it."""
+        refs = self._file_refs[file] - 1
+        if refs:
+            self._file_refs[file] = refs
+        else:
+            del self._file_refs[file]
+            del self._files[file]
+
+    def add(self, theme, scene, file, playmode):
+        """Add or replace a cue.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        :param str file: full path file name
+        :param str playmode: playmode
+        :rtype MediaEntry
+        :raises KeyError: when the cue is out of the DMX values range
+        """
+        if not self.in_range(theme, scene):
+            raise KeyError("Position {}.{} is out of the DMX range".format(theme, scene))
+        file = self.intern(file)
+        self._file_refs[file] = self._file_refs.get(file, 0) + 1
+        previous = self._index.get((theme, scene))
+        if previous is not None:
+            self._unref_file(previous.file)
+        entry = MediaEntry(file, playmode)
+        self._index[theme, scene] = entry
+        return entry
+
+    def remove(self, theme, scene):
+        """Remove a cue and return its entry, None if there was none.
+
+        Its shared media is kept until released, it may be used by other
+        cues.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        :rtype MediaEntry
+        """
+        entry = self._index.pop((theme, scene), None)
+        if entry is not None:
+            self._unref_file(entry.file)
+        return entry
+
+    def shared_media(self, entry, new_media, previous=None):
+        """Get the media shared by all entries with same file and playmode.
+
+        The media of a previous index is adopted when available. Returns the
+        media and whether it has just been created.
+
+        :param MediaEntry entry: the entry to get the media for
+        :param callable new_media: media factory taking file and playmode
+        :param MediaIndex previous: index to take existing media from
+        :rtype tuple
+        """
+        key = (entry.file, entry.playmode)
+        created = False
+        if key not in self._media:
+            if previous is not None and key in previous._media:
+                self._media[key] = previous._media[key]
+            else:
+                self._media[key] = new_media(entry.file, playmode=entry.playmode)
+                created = True
+        entry.media = self._media[key]
+        self._refs[key] = self._refs.get(key, 0) + 1
+        return entry.media, created
+
+    def release_media(self, entry, keep=None):
+        """Release the shared media of an entry removed or replaced.
+
+        Returns the media once no entry uses it, unless the index keep
+        still does, None otherwise.
+
+        :param MediaEntry entry: the entry no longer in the index
+        :param MediaIndex keep: index whose media must be kept
+        :rtype object
+        """
+        key = (entry.file, entry.playmode)
+        if entry.media is None or key not in self._refs:
+            return None
+        self._refs[key] -= 1
+        if self._refs[key]:
+            return None
+        del self._refs[key]
+        media = self._media.pop(key)
+        if keep is not None and keep._media.get(key) is media:
+            return None
+        return media
+
+    def unshared_media(self, other):
+        """Return the media of this index that other does not use.
+
+        :param MediaIndex other: the index to compare with
+        :rtype list
+        """
+        return [media for key, media in self._media.items() if key not in other._media]
+
+    def diff(self, other):
+        """Compare with another index.
+
+        Returns the cues added in other, removed from other and those whose
+        file or playmode has changed.
+
+        :param MediaIndex other: the new index
+        :rtype tuple
+        """
+        added, removed, changed = [], [], []
+        for cue in sorted(self._index.keys() | other._index.keys()):
+            entry, new = self._index.get(cue), other._index.get(cue)
+            if entry is None:
+                added.append(cue)
+            elif new is None:
+                removed.append(cue)
+            elif (entry.file, entry.playmode) != (new.file, new.playmode):
+                changed.append(cue)
+        return added, removed, changed
+
+    def __getitem__(self, cue):
+        return self._index[cue]
+
+    def __contains__(self, cue):
+        try:
+            return cue in self._index
+        except TypeError:
+            return False
+
+    def __len__(self):
+        return len(self._index)
+
+    def items(self):
+        """Iterate over ((theme, scene), entry) in index order."""
+        for cue in sorted(self._index):
+            yield cue, self._index[cue]
+
+    @property
+    def files(self):
+        """Number of unique files."""
+        return len(self._files)
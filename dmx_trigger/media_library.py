@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Media library: cues taken from the names of the files in folder trees.
+
+Instead of listing every file in the media config, cues are found with
+os.scandir in the library folders. The numbers at the start of a file name
+give its theme and scene:
+    003-01-Something_Stupid.mkv     theme 3, scene 1
+    002-Leroy_Brown.mkv             theme 2, scene 0
+A file with a single number in a folder that starts with a number is a
+scene of the theme of the folder:
+    007-Fly_me/02-intro.mkv         theme 7, scene 2
+Only files with a valid extension are considered. When several files give
+the same cue, the first one in alphabetical order is used. Symbolic links
+to folders are followed, each folder is scanned once.
+
+The folders are scanned in a thread, so that a library with tens of
+thousands of files does not delay the start, and then kept up to date with
+inotify: every folder is watched while scanned and only the files and
+folders changed are applied, a full rescan only happens when the kernel
+event queue overflows.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['MediaLibrary', 'parse_cue']
+
+import logging
+import os
+import re
+import threading
+import time
+
+from dmx_trigger.media_index import MediaIndex
+from dmx_trigger.utils.watch import (Inotify, IN_CLOSE_WRITE, IN_MOVED_TO, IN_MOVED_FROM,
+    IN_CREATE, IN_DELETE, IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR)
+
+logger = logging.getLogger(__name__)
+
+# leading numbers of a name, followed by a separator or the extension
+CUE_NAME = re.compile(r"^(\d{1,3})(?:-(\d{1,3}))?(?=[-_ .]|$)")
+# files are added once written, directories as soon as they are created
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+# seconds between checks of the stop request
+WATCH_INTERVAL = 1.0
+
+
+def parse_cue(name, theme=None):
+    """Get the cue of a file name, None if it does not give one.
+
+    :param str name: file name, without the directory
+    :param int theme: theme of the folder of the file, if any
+    :rtype tuple
+    """
+    match = CUE_NAME.match(name)
+    if not match:
+        return None
+    first, second = match.groups()
+    if second is not None:
+        cue = (int(first), int(second))
+    elif theme is not None:
+        cue = (theme, int(first))
+    else:
+        cue = (int(first), 0)
+    return cue if MediaIndex.in_range(*cue) else None
+
+
+class MediaLibrary(object):
+    def __init__(self, dirs, added, removed, file_ext):
+        """
+        :param list dirs: (folder, playmode) of every library folder
+        :param callable added: called with theme, scene, file and playmode
+        :param callable removed: called with theme and scene
+        :param list file_ext: valid extensions
+        """
+        self._dirs = [(os.path.abspath(os.path.expanduser(dir)), playmode) for dir, playmode in dirs]
+        self._added = added
+        self._removed = removed
+        self._file_ext = frozenset(file_ext)
+        self._lock = threading.Lock()
+        # cue to the sorted paths giving it, the first one is used
+        self._cues = {}
+        # path to (cue, playmode)
+        self._paths = {}
+        # watch descriptor to (folder, theme, playmode)
+        self._watches = {}
+        self._inotify = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.scanned = threading.Event()
+
+    def __len__(self):
+        return len(self._cues)
+
+    def _add(self, path, cue, playmode):
+        paths = self._cues.setdefault(cue, [])
+        if path in paths:
+            return
+        paths.append(path)
+        paths.sort()
+        self._paths[path] = (cue, playmode)
+        if paths[0] == path:
+            if len(paths) > 1:
+                logger.warning("Cue {}.{} given by several files, using {}".format(cue[0], cue[1], path))
+            self._added(cue[0], cue[1], path, playmode)
+
+    def _remove(self, path):
+        try:
+            cue, playmode = self._paths.pop(path)
+        except KeyError:
+            return
+        paths = self._cues[cue]
+        first = paths[0] == path
+        paths.remove(path)
+        if not paths:
+            del self._cues[cue]
+            self._removed(*cue)
+        elif first:
+            self._added(cue[0], cue[1], paths[0], self._paths[paths[0]][1])
+
+    def _scan(self, dir, theme, playmode, found, visited):
+        """Add the cues of a folder tree and watch its folders.
+
+        :param str dir: folder
+        :param int theme: theme of the folder, if any
+        :param str playmode: playmode of its cues
+        :param set found: where to add the paths found
+        :param set visited: (device, inode) of the folders scanned
+        """
+        try:
+            stat = os.stat(dir)
+        except OSError as e:
+            logger.warning("Could not scan {}: {}".format(dir, e))
+            return
+        # symbolic links may loop
+        if (stat.st_dev, stat.st_ino) in visited:
+            logger.warning("Folder {} already scanned, skipped".format(dir))
+            return
+        visited.add((stat.st_dev, stat.st_ino))
+        if self._inotify:
+            try:
+                self._watches[self._inotify.add_watch(dir, WATCH_MASK)] = (dir, theme, playmode)
+            except OSError as e:
+                logger.warning("Could not watch {}: {}".format(dir, e))
+        try:
+            entries = list(os.scandir(dir))
+        except OSError as e:
+            logger.warning("Could not scan {}: {}".format(dir, e))
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                folder = CUE_NAME.match(entry.name)
+                self._scan(entry.path, int(folder.group(1)) if folder else theme, playmode, found, visited)
+            elif os.path.splitext(entry.name)[1].lower() in self._file_ext:
+                cue = parse_cue(entry.name, theme)
+                if cue is None:
+                    logger.debug("File {} does not give a cue".format(entry.path))
+                    continue
+                found.add(entry.path)
+                self._add(entry.path, cue, playmode)
+
+    def _sync(self, dir, theme, playmode):
+        """Scan a folder tree and drop the files no longer in it.
+
+        :param str dir: folder
+        :param int theme: theme of the folder, if any
+        :param str playmode: playmode of its cues
+        """
+        found = set()
+        self._scan(dir, theme, playmode, found, set())
+        prefix = os.path.join(dir, "")
+        for path in [p for p in self._paths if p.startswith(prefix) and p not in found]:
+            self._remove(path)
+
+    def _open_inotify(self):
+        """Set up inotify, before scanning so that no change is missed."""
+        if self._inotify is None:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                self._inotify = False
+                logger.warning("Media library changes will not be applied: {}".format(e))
+
+    def scan(self):
+        """Scan all the library folders, watching them as they are found."""
+        self._open_inotify()
+        start = time.monotonic()
+        with self._lock:
+            for dir, playmode in self._dirs:
+                self._sync(dir, None, playmode)
+        self.scanned.set()
+        logger.info("Media library with {} cues from {} files scanned in {:.0f} ms".format(
+            len(self._cues), len(self._paths), (time.monotonic() - start) * 1000))
+
+    def _handle(self, wd, mask, name):
+        """Apply an inotify event.
+
+        :param int wd: watch descriptor
+        :param int mask: event mask
+        :param str name: name of the file or folder in the watched folder
+        """
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if wd not in self._watches:
+            return
+        dir, theme, playmode = self._watches[wd]
+        path = os.path.join(dir, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                folder = CUE_NAME.match(name)
+                self._sync(path, int(folder.group(1)) if folder else theme, playmode)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                prefix = os.path.join(path, "")
+                for stale in [p for p in self._paths if p.startswith(prefix)]:
+                    self._remove(stale)
+                # a folder moved out is still watched, under its new path
+                for stale, (folder, _, _) in list(self._watches.items()):
+                    if folder == path or folder.startswith(prefix):
+                        del self._watches[stale]
+                        if mask & IN_MOVED_FROM:
+                            self._inotify.rm_watch(stale)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self._remove(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            if os.path.splitext(name)[1].lower() not in self._file_ext:
+                return
+            cue = parse_cue(name, theme)
+            if cue is not None:
+                self._add(path, cue, playmode)
+
+    def _run(self, scan):
+        if scan:
+            self.scan()
+        self._open_inotify()
+        if not self._inotify:
+            return
+        while not self._stop.is_set():
+            events = self._inotify.read(WATCH_INTERVAL)
+            with self._lock:
+                for wd, mask, cookie, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("Media library events lost, rescanning")
+                        for dir, playmode in self._dirs:
+                            self._sync(dir, None, playmode)
+                        break
+                    self._handle(wd, mask, name)
+
+    def start(self, scan=True):
+        """Watch the library folders, scanning them first in the thread.
+
+        With scan False, scan must have been called already.
+
+        :param bool scan: whether to scan the folders in the thread
+        """
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, args=(scan,), name="media_library", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the library folders."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
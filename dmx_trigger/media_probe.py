@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate media files and get their metadata in parallel.
+
+Files are checked in a thread pool and parsed by libvlc on its preparser
+threads, as on slow SD cards and network mounts most of the time is spent
+waiting for I/O. libvlc runs a single preparser thread unless the instance
+is created with --preparse-threads, so the pool only parses in parallel
+with as many of them as workers, as the vlc backend does. Results are
+kept in an on-disk cache keyed by path, size and modification time, so that
+warm restarts do not need to parse anything.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['MediaProbe']
+
+import json
+import logging
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import vlc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+# parse timeout in ms
+PARSE_TIMEOUT = 5000
+
+
+class MediaProbe(object):
+    def __init__(self, instance, cache_file=None, workers=DEFAULT_WORKERS, timeout=PARSE_TIMEOUT):
+        self._instance = instance
+        self._cache_file = os.path.abspath(os.path.expanduser(cache_file)) if cache_file else None
+        self._workers = workers
+        self._timeout = timeout
+        self._cache = self._load_cache()
+        self.probed = self.cached = 0
+
+    def _load_cache(self):
+        """Load the probe cache, an empty one if missing or invalid.
+
+        :rtype dict
+        """
+        if not self._cache_file:
+            return {}
+        try:
+            with open(self._cache_file) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            logger.debug("Probe cache {} not loaded: {}".format(self._cache_file, e))
+            return {}
+
+    def _save_cache(self):
+        """Write the probe cache atomically."""
+        if not self._cache_file:
+            return
+        tmp = self._cache_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._cache, f)
+            os.replace(tmp, self._cache_file)
+        except (IOError, OSError) as e:
+            logger.warning("Probe cache {} not saved: {}".format(self._cache_file, e))
+
+    def _parse(self, file):
+        """Parse the file with libvlc and get its metadata.
+
+        Returns None if it could not be parsed.
+
+        :param str file: full path file name
+        :rtype dict
+        """
+        info = {"duration": None, "codec": None, "width": None, "height": None}
+        media = self._instance.media_new(file)
+        parsed = threading.Event()
+        media.event_manager().event_attach(vlc.EventType.MediaParsedChanged, lambda event: parsed.set())
+        media.parse_with_options(vlc.MediaParseFlag.local, self._timeout)
+        if not parsed.wait(self._timeout / 1000):
+            logger.warning("Timeout parsing {}".format(file))
+            return None
+        if media.get_parsed_status() != vlc.MediaParsedStatus.done:
+            logger.warning("Could not parse {}".format(file))
+            return None
+        info["duration"] = media.get_duration()
+        for track in media.tracks_get() or []:
+            if track.type != vlc.TrackType.video:
+                continue
+            # fourcc as a string
+            info["codec"] = track.codec.to_bytes(4, "little").decode("ascii", "replace")
+            try:
+                info["width"] = track.u.video.contents.width
+                info["height"] = track.u.video.contents.height
+            except (AttributeError, ValueError):
+                pass
+            break
+        return info
+
+    def _probe(self, file):
+        """Check that file exists and get its metadata, from cache if possible.
+
+        Returns the metadata, None when the file does not exist, and the
+        cache record if it has been parsed. Files that could not be parsed
+        get empty metadata and are not cached.
+
+        :param str file: full path file name
+        :rtype tuple
+        """
+        try:
+            st = os.stat(file)
+        except OSError:
+            return None, None
+        if not stat.S_ISREG(st.st_mode):
+            return None, None
+        cached = self._cache.get(file)
+        if cached and cached["size"] == st.st_size and cached["mtime"] == st.st_mtime_ns:
+            return cached["info"], None
+        info = self._parse(file)
+        if info is None:
+            return {}, None
+        return info, {"size": st.st_size, "mtime": st.st_mtime_ns, "info": info}
+
+    def probe(self, files):
+        """Probe files in parallel.
+
+        Returns a dict with the metadata of each file, None for missing files.
+
+        :param iterable files: full path file names
+        :rtype dict
+        """
+        start = time.monotonic()
+        files = list(dict.fromkeys(files))
+        infos = {}
+        self.probed = self.cached = 0
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for file, (info, record) in zip(files, executor.map(self._probe, files)):
+                infos[file] = info
+                if record:
+                    self._cache[file] = record
+                    self.probed += 1
+                elif info is not None:
+                    self.cached += 1
+                else:
+                    # forget files that are gone
+                    self._cache.pop(file, None)
+        # keep the cache for the next start
+        if self.probed:
+            self._save_cache()
+        logger.info("Probed {} files in {:.0f} ms: {} parsed, {} cached".format(
+            len(files), (time.monotonic() - start) * 1000, self.probed, self.cached))
+        return infos
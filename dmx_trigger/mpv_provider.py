@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Video provider backend driving mpv through its JSON IPC.
+
+mpv is started idle, with an IPC socket, or an already running mpv is used
+through its socket. Every file of the playlist is appended once to the mpv
+playlist at startup, so a cue is started by its playlist index, without
+loading it from a path. Commands are written to the socket and never wait
+for their reply, the player state is kept up to date from the observed
+properties and the events read by a reader thread.
+
+    https://mpv.io/manual/stable/#json-ipc
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['MPVVideoProvider']
+
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+
+from dmx_trigger.provider import VideoProvider, State, valid_extensions, DEFAULT_RATE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BINARY = "mpv"
+DEFAULT_SOCKET = "/tmp/dmx_trigger-mpv.sock"
+# seconds to wait for the mpv socket
+CONNECT_TIMEOUT = 10.0
+# options needed by the provider, before the configured flags
+MPV_OPTIONS = ["--idle=yes", "--keep-open=always", "--force-window=yes", "--fullscreen"]
+# observed properties, by observer id
+OBSERVED = {1: "pause", 2: "eof-reached", 3: "time-pos"}
+
+
+class MPVVideoProvider(VideoProvider):
+    name = "mpv"
+
+    def __init__(self, media_config=None, file_ext=valid_extensions, volume=0, latency=None):
+        super().__init__(media_config=media_config, file_ext=file_ext, latency=latency)
+        self._volume = volume
+        self._socket_path = os.path.expanduser(self._options.get("socket", DEFAULT_SOCKET))
+        self._process = None
+        self._sock = None
+        self._write_lock = threading.Lock()
+        # file to its index in the mpv playlist
+        self._positions = {}
+        # whether mpv reported the current file paused
+        self._paused = False
+        # last position reported in s, and when
+        self._time_pos = None
+        self._time_pos_t = 0
+        self._connect()
+        self._reader = threading.Thread(target=self._read_loop, name="mpv_reader", daemon=True)
+        self._reader.start()
+        for observer, prop in OBSERVED.items():
+            self._command("observe_property", observer, prop)
+        # indexed access list to file names and properties
+        self._vlclist = self._build_playlist_from_config()
+
+    def _connect(self):
+        """Start mpv unless it is already running, and connect to its socket."""
+        if self._options.get("spawn", True):
+            args = [self._options.get("binary", DEFAULT_BINARY)] + MPV_OPTIONS + [
+                "--input-ipc-server={}".format(self._socket_path),
+                "--volume={}".format(self._volume)] + list(self._options.get("flags", []))
+            logger.debug("mpv command: {}".format(args))
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            self._process = subprocess.Popen(args, stdin=subprocess.DEVNULL)
+        deadline = time.monotonic() + self._options.get("connect_timeout", CONNECT_TIMEOUT)
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._socket_path)
+                break
+            except OSError as e:
+                sock.close()
+                if time.monotonic() > deadline or (self._process and self._process.poll() is not None):
+                    raise RuntimeError("Could not connect to mpv at {}: {}".format(self._socket_path, e))
+                time.sleep(0.05)
+        self._sock = sock
+        logger.info("Connected to mpv at {}".format(self._socket_path))
+
+    def close(self):
+        """Quit mpv if started by us, and stop watching and prefetching."""
+        if self._process:
+            self._command("quit")
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+        if self._process:
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        super().close()
+
+    def _command(self, *args):
+        """Send a command to mpv, without waiting for its reply.
+
+        Returns True if it could be sent, False otherwise.
+
+        :param list args: command name and arguments
+        :rtype bool
+        """
+        data = json.dumps({"command": args}).encode() + b"\n"
+        try:
+            with self._write_lock:
+                self._sock.sendall(data)
+        except OSError as e:
+            logger.error("Could not send mpv command {}: {}".format(args[0], e))
+            return False
+        return True
+
+    def _read_loop(self):
+        """Read the replies and events of mpv until the socket is closed."""
+        for line in self._sock.makefile("rb"):
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                logger.warning("Invalid mpv message: %r", line)
+                continue
+            try:
+                self._on_message(msg)
+            except Exception as e:
+                logger.exception("Error handling mpv message {}: {}".format(msg, e))
+        logger.info("mpv connection closed")
+
+    def _on_message(self, msg):
+        """Update the player state from an mpv event, called from the reader.
+
+        :param dict msg: decoded message
+        """
+        event = msg.get("event")
+        if event is None:
+            if msg.get("error", "success") != "success":
+                logger.warning("mpv command failed: %s", msg["error"])
+        elif event == "property-change":
+            value = msg.get("data")
+            if msg["name"] == "pause":
+                self._paused = bool(value)
+                if self._state.state in (State.Playing, State.Paused):
+                    self._state.state = State.Paused if value else State.Playing
+            elif msg["name"] == "time-pos":
+                self._time_pos, self._time_pos_t = value, time.monotonic_ns()
+            elif msg["name"] == "eof-reached" and value:
+                self._state.state = State.Ended
+                self.end_reached += 1
+        elif event == "start-file":
+            self._state.state = State.Opening
+        elif event == "playback-restart":
+            if self._state.state == State.Opening:
+                self._state.state = State.Paused if self._paused else State.Playing
+                if self.latency:
+                    self.latency.event("playing")
+                self._first_frame()
+        elif event == "end-file" and msg.get("reason") == "error":
+            self._state.state = State.Error
+            self.player_errors += 1
+            logger.warning("mpv could not play file: %s", msg.get("file_error"))
+
+    def _add_entry(self, vlclist, entry, previous=None):
+        """Append every new file to the mpv playlist.
+
+        Files appended for a previous playlist keep their position.
+
+        :param MediaIndex vlclist: the playlist being built
+        :param MediaEntry entry: the new entry
+        :param MediaIndex previous: optional playlist being replaced
+        """
+        if entry.file not in self._positions:
+            self._positions[entry.file] = len(self._positions)
+            self._command("loadfile", entry.file, "append")
+
+    def _play_entry(self, entry):
+        """Start playing entry at the default rate.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :param MediaEntry entry: playlist entry
+        :rtype bool
+        """
+        logger.debug("Play video %s in position %s.%s", entry.file, self.requested_theme, self.requested_scene)
+        loop = "inf" if entry.playmode in ("loop", "repeat") else "no"
+        self._command("set_property", "loop-file", loop)
+        self._set_rate(DEFAULT_RATE)
+        self._state.state = State.Opening
+        if not self._command("playlist-play-index", self._positions[entry.file]):
+            return False
+        if self._paused:
+            self._command("set_property", "pause", False)
+        return True
+
+    def _seek_start(self):
+        """Seek the current media to its start."""
+        self._command("seek", 0, "absolute")
+
+    def _set_rate(self, rate):
+        """Set the play rate and cache it.
+
+        :param float rate: play rate
+        """
+        self._command("set_property", "speed", rate * self._rate_factor)
+        self._state.rate = rate
+
+    def _position(self):
+        """Position of the current media in ms, None when unknown.
+
+        It is extrapolated from the last one reported.
+
+        :rtype float
+        """
+        position = self._time_pos
+        if position is None:
+            return None
+        position *= 1000
+        if self._state.state == State.Playing:
+            position += (time.monotonic_ns() - self._time_pos_t) / 1e6 * self._state.rate * self._rate_factor
+        return position
+
+    def _seek(self, position):
+        """Seek the current media to position.
+
+        :param float position: position in ms
+        """
+        self._command("seek", position / 1000.0, "absolute")
+
+    def _set_pause(self, paused):
+        """Pause or unpause the current media and cache its state.
+
+        The state is set before the property change confirms it, so that
+        another toggle in the meantime starts from it.
+
+        :param bool paused: whether to pause
+        """
+        self._command("set_property", "pause", paused)
+        self._state.state = State.Paused if paused else State.Playing
+
+    def _resume(self):
+        """Play the current media, from the start if it ended."""
+        if self._state.state == State.Ended:
+            self._seek_start()
+            self._state.state = State.Playing
+        self._command("set_property", "pause", False)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Video provider backend without a player.
+
+Every player call is only counted and the player state changes at once, as
+if the player reacted instantly. It runs anywhere, with no display nor
+player library, and is used to check the DMX side of a show and to measure
+its overhead alone. The position of the current cue is simulated, with the
+drift_ppm option as the clock error of the player, to check sync.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['NullVideoProvider']
+
+import logging
+import threading
+import time
+
+from dmx_trigger.provider import VideoProvider, State, valid_extensions, DEFAULT_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class NullVideoProvider(VideoProvider):
+    name = "none"
+
+    def __init__(self, media_config=None, file_ext=valid_extensions, latency=None):
+        super().__init__(media_config=media_config, file_ext=file_ext, latency=latency)
+        # player call name to [count, monotonic_ns of the last call]
+        self.calls = {}
+        # simulated clock error of the player, to test sync
+        self._drift = 1 + self._options.get("drift_ppm", 0) / 1e6
+        # position in ms, and monotonic_ns it was taken while playing
+        self._pos = None
+        self._pos_t = None
+        # ms of media per ms, with the play rate, the sync and the drift
+        self._speed = self._drift
+        # the position is advanced by the control and sync threads
+        self._pos_lock = threading.Lock()
+        self._vlclist = self._build_playlist_from_config()
+
+    def _call(self, name):
+        """Count a player call.
+
+        :param str name: player call
+        """
+        now = time.monotonic_ns()
+        try:
+            call = self.calls[name]
+        except KeyError:
+            call = self.calls[name] = [0, now]
+        call[0] += 1
+        call[1] = now
+
+    def _advance(self, playing):
+        """Bring the position up to now, before a change of rate or state.
+
+        :param bool playing: whether it plays after the change
+        """
+        with self._pos_lock:
+            now = time.monotonic_ns()
+            if self._pos_t is not None:
+                self._pos += (now - self._pos_t) / 1e6 * self._speed
+            self._pos_t = now if playing else None
+
+    def _play_entry(self, entry):
+        """Start playing entry at the default rate.
+
+        :param MediaEntry entry: playlist entry
+        :rtype bool
+        """
+        self._call("play")
+        logger.debug("Play video %s in position %s.%s", entry.file, self.requested_theme, self.requested_scene)
+        self._state.rate = DEFAULT_RATE
+        self._state.state = State.Playing
+        self._speed = DEFAULT_RATE * self._rate_factor * self._drift
+        with self._pos_lock:
+            self._pos, self._pos_t = 0.0, time.monotonic_ns()
+        if self.latency:
+            self.latency.event("playing")
+        self._first_frame()
+        return True
+
+    def _seek_start(self):
+        """Seek the current media to its start."""
+        self._seek(0)
+
+    def _seek(self, position):
+        """Seek the current media to position.
+
+        :param float position: position in ms
+        """
+        self._call("seek")
+        with self._pos_lock:
+            self._pos = position
+            self._pos_t = time.monotonic_ns() if self._state.state == State.Playing else None
+
+    def _position(self):
+        """Position of the current media in ms, None when unknown.
+
+        :rtype float
+        """
+        if self._pos is None:
+            return None
+        self._advance(self._state.state == State.Playing)
+        return self._pos
+
+    def _set_rate(self, rate):
+        """Set the play rate and cache it.
+
+        :param float rate: play rate
+        """
+        self._call("set_rate")
+        if self._pos is not None:
+            self._advance(self._state.state == State.Playing)
+        self._state.rate = rate
+        self._speed = rate * self._rate_factor * self._drift
+
+    def _set_pause(self, paused):
+        """Pause or unpause the current media.
+
+        :param bool paused: whether to pause
+        """
+        self._call("set_pause")
+        if self._pos is not None:
+            self._advance(not paused)
+        self._state.state = State.Paused if paused else State.Playing
+
+    def _resume(self):
+        """Play the current media, from the start if it ended."""
+        self._call("resume")
+        if self._pos is not None:
+            self._advance(True)
+        self._state.state = State.Playing
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Run the video provider in an isolated worker process.
+
+A player hang or crash (bad file, decoder fault) must not take down DMX
+ingestion. ProcessVideoProvider has the same DMX facing API as
+VideoProvider, but it only records the calls of a frame and sends
+them as a batch through a pipe to a worker process that owns the real
+provider. A watchdog restarts the worker when it dies or stops answering
+and restores the cue it played, at its rate and pause state.
+
+Building the provider can take long, probing every file of a big show
+with a cold cache, so the worker says when it is ready. Until then it is
+not pinged, only restarted if it dies or is not ready in startup_timeout,
+and the calls of every frame are dropped: the cue is restored once it is
+ready.
+
+Every batch is acknowledged, so the command round trip time is measured.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['ProcessVideoProvider']
+
+import logging
+import multiprocessing
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# seconds between watchdog checks and without answer to consider it hung
+WATCHDOG_INTERVAL = 1.0
+WATCHDOG_TIMEOUT = 5.0
+# seconds for a worker to build its provider and be ready
+STARTUP_TIMEOUT = 120.0
+# sent by the worker once its provider is built
+READY = "ready"
+# calls whose last value is replayed after a restart, so that the channels
+# are where they were
+RESTORE_CALLS = ("set_theme", "set_scene", "release", "change_delta_rate")
+
+
+def _worker_main(conn, media_file, config_file, watch):
+    """Worker process: execute the batches of calls on a real provider.
+
+    Each message is (sequence, sent time, calls), calls being a list of
+    (method name, args, kwargs). None stops the worker.
+    """
+    from dmx_trigger.config import load_config
+    from dmx_trigger.media_config import load_media_config
+    from dmx_trigger.provider import provider_from_config, State
+
+    # configure logging in this process too
+    if config_file:
+        load_config(config_file)
+    provider = provider_from_config(load_media_config(media_file))
+    if watch:
+        provider.watch(media_file)
+    conn.send(READY)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        seq, sent, calls = msg
+        for name, args, kwargs in calls:
+            try:
+                getattr(provider, name)(*args, **kwargs)
+            except Exception as e:
+                logger.exception("Error executing {}: {}".format(name, e))
+        state = provider.player_state
+        conn.send((seq, sent, provider.current_theme, provider.current_scenee, provider.cues_fired,
+            state.rate, state.state == State.Paused))
+
+
+class ProcessVideoProvider(object):
+    def __init__(self, media_file, config_file=None, watch=False,
+            interval=WATCHDOG_INTERVAL, timeout=WATCHDOG_TIMEOUT, startup_timeout=STARTUP_TIMEOUT):
+        self._media_file = media_file
+        self._config_file = config_file
+        self._watch = watch
+        self._interval = interval
+        self._timeout = timeout
+        self._startup_timeout = startup_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        # batches are sent from the control, watchdog and reader threads
+        self._send_lock = threading.Lock()
+        self._calls = []
+        # last value of the channel calls
+        self._last = {}
+        self._seq = 0
+        # sent time of the oldest unanswered batch
+        self._waiting = {}
+        self._process = self._conn = None
+        # when the worker was started, and when it was ready, None until then
+        self._started = self._ready = None
+        self._stop = threading.Event()
+        # cue, rate and pause state acknowledged by the worker
+        self.current_theme = self.current_scenee = None
+        self.rate = 1.0
+        self.paused = False
+        self.cues_fired = 0
+        # cues fired by former workers
+        self._cues_base = 0
+        self.restarts = 0
+        # round trip times in ms
+        self.rtt_last = self.rtt_max = 0.0
+        self._rtt_total = 0.0
+        self._rtt_count = 0
+
+        self._spawn()
+        self._watchdog = threading.Thread(target=self._watchdog_loop, name="player_watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _spawn(self):
+        """Start a worker process and its answer reader."""
+        conn, child = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, name="player_worker",
+            args=(child, self._media_file, self._config_file, self._watch), daemon=True)
+        process.start()
+        child.close()
+        with self._lock:
+            self._process, self._conn = process, conn
+            self._started, self._ready = time.monotonic(), None
+            self._waiting.clear()
+        threading.Thread(target=self._reader_loop, args=(conn,), name="player_reader", daemon=True).start()
+        logger.info("Player worker {} started".format(process.pid))
+
+    def _reader_loop(self, conn):
+        """Read the answers of a worker until its pipe is closed."""
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg == READY:
+                self._on_ready(conn)
+                continue
+            seq, sent, theme, scene, cues, rate, paused = msg
+            rtt = (time.monotonic() - sent) * 1000
+            self.rtt_last = rtt
+            self.rtt_max = max(self.rtt_max, rtt)
+            self._rtt_total += rtt
+            self._rtt_count += 1
+            self.current_theme, self.current_scenee = theme, scene
+            self.rate, self.paused = rate, paused
+            self.cues_fired = self._cues_base + cues
+            with self._lock:
+                self._waiting.pop(seq, None)
+
+    def _on_ready(self, conn):
+        """Start watching a worker once ready, and restore the cue.
+
+        The channels get their last values, then the cue the former worker
+        acknowledged plays at its rate and pause state, even if released
+        since. A cue requested and released later plays on exec_pending.
+        """
+        with self._lock:
+            if conn is not self._conn:
+                return
+            self._ready = time.monotonic()
+            calls = [(name, (value,), {}) for name, value in self._last.items()]
+        logger.info("Player worker {} ready in {:.1f}s".format(self._process.pid, self._ready - self._started))
+        if self.current_theme is not None:
+            calls.append(("restore", (self.current_theme, self.current_scenee, self.rate, self.paused), {}))
+        if calls:
+            self._send(calls + [("exec_pending", (), {})])
+
+    def _send(self, calls):
+        """Send a batch of calls, dropping it if the worker is gone or not ready."""
+        with self._lock:
+            if self._ready is None:
+                return
+            self._seq += 1
+            seq = self._seq
+            sent = time.monotonic()
+            self._waiting[seq] = sent
+            conn = self._conn
+        try:
+            with self._send_lock:
+                conn.send((seq, sent, calls))
+        except (OSError, ValueError) as e:
+            logger.warning("Player worker not reachable: {}".format(e))
+
+    def _restart(self, reason):
+        """Kill the worker and start a new one, the last cue is restored once ready."""
+        self.restarts += 1
+        logger.error("Restarting player worker ({}), restarts: {}".format(reason, self.restarts))
+        process, conn = self._process, self._conn
+        process.kill()
+        process.join(self._timeout)
+        conn.close()
+        self._cues_base = self.cues_fired
+        self._spawn()
+
+    def _watchdog_loop(self):
+        while not self._stop.wait(self._interval):
+            if not self._process.is_alive():
+                self._restart("exit code {}".format(self._process.exitcode))
+                continue
+            with self._lock:
+                started, ready = self._started, self._ready
+                oldest = min(self._waiting.values(), default=None)
+            now = time.monotonic()
+            if ready is None:
+                if now - started > self._startup_timeout:
+                    self._restart("not ready in {:.1f}s".format(now - started))
+            elif oldest is None:
+                # ping an idle worker
+                self._send([])
+            elif now - oldest > self._timeout:
+                self._restart("no answer in {:.1f}s".format(now - oldest))
+
+    def close(self):
+        """Stop the watchdog and the worker."""
+        self._stop.set()
+        self._watchdog.join()
+        try:
+            with self._send_lock:
+                self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(self._timeout)
+        if self._process.is_alive():
+            self._process.kill()
+
+    def rtt(self):
+        """Return the command round trip times in ms.
+
+        :rtype dict
+        """
+        mean = self._rtt_total / self._rtt_count if self._rtt_count else 0.0
+        return {"last": self.rtt_last, "mean": mean, "max": self.rtt_max, "count": self._rtt_count}
+
+    def status(self):
+        """Return the current cue, as last reported by the worker.
+
+        :rtype dict
+        """
+        return {
+            "theme": self.current_theme,
+            "scene": self.current_scenee,
+            "cues_fired": self.cues_fired,
+            "restarts": self.restarts,
+            "rtt_ms": self.rtt(),
+        }
+
+    def _call(self, name, n, current=None):
+        self._calls.append((name, (n,), {"current": current}))
+        if name in RESTORE_CALLS:
+            # read by the reader thread to restore the cue
+            with self._lock:
+                self._last[name] = n
+
+    def exec_pending(self):
+        """Send the calls of this frame and the pending actions execution.
+
+        :rtype bool
+        """
+        calls, self._calls = self._calls, []
+        calls.append(("exec_pending", (), {}))
+        self._send(calls)
+        return True
+
+    def release(self, n, current=None):
+        self._call("release", n, current=current)
+
+    def set_theme(self, n, current=None):
+        self._call("set_theme", n, current=current)
+
+    def set_scene(self, n, current=None):
+        self._call("set_scene", n, current=current)
+
+    def change_delta_rate(self, n, current=None):
+        self._call("change_delta_rate", n, current=current)
+
+    def reset_rate(self, n, current=None):
+        self._call("reset_rate", n, current=current)
+
+    def rewind(self, n, current=None):
+        self._call("rewind", n, current=current)
+
+    def pause(self, n, current=None):
+        self._call("pause", n, current=current)
+
+    def resume(self, n, current=None):
+        self._call("resume", n, current=current)
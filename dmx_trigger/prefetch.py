@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Warm the page cache with the start of the media likely to be played next.
+
+First frame stalls on slow storage mostly come from cold reads. A background
+thread asks the kernel to read ahead the first megabytes of upcoming files,
+or reads them when fadvise is not available. Prefetched files are kept
+within a memory budget, the least recently used ones are dropped first.
+
+Only the latest request is kept: while a fader sweeps through cues each one
+is asked for, and by the time a file is read the request is stale anyway.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['Prefetcher']
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from dmx_trigger.utils.mailbox import LatestMailbox
+
+logger = logging.getLogger(__name__)
+
+MB = 1024*1024
+DEFAULT_SIZE = 16*MB
+DEFAULT_BUDGET = 256*MB
+READ_CHUNK = MB
+
+
+class Prefetcher(object):
+    def __init__(self, size=DEFAULT_SIZE, budget=DEFAULT_BUDGET):
+        self._size = size
+        self._budget = budget
+        # the latest file to prefetch, older requests are dropped
+        self._mailbox = LatestMailbox()
+        # prefetched files and their prefetched bytes in LRU order
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._used = 0
+        self._thread = None
+        self.hits = self.misses = 0
+        # first frame times in ms, total and count, with and without prefetch
+        self._first_frame = {True: [0.0, 0], False: [0.0, 0]}
+
+    def _advise(self, fd, length, advice):
+        os.posix_fadvise(fd, 0, length, advice)
+
+    def _warm(self, file):
+        """Load the start of file in the page cache.
+
+        :param str file: full path file name
+        :rtype int
+        """
+        with open(file, "rb", buffering=0) as f:
+            length = min(self._size, os.fstat(f.fileno()).st_size)
+            if hasattr(os, "posix_fadvise"):
+                self._advise(f.fileno(), length, os.POSIX_FADV_WILLNEED)
+            else:
+                left = length
+                while left > 0 and f.read(min(READ_CHUNK, left)):
+                    left -= READ_CHUNK
+        return length
+
+    def _evict(self):
+        """Drop least recently used files until within budget."""
+        while self._used > self._budget and len(self._lru) > 1:
+            file, length = self._lru.popitem(last=False)
+            self._used -= length
+            logger.debug("Prefetch evict %s", file)
+            if hasattr(os, "posix_fadvise"):
+                try:
+                    fd = os.open(file, os.O_RDONLY)
+                    try:
+                        self._advise(fd, length, os.POSIX_FADV_DONTNEED)
+                    finally:
+                        os.close(fd)
+                except OSError:
+                    pass
+
+    def _run(self):
+        while True:
+            file = self._mailbox.get()
+            if file is None:
+                break
+            with self._lock:
+                if file in self._lru:
+                    self._lru.move_to_end(file)
+                    continue
+            try:
+                length = self._warm(file)
+            except OSError as e:
+                logger.warning("Could not prefetch {}: {}".format(file, e))
+                continue
+            with self._lock:
+                self._lru[file] = length
+                self._used += length
+                self._evict()
+            logger.debug("Prefetched %s bytes of %s, %s bytes in use", length, file, self._used)
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._mailbox.close()
+        self._thread.join()
+        self._thread = None
+        self._mailbox = LatestMailbox()
+
+    def prefetch(self, file):
+        """Request file to be prefetched instead of any pending one, never
+        blocks. Files already prefetched are only marked as recently used.
+
+        :param str file: full path file name
+        """
+        with self._lock:
+            if file in self._lru:
+                self._lru.move_to_end(file)
+                return
+        self._mailbox.put(file)
+
+    def played(self, file):
+        """Account a file being played and return whether it was prefetched.
+
+        :param str file: full path file name
+        :rtype bool
+        """
+        with self._lock:
+            hit = file in self._lru
+            if hit:
+                self._lru.move_to_end(file)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit
+
+    def first_frame(self, ms, prefetched):
+        """Account the time to first frame of a played file.
+
+        :param float ms: time from play request to first frame
+        :param bool prefetched: whether the file had been prefetched
+        """
+        stats = self._first_frame[prefetched]
+        stats[0] += ms
+        stats[1] += 1
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("First frame in %.0f ms, prefetch hits: %s, misses: %s, mean first frame: %s",
+                ms, self.hits, self.misses, self.mean_first_frame())
+
+    def mean_first_frame(self):
+        """Return the mean time to first frame with and without prefetch.
+
+        :rtype dict
+        """
+        return {"prefetched" if k else "cold": round(total / count, 1) if count else None
+            for k, (total, count) in self._first_frame.items()}
@@ -0,0 +1,768 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+DMX facing video provider, independent of the player used.
+
+VideoProvider receives the DMX callbacks, keeps the requested and current
+cue, builds the playlist index from the media config and applies the
+changes of every frame in exec_pending. Players are driven through a small
+set of methods implemented by each backend:
+    _play_entry   start an entry of the playlist at the default rate
+    _seek_start   seek the current media to its start
+    _set_rate     set the play rate
+    _set_pause    pause or unpause
+    _resume       play the current media, even if it ended
+    _position     position of the current media, for sync leaders
+    _seek         seek the current media, for sync followers
+Backends keep player_state up to date from their player events, and may
+override _can_seek, _anticipate and the playlist hooks. The rate set on
+the player is scaled by _rate_factor, the drift correction of sync
+followers.
+
+Backends are selected with the backend key of the media config: vlc (the
+default), mpv or none (no player, named so as null is YAML for None).
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['VideoProvider', 'PlayerState', 'State', 'provider_from_config']
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+from dmx_trigger.media_config import load_media_config
+from dmx_trigger.media_index import MediaIndex
+from dmx_trigger.media_library import MediaLibrary
+from dmx_trigger.prefetch import Prefetcher, MB
+from dmx_trigger.utils.watch import FileWatcher
+
+logger = logging.getLogger(__name__)
+
+valid_extensions = [".avi", ".gif", ".mkv", ".mov", ".mp4", ".jpg", ".jpeg", ".png"]
+DEFAULT_RATE=1.0
+DELTA_RATE=0.05
+DEFAULT_PLAYMODE="default"
+DEFAULT_BACKEND="vlc"
+# backend name to provider class, imported on use
+BACKENDS = {
+    "vlc": "dmx_trigger.video_provider.VLCVideoProviderDir",
+    "mpv": "dmx_trigger.mpv_provider.MPVVideoProvider",
+    "none": "dmx_trigger.null_provider.NullVideoProvider",
+}
+
+
+class State(object):
+    """Player states, named after the libvlc ones."""
+    NothingSpecial = "NothingSpecial"
+    Opening = "Opening"
+    Buffering = "Buffering"
+    Playing = "Playing"
+    Paused = "Paused"
+    Stopped = "Stopped"
+    Ended = "Ended"
+    Error = "Error"
+
+
+# states in which the media can be paused
+PAUSABLE_STATES = (State.Opening, State.Buffering, State.Playing)
+# states in which rewinding needs to play the media again
+STOPPED_STATES = (State.NothingSpecial, State.Stopped, State.Ended, State.Error)
+
+
+class PlayerState(object):
+    """Player state as reported by the player events.
+
+    Players may have no rate event, the rate is the one last set by us.
+    """
+    __slots__ = ("state", "rate")
+
+    def __init__(self):
+        self.state = State.NothingSpecial
+        self.rate = DEFAULT_RATE
+
+
+def provider_from_config(media_config, **kwargs):
+    """Create the video provider of the backend selected in media_config.
+
+    :param dict media_config: the media configuration
+    :rtype VideoProvider
+    :raises ValueError: when the backend is unknown
+    """
+    name = media_config.get("backend", DEFAULT_BACKEND)
+    try:
+        module, cls = BACKENDS[name].rsplit(".", 1)
+    except KeyError:
+        raise ValueError("Unknown player backend {}, use one of {}".format(name, ", ".join(BACKENDS)))
+    return getattr(importlib.import_module(module), cls)(media_config=media_config, **kwargs)
+
+
+class VideoProvider(object):
+    # media config section with the backend options
+    name = None
+
+    def __init__(self, media_config=None, file_ext=valid_extensions, latency=None):
+        self._media_config = media_config
+        self._options = media_config.get(self.name) or {}
+        self._playlist = media_config.get("playlist") or {}
+        self._vlclist = MediaIndex()
+        # cues found in the library folders, instead of the playlist
+        self._library = None
+        self._file_ext = file_ext
+        self.current_theme = None
+        self.requested_theme = 0
+        self.current_scenee = None
+        self.requested_scene = 0
+        self.current_rate = self.requested_rate = 0
+        self.requested_reset_rate = False
+        self._rewind = False
+        # pause state requested in this frame, None when unchanged
+        self._requested_pause = None
+        self._resume_requested = False
+        self.requested_release = 0
+        self._release = False
+        self.cues_fired = 0
+        # player state kept up to date by the player events
+        self._state = PlayerState()
+        self.end_reached = self.player_errors = self.recoveries = 0
+        self._watcher = None
+        # held by exec_pending, and by the other threads that change the
+        # playlist or call the player, so that they never run in between
+        self._lock = threading.Lock()
+        # warm the page cache with the start of likely next cues
+        self._prefetcher = None
+        self._play_start = None
+        self._play_prefetched = False
+        # optional LatencyTracker, the monitor stamps the frames
+        self.latency = latency
+        # play rate correction of sync followers, and their SyncFollower
+        self._rate_factor = 1.0
+        self.sync = None
+        if self._options.get("prefetch_mb"):
+            self._prefetcher = Prefetcher(size=self._options["prefetch_mb"]*MB,
+                budget=self._options.get("prefetch_budget_mb", 256)*MB)
+            self._prefetcher.start()
+
+    @property
+    def player_state(self):
+        """Cached state of the active player.
+
+        :rtype PlayerState
+        """
+        return self._state
+
+    def close(self):
+        """Stop watching the media config and library, and prefetching."""
+        if self._library:
+            self._library.stop()
+            self._library = None
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+        if self._prefetcher:
+            self._prefetcher.stop()
+
+    def _get_filename(self, theme, scene=0):
+        """Get the full path filename.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        :rtype str
+        """
+        try:
+            return self._vlclist[theme, scene].file
+        except KeyError:
+            msg = "No files in position {}.{}".format(theme, scene)
+            logger.warn(msg)
+            raise Exception(msg)
+
+    def _probe_files(self, files):
+        """Return the metadata of every file, None for missing ones.
+
+        :param iter files: full path file names
+        :rtype dict
+        """
+        return {file: ({} if os.path.isfile(file) else None) for file in files}
+
+    def _add_entry(self, vlclist, entry, previous=None):
+        """Hook called for every entry added to a new playlist.
+
+        :param MediaIndex vlclist: the playlist being built
+        :param MediaEntry entry: the new entry
+        :param MediaIndex previous: optional playlist being replaced
+        """
+
+    def _entry_removed(self, vlclist, cue, entry, previous=None):
+        """Hook called with the lock held when the library removes or
+        replaces an entry of a playlist.
+
+        :param MediaIndex vlclist: the playlist
+        :param tuple cue: (theme, scene) of the entry
+        :param MediaEntry entry: the entry no longer in the playlist
+        :param MediaIndex previous: optional playlist being replaced
+        """
+
+    def _playlist_replaced(self, previous, added, removed, changed):
+        """Hook called once a reloaded playlist is in place.
+
+        :param MediaIndex previous: the former playlist
+        :param list added: cues added
+        :param list removed: cues removed
+        :param list changed: cues changed
+        """
+
+    def _build_playlist_from_config(self, previous = None):
+        """
+        This function is responsible for checking the media list.
+
+        It reads a yaml configuration file and adds all valid entries
+        to the returned playlist. Files are probed in parallel and their
+        metadata kept in the entries.
+
+        :param MediaIndex previous: optional playlist being replaced
+        :rtype MediaIndex
+        """
+        if self._media_config.get("library"):
+            return self._build_playlist_from_library(previous=previous)
+        logger.debug("Check load file list from config")
+        start = time.monotonic()
+        vlclist = MediaIndex()
+        cues = []
+        for p in self._playlist:
+            dir = self._playlist[p]["dir"]
+            files = self._playlist[p]["files"]
+            try:
+                playmode = self._playlist[p]["playmode"]
+            except KeyError:
+                playmode = DEFAULT_PLAYMODE
+            # compiled media configs have the paths resolved already
+            paths = self._playlist[p].get("paths") or (
+                os.path.abspath(os.path.expanduser(os.path.join(dir, f))) for f in files)
+            for (idx, file) in enumerate(paths):
+                if not MediaIndex.in_range(p, idx):
+                    logger.warn("File {} in pos {}.{} is out of the DMX range".format(file, p, idx))
+                else:
+                    cues.append((p, idx, file, playmode))
+
+        # check every unique file only once
+        infos = self._probe_files(file for p, idx, file, playmode in cues)
+        for p, idx, file, playmode in cues:
+            if infos[file] is not None:
+                logger.debug("File {} in pos {}.{} exists".format(file, p, idx))
+                if os.path.splitext(file)[1] not in self._file_ext:
+                    logger.warn("File {} in pos {}.{} does not have a valid extension".format(file, p, idx))
+                entry = vlclist.add(p, idx, file, playmode)
+                entry.info = infos[file]
+                self._add_entry(vlclist, entry, previous=previous)
+                logger.debug("vlclist item {}.{}: {}".format(p, idx, entry))
+            else:
+                logger.warn("File {} in pos {}.{} does not exist".format(file, p, idx))
+        logger.info("Playlist with {} entries built in {:.0f} ms".format(len(vlclist), (time.monotonic() - start) * 1000))
+        return vlclist
+
+    def _build_playlist_from_library(self, previous=None):
+        """Build the playlist from the files found in the library folders.
+
+        At startup the folders are scanned in the library thread and cues
+        are added as they are found, so the playlist is returned at once.
+        On reload they are scanned before returning, so that the playlist
+        is replaced as a whole. Either way the library keeps the playlist
+        up to date with the changes in the folders. The changes run in the
+        library thread, with the lock held.
+
+        :param MediaIndex previous: optional playlist being replaced
+        :rtype MediaIndex
+        """
+        library = self._media_config["library"]
+        if isinstance(library, dict):
+            library = [library]
+        dirs = [(folder["dir"], folder.get("playmode", DEFAULT_PLAYMODE)) for folder in library]
+        vlclist = MediaIndex()
+        # media is reused from the replaced playlist during the first scan only
+        reuse = {"previous": previous}
+
+        def added(theme, scene, file, playmode):
+            with self._lock:
+                old = vlclist.remove(theme, scene)
+                entry = vlclist.add(theme, scene, file, playmode)
+                self._add_entry(vlclist, entry, previous=reuse["previous"])
+                # released once the new entry has taken the media it shares
+                if old is not None:
+                    self._entry_removed(vlclist, (theme, scene), old, previous=reuse["previous"])
+            logger.debug("vlclist item %s.%s: %s", theme, scene, entry)
+
+        def removed(theme, scene):
+            with self._lock:
+                old = vlclist.remove(theme, scene)
+                if old is not None:
+                    self._entry_removed(vlclist, (theme, scene), old, previous=reuse["previous"])
+
+        if self._library:
+            self._library.stop()
+        self._library = MediaLibrary(dirs, added, removed, self._file_ext)
+        if previous is None:
+            self._library.start()
+        else:
+            self._library.scan()
+            reuse["previous"] = None
+            self._library.start(scan=False)
+        return vlclist
+
+    def reload(self, media_config):
+        """Reload the playlist from a new media config.
+
+        Only added, removed or changed entries are applied, the playing cue
+        is not interrupted. Player options need a restart to be applied.
+        The playlist is built in the calling thread, it is only replaced
+        with the lock held, between two exec_pending.
+
+        :param dict media_config: the media configuration
+        """
+        start = time.monotonic()
+        previous = self._vlclist
+        self._media_config = media_config
+        self._playlist = media_config.get("playlist") or {}
+        vlclist = self._build_playlist_from_config(previous=previous)
+        added, removed, changed = previous.diff(vlclist)
+        # the playlist is replaced at once
+        with self._lock:
+            self._vlclist = vlclist
+            self._playlist_replaced(previous, added, removed, changed)
+        logger.info("Media config reloaded in {:.0f} ms: {} added, {} removed, {} changed".format(
+            (time.monotonic() - start) * 1000, len(added), len(removed), len(changed)))
+
+    def watch(self, media_file):
+        """Reload the media config file whenever it changes.
+
+        :param str media_file: the media config file
+        """
+        def reload():
+            try:
+                self.reload(load_media_config(media_file))
+            except Exception as e:
+                logger.error("Could not reload media config {}: {}".format(media_file, e))
+
+        if self._watcher:
+            self._watcher.stop()
+        self._watcher = FileWatcher(media_file, reload)
+        self._watcher.start()
+
+    def _anticipate(self, theme, scene):
+        """Get ready a cue that is likely to be played next.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        """
+        if self._prefetcher and (theme, scene) in self._vlclist:
+            self._prefetcher.prefetch(self._vlclist[theme, scene].file)
+
+    def _played(self, file):
+        """Account the start of a play, to measure time to first frame.
+
+        It is called right before the player call, the cue is only counted
+        as fired once it succeeds.
+
+        :param str file: full path file name
+        """
+        if self.latency:
+            self.latency.mark("player_call")
+        if self._prefetcher:
+            self._play_prefetched = self._prefetcher.played(file)
+            self._play_start = time.monotonic()
+
+    def _first_frame(self):
+        """Account the first frame shown after a play, from player events."""
+        if self.latency:
+            self.latency.event("vout")
+        start = self._play_start
+        if start is None:
+            return
+        self._play_start = None
+        self._prefetcher.first_frame((time.monotonic() - start) * 1000, self._play_prefetched)
+
+    def _play_entry(self, entry):
+        """Start playing entry at the default rate.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :param MediaEntry entry: playlist entry
+        :rtype bool
+        """
+        raise NotImplementedError
+
+    def _seek_start(self):
+        """Seek the current media to its start."""
+        raise NotImplementedError
+
+    def _set_rate(self, rate):
+        """Set the play rate and cache it.
+
+        :param float rate: play rate
+        """
+        raise NotImplementedError
+
+    def _set_pause(self, paused):
+        """Pause or unpause the current media.
+
+        :param bool paused: whether to pause
+        """
+        raise NotImplementedError
+
+    def _resume(self):
+        """Play the current media, from the start if it ended."""
+        raise NotImplementedError
+
+    def _position(self):
+        """Position of the current media in ms, None when unknown.
+
+        :rtype float
+        """
+        return None
+
+    def _seek(self, position):
+        """Seek the current media to position.
+
+        :param float position: position in ms
+        """
+        raise NotImplementedError
+
+    def _can_seek(self):
+        """Tell whether the current media can be seeked.
+
+        :rtype bool
+        """
+        return True
+
+    def _play(self):
+        """Play the requested cue unconditionally.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :rtype bool
+        """
+        # forget rewind when asked to play media
+        self._rewind = False
+        cue = (self.requested_theme, self.requested_scene)
+        logger.debug("Media play requested: %s.%s", *cue)
+        try:
+            entry = self._vlclist[cue]
+        except KeyError:
+            logger.error("No files in position {}.{}".format(*cue))
+            return False
+        self._played(entry.file)
+        if not self._play_entry(entry):
+            return False
+        self.cues_fired += 1
+        # update current video
+        self.current_theme = self.requested_theme
+        self.current_scenee = self.requested_scene
+        self.current_rate = self.requested_rate
+        # the next scene of the theme is the most likely next cue
+        self._anticipate(self.current_theme, self.current_scenee + 1)
+        return True
+
+    def _rewind_media(self):
+        """Rewind the current media.
+
+        Seek in place to the start of the loaded media, reloading it only
+        when it has ended, the player is in error or another cue is
+        requested.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :rtype bool
+        """
+        state = self.player_state.state
+        if (self.requested_theme != self.current_theme or
+            self.requested_scene != self.current_scenee or
+            state in STOPPED_STATES or not self._can_seek()):
+            logger.debug("Rewind by reloading media in state %s", state)
+            return self._play()
+
+        logger.debug("Rewind by seeking media in state %s", state)
+        self._rewind = False
+        self._seek_start()
+        # reset rate as a reload would
+        self._set_rate(DEFAULT_RATE)
+        self.current_rate = self.requested_rate
+        if state == State.Paused:
+            self._resume()
+        return True
+
+    def _apply_rate(self):
+        """Set the rate resulting from the delta change and reset requests.
+
+        Both are folded into a single absolute rate, set only if it differs
+        from the current one. The reset channel comes after the rate one,
+        so a reset wins.
+        """
+        new_rate = rate = self.player_state.rate
+        # change rate
+        if self.current_rate > self.requested_rate:
+            new_rate = rate - DELTA_RATE
+        elif self.current_rate < self.requested_rate:
+            new_rate = rate + DELTA_RATE
+        # update current rate
+        self.current_rate = self.requested_rate
+        if self.requested_reset_rate:
+            new_rate = DEFAULT_RATE
+            self.requested_reset_rate = False
+        if new_rate != rate:
+            self._set_rate(new_rate)
+            logger.info("Rate changed from %f to: %f", rate, new_rate)
+
+    def _apply_pause(self, played):
+        """Bring the player to the requested pause state.
+
+        :param bool played: whether a cue was just started in this frame
+        """
+        paused, self._requested_pause = self._requested_pause, None
+        resume, self._resume_requested = self._resume_requested, False
+        if resume:
+            # a cue just started is already playing
+            if not played and self.player_state.state != State.Playing:
+                self._resume()
+            return
+        if paused is None:
+            return
+        state = State.Playing if played else self.player_state.state
+        if paused and state in PAUSABLE_STATES:
+            self._set_pause(True)
+        elif not paused and state == State.Paused:
+            self._set_pause(False)
+
+    def status(self):
+        """Return the current cue and the player state.
+
+        :rtype dict
+        """
+        state = self.player_state
+        return {
+            "backend": self.name,
+            "theme": self.current_theme,
+            "scene": self.current_scenee,
+            "requested_theme": self.requested_theme,
+            "requested_scene": self.requested_scene,
+            "release": self._release,
+            "rate": state.rate,
+            "state": state.state,
+            "cues_fired": self.cues_fired,
+            "end_reached": self.end_reached,
+            "player_errors": self.player_errors,
+            "recoveries": self.recoveries,
+            "sync": self.sync.status() if self.sync else None,
+        }
+
+    def sync_state(self):
+        """Return the cue, position, rate and whether it plays, for sync.
+
+        Called from the sync thread, the lock is held so that the position
+        is the one of the cue returned.
+
+        :rtype tuple
+        """
+        with self._lock:
+            state = self.player_state
+            return (self.current_theme, self.current_scenee, self._position(), state.rate,
+                state.state == State.Playing)
+
+    def sync_correct(self, cue=None, factor=None, position=None):
+        """Correct the drift from a sync leader.
+
+        Called from the sync thread, the cue is checked with the lock held,
+        so that a correction is never applied to a cue started meanwhile.
+        Returns True if applied, False if the cue is no longer playing.
+
+        :param tuple cue: (theme, scene) the correction is for, None for any
+        :param float factor: play rate correction, 1.0 for none
+        :param float position: position in ms to seek to
+        :rtype bool
+        """
+        with self._lock:
+            if cue is not None and (cue != (self.current_theme, self.current_scenee) or
+                    self.player_state.state != State.Playing):
+                return False
+            if position is not None and self._can_seek():
+                self._seek(position)
+            if factor is not None and factor != self._rate_factor:
+                self._rate_factor = factor
+                self._set_rate(self.player_state.rate)
+            return True
+
+    def exec_pending(self):
+        """Execute the pending actions.
+
+        All the changes of a frame are applied in a single pass, in order:
+        the cue (play or rewind), then the absolute rate, then the pause
+        state. Starting a cue resets the rate, so rate requests of the same
+        frame are folded into it instead of setting a rate that is reset.
+
+        They run with the lock held, so that reloads and the other threads
+        calling the player never interleave with them.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :rtype bool
+        """
+        if self.latency:
+            self.latency.mark("exec_pending")
+        with self._lock:
+            return self._exec_pending()
+
+    def _exec_pending(self):
+        """Execute the pending actions, with the lock held.
+
+        :rtype bool
+        """
+        logger.info("Execute pending actions: release = %s", self._release)
+        result = True
+        played = False
+        # do not consider playing until we have a release
+        # check for new theme and scene or rewind
+        if  (self._release and
+            (self.requested_theme != self.current_theme or
+            self.requested_scene != self.current_scenee)):
+            result = played = self._play()
+         # check for rewind
+        elif self._rewind:
+            result = played = self._rewind_media()
+        # a started or rewound cue has its rate reset already
+        if played:
+            self.requested_reset_rate = False
+        else:
+            self._apply_rate()
+        self._apply_pause(played)
+        # get ready a cue selected before its release
+        if (self.requested_theme != self.current_theme or
+            self.requested_scene != self.current_scenee):
+            self._anticipate(self.requested_theme, self.requested_scene)
+        return result
+
+    def restore(self, theme, scene, rate=DEFAULT_RATE, paused=False):
+        """Play a cue again, at its rate and pause state.
+
+        Used to bring a restarted player back to where the former one was:
+        the cue plays whatever the release, and the requested cue is kept.
+
+        Returns True if all could be executed successfully, False otherwise.
+
+        :param int theme: theme number
+        :param int scene: scene number
+        :param float rate: play rate
+        :param bool paused: whether it was paused
+        :rtype bool
+        """
+        logger.info("Restore requested: %s.%s, rate %s, paused %s", theme, scene, rate, paused)
+        with self._lock:
+            requested = (self.requested_theme, self.requested_scene)
+            self.requested_theme, self.requested_scene = theme, scene
+            try:
+                if not self._play():
+                    return False
+            finally:
+                self.requested_theme, self.requested_scene = requested
+            if rate != DEFAULT_RATE:
+                self._set_rate(rate)
+            if paused:
+                self._set_pause(True)
+            return True
+
+    def release(self, n, current=None):
+        """Allow action to be executed.
+
+        When we move from zero to a positive value, we play the video.
+
+        :param int n: value
+        """
+        logger.info("Release requested: %d", n)
+
+        # When we move from 0 to positive value, it's a release
+        logger.debug("pre: requested_release = %s, release = %s", self.requested_release, self._release)
+        self._release = (n > 0)
+        self.requested_release = n
+        logger.debug("post: requested_release = %s, release = %s", self.requested_release, self._release)
+
+    def set_theme(self, n, current=None):
+        """Set the requested theme.
+
+        Theme and scxene define the media to play.
+
+        :param int n: theme number
+        """
+        logger.info("Theme requested: %d", n)
+        self.requested_theme = n
+
+    def set_scene(self, n, current=None):
+        """Set the requested scene.
+
+        Theme and scxene define the media to play.
+
+        :param int n: scene number
+        """
+        logger.info("Scene requested: %d", n)
+        self.requested_scene = n
+
+    def change_delta_rate(self, n, current=None):
+        """Change delta rate.
+
+        When n increases, increase play rate by DELTA_RATE.
+        When n decreases, decrease play rate by DELTA_RATE.
+
+        :param int n: rate
+        """
+        logger.info("Delta rate change requested: %d", n)
+        self.requested_rate = n
+
+    def reset_rate(self, n, current=None):
+        """Reset rate.
+
+        Set play rate to default.
+
+        :param int n: rate
+        """
+        logger.info("Rate reset requested: %d", n)
+        self.requested_reset_rate = True
+
+    def rewind(self, n, current=None):
+        """Rewind media.
+
+        Rewind only when value changes to 0.
+
+        :param int n: value
+        """
+        logger.info("Video rewind requested %d", n)
+
+        # only rewind when value is zero
+        if n == 0:
+            self._rewind = True
+
+    def pause(self, n, current=None):
+        """Toggle pause.
+
+        Every change of the channel toggles the pause state the player was
+        in, it is applied at the end of the frame.
+
+        :param int n: value
+        """
+        if self._requested_pause is None:
+            self._requested_pause = self.player_state.state != State.Paused
+        else:
+            self._requested_pause = not self._requested_pause
+        self._resume_requested = False
+        if self._requested_pause:
+            logger.info("Video pause requested %d", n)
+        else:
+            logger.info("Video unpause requested %d", n)
+
+    def resume(self, n, current=None):
+        """Resume playing, applied at the end of the frame.
+
+        :param int n: value
+        """
+        logger.info("Video resume requested %d", n)
+        self._requested_pause = None
+        self._resume_requested = True
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Serve the show status and metrics over HTTP.
+
+A small asyncio HTTP server runs its own event loop in a daemon thread. It
+only reads counters and the current cue from the monitors and their video
+providers, it never takes a lock of the ingestion path, so a slow or stuck
+client cannot delay DMX frames.
+
+Routes:
+    /status   JSON with the current cue, rate and player state per output
+    /metrics  Prometheus text format counters and latency percentiles
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['StatusServer']
+
+import asyncio
+import json
+import logging
+import threading
+
+from dmx_trigger.utils.mime import get_content_type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# seconds to wait for a client request
+REQUEST_TIMEOUT = 5.0
+MAX_REQUEST_LINE = 8192
+# path to the document name that gives its content type
+ROUTES = {
+    "/": "status.json",
+    "/status": "status.json",
+    "/metrics": "metrics.txt",
+}
+PROMETHEUS_VERSION = "version=0.0.4"
+METRICS = (
+    ("frames_in_total", "counter", "Changed DMX frames received"),
+    ("frames_coalesced_total", "counter", "Frames overwritten before the control thread processed them"),
+    ("settle_suppressed_total", "counter", "Channel values that changed again before settling"),
+    ("cues_fired_total", "counter", "Cues started on the player"),
+    ("end_reached_total", "counter", "Media played to its end"),
+    ("player_errors_total", "counter", "Player errors reported by the player"),
+    ("recoveries_total", "counter", "Cues restarted after an error or an unexpected end"),
+    ("latency_seconds", "summary", "Time from the DMX frame to each stage of a cue"),
+)
+
+
+class StatusServer(object):
+    def __init__(self, monitors, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._monitors = monitors
+        self._host = host
+        self._port = port
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self.requests = 0
+
+    def start(self):
+        """Start serving in a daemon thread."""
+        if self._thread:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(self._start_server())
+        self._thread = threading.Thread(target=self._loop.run_forever, name="status_server", daemon=True)
+        self._thread.start()
+        logger.info("Status server listening on {}:{}".format(self._host, self.port))
+
+    async def _start_server(self):
+        """Bind the listening socket, within the server loop."""
+        return await asyncio.start_server(self._handle, self._host, self._port)
+
+    def stop(self):
+        """Stop serving and wait for the thread to finish."""
+        if not self._thread:
+            return
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    @property
+    def port(self):
+        """Listening port, useful when started on port 0."""
+        if self._server and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def _handle(self, reader, writer):
+        """Answer a single HTTP request and close the connection."""
+        try:
+            request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            if request is None:
+                return
+            method, path = request
+            self.requests += 1
+            name = ROUTES.get(path.split("?", 1)[0])
+            if method not in ("GET", "HEAD"):
+                status, body, content_type = "405 Method Not Allowed", b"", get_content_type("error.txt")
+            elif name is None:
+                status, body, content_type = "404 Not Found", b"Not found\n", get_content_type("error.txt")
+            else:
+                status, content_type = "200 OK", get_content_type(name)
+                if name == "metrics.txt":
+                    body = self.metrics().encode()
+                    content_type = "{}; {}".format(content_type, PROMETHEUS_VERSION)
+                else:
+                    body = json.dumps(self.status(), indent=2).encode()
+            head = ("HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n"
+                "Connection: close\r\n\r\n").format(status, content_type, len(body)).encode()
+            writer.write(head if method == "HEAD" else head + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug("Status request aborted: {}".format(e))
+        except Exception as e:
+            logger.exception("Error serving status: {}".format(e))
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read the request line and skip the headers.
+
+        :rtype tuple
+        """
+        line = await reader.readline()
+        parts = line.decode("latin-1").split()
+        if len(parts) < 2 or len(line) > MAX_REQUEST_LINE:
+            return None
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+        return parts[0], parts[1]
+
+    def status(self):
+        """Return the status of every output.
+
+        :rtype dict
+        """
+        outputs = []
+        for monitor in self._monitors:
+            provider = monitor.video_provider
+            output = {
+                "universe": monitor.universe,
+                "address": monitor.address,
+                "frames_in": monitor.frames_in,
+                "frames_coalesced": monitor.frames_dropped,
+                "settle_suppressed": monitor.settle_suppressed,
+            }
+            if hasattr(provider, "status"):
+                output.update(provider.status())
+            if monitor.latency:
+                output["latency_ms"] = monitor.latency.percentiles()
+            outputs.append(output)
+        return {"outputs": outputs}
+
+    def metrics(self):
+        """Return the counters in Prometheus text format.
+
+        :rtype str
+        """
+        samples = {name: [] for name, _, _ in METRICS}
+        # sum and count of each summary
+        totals = []
+        for idx, monitor in enumerate(self._monitors):
+            labels = 'output="{}",universe="{}"'.format(idx, monitor.universe)
+            samples["frames_in_total"].append((labels, monitor.frames_in))
+            samples["frames_coalesced_total"].append((labels, monitor.frames_dropped))
+            samples["settle_suppressed_total"].append((labels, monitor.settle_suppressed))
+            for name in ("cues_fired", "end_reached", "player_errors", "recoveries"):
+                samples[name + "_total"].append((labels, getattr(monitor.video_provider, name, 0)))
+            if not monitor.latency:
+                continue
+            for stage, values in monitor.latency.percentiles().items():
+                stage_labels = '{},stage="{}"'.format(labels, stage)
+                for key, value in values.items():
+                    if key.startswith("p"):
+                        quantile = float(key[1:]) / 100
+                        samples["latency_seconds"].append(
+                            ('{},quantile="{:g}"'.format(stage_labels, quantile), value / 1000.0))
+                totals.append((stage_labels, values["sum"] / 1000.0, values["count"]))
+
+        lines = []
+        for name, kind, help in METRICS:
+            lines.append("# HELP dmx_trigger_{} {}".format(name, help))
+            lines.append("# TYPE dmx_trigger_{} {}".format(name, kind))
+            for labels, value in samples[name]:
+                lines.append("dmx_trigger_{}{{{}}} {}".format(name, labels, value))
+            if kind == "summary":
+                for labels, total, count in totals:
+                    lines.append("dmx_trigger_{}_sum{{{}}} {}".format(name, labels, total))
+                    lines.append("dmx_trigger_{}_count{{{}}} {}".format(name, labels, count))
+        return "\n".join(lines) + "\n"
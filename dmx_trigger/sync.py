@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Synchronized playback of several nodes over the local network.
+
+Every node receives the same DMX frames and starts the same cues, but
+players started a few ms apart, or whose clocks run at slightly different
+speeds, drift apart over a long media. A leader node multicasts a beacon
+of each output every interval with its cue, position, rate and monotonic
+clock. Followers playing the same cue correct their own position:
+    - errors under deadband_ms are ignored
+    - errors up to seek_ms are corrected changing the play rate by up to
+      max_adjust, proportional to the error, down to half the deadband
+    - larger errors, like a cue started late, are corrected with a seek
+
+The monotonic clocks of the nodes are unrelated, the offset between them
+is the minimum difference between the receive and send times of the last
+beacons, the one with the least network delay.
+
+Several followers and a leader can run on a single host, use the loopback
+interface:
+    sync:
+        enabled: true
+        role: follower
+        interface: 127.0.0.1
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['SyncLeader', 'SyncFollower', 'sync_from_config']
+
+import collections
+import logging
+import math
+import random
+import socket
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP = "239.255.77.77"
+DEFAULT_PORT = 5571
+DEFAULT_INTERFACE = "0.0.0.0"
+# seconds between beacons
+DEFAULT_INTERVAL = 0.1
+DEFAULT_TTL = 1
+DEFAULT_DEADBAND_MS = 10.0
+DEFAULT_SEEK_MS = 200.0
+# error corrected by the max play rate change in about this many ms
+DEFAULT_CORRECTION_MS = 2000.0
+DEFAULT_MAX_ADJUST = 0.05
+# seconds without corrections after a seek, until the player reports it
+SEEK_HOLDOFF = 0.5
+# smaller play rate changes are not applied
+MIN_FACTOR_CHANGE = 0.001
+# beacons kept to estimate the clock offset
+OFFSET_WINDOW = 50
+# seconds between checks for a stop request
+POLL_INTERVAL = 0.5
+
+MAGIC = b"DXSY"
+VERSION = 1
+# magic, version, stream, node, sequence, send time in ns, theme, scene,
+# flags, rate and position in ms (NaN when unknown)
+BEACON = struct.Struct("!4sBHIIqBBBdd")
+FLAG_PLAYING = 0x01
+
+
+class SyncLeader(object):
+    def __init__(self, provider, stream=0, group=DEFAULT_GROUP, port=DEFAULT_PORT,
+            interface=DEFAULT_INTERFACE, interval=DEFAULT_INTERVAL, ttl=DEFAULT_TTL):
+        """
+        :param VideoProvider provider: the provider of the output
+        :param int stream: number of the output, the same in every node
+        :param str group: multicast group
+        :param int port: UDP port
+        :param str interface: address of the interface to send from
+        :param float interval: seconds between beacons
+        :param int ttl: multicast time to live
+        """
+        self._provider = provider
+        self._stream = stream
+        self._address = (group, port)
+        self._interface = interface
+        self._interval = interval
+        self._ttl = ttl
+        self._node = random.getrandbits(32)
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.beacons = 0
+        provider.sync = self
+
+    def _socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self._ttl)
+        # followers may run in this host
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        if self._interface != DEFAULT_INTERFACE:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self._interface))
+        return sock
+
+    def beacon(self):
+        """Return the beacon of the current provider state.
+
+        :rtype bytes
+        """
+        theme, scene, position, rate, playing = self._provider.sync_state()
+        self._seq = (self._seq + 1) & 0xffffffff
+        return BEACON.pack(MAGIC, VERSION, self._stream, self._node, self._seq, time.monotonic_ns(),
+            theme or 0, scene or 0, FLAG_PLAYING if playing else 0, rate,
+            math.nan if position is None else position)
+
+    def _run(self):
+        sock = self._socket()
+        logger.info("Sync leader of stream {} sending to {}:{}".format(self._stream, *self._address))
+        try:
+            while not self._stop.wait(self._interval):
+                try:
+                    sock.sendto(self.beacon(), self._address)
+                    self.beacons += 1
+                except OSError as e:
+                    logger.warning("Could not send sync beacon: %s", e)
+        finally:
+            sock.close()
+
+    def start(self):
+        """Send beacons in a daemon thread."""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="sync_leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sending beacons."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def status(self):
+        """Return the sync counters.
+
+        :rtype dict
+        """
+        return {"role": "leader", "stream": self._stream, "beacons": self.beacons}
+
+
+class SyncFollower(object):
+    def __init__(self, provider, stream=0, group=DEFAULT_GROUP, port=DEFAULT_PORT,
+            interface=DEFAULT_INTERFACE, deadband_ms=DEFAULT_DEADBAND_MS, seek_ms=DEFAULT_SEEK_MS,
+            correction_ms=DEFAULT_CORRECTION_MS, max_adjust=DEFAULT_MAX_ADJUST):
+        """
+        :param VideoProvider provider: the provider of the output
+        :param int stream: number of the output, the same in every node
+        :param str group: multicast group
+        :param int port: UDP port
+        :param str interface: address of the interface to join the group on
+        :param float deadband_ms: errors ignored
+        :param float seek_ms: errors corrected with a seek
+        :param float correction_ms: error corrected by the max rate change
+        :param float max_adjust: max play rate change, as a fraction
+        """
+        self._provider = provider
+        self._stream = stream
+        self._group = group
+        self._port = port
+        self._interface = interface
+        self._deadband = deadband_ms
+        self._seek = seek_ms
+        self._correction = correction_ms
+        self._max_adjust = max_adjust
+        self._leader = None
+        self._seq = None
+        # receive minus send time of the last beacons
+        self._offsets = collections.deque(maxlen=OFFSET_WINDOW)
+        self._factor = 1.0
+        self._holdoff = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.offset = None
+        self.error = None
+        self.beacons = self.seeks = self.adjustments = 0
+        provider.sync = self
+
+    def _socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # several followers can run in a host
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", self._port))
+        mreq = struct.pack("4s4s", socket.inet_aton(self._group), socket.inet_aton(self._interface))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        return sock
+
+    def _set_factor(self, factor, cue=None):
+        if abs(factor - self._factor) > MIN_FACTOR_CHANGE or (factor == 1.0 and self._factor != 1.0):
+            if self._provider.sync_correct(cue, factor=factor):
+                self._factor = factor
+                self.adjustments += 1
+
+    def handle(self, data, received):
+        """Correct the provider from a beacon.
+
+        :param bytes data: the beacon
+        :param int received: monotonic_ns it was received at
+        """
+        if len(data) != BEACON.size:
+            return
+        (magic, version, stream, node, seq, sent, theme, scene, flags, rate,
+            position) = BEACON.unpack(data)
+        if magic != MAGIC or version != VERSION or stream != self._stream:
+            return
+        if node != self._leader:
+            # another clock, start over
+            logger.info("Following sync leader {:08x} of stream {}".format(node, stream))
+            self._leader = node
+            self._offsets.clear()
+        elif seq <= self._seq:
+            return
+        self._seq = seq
+        self.beacons += 1
+        self._offsets.append(received - sent)
+        self.offset = min(self._offsets)
+
+        provider = self._provider
+        own_theme, own_scene, own_position, _, playing = provider.sync_state()
+        if (not (flags & FLAG_PLAYING and playing) or (theme, scene) != (own_theme, own_scene) or
+                math.isnan(position) or own_position is None):
+            self.error = None
+            self._set_factor(1.0)
+            return
+        now = time.monotonic_ns()
+        if now < self._holdoff:
+            return
+        # leader position now, the beacon was sent at sent + offset in our clock
+        expected = position + (now - sent - self.offset) / 1e6 * rate
+        self.error = error = own_position - expected
+        # the cue may change before the correction, it is checked again then
+        cue = (theme, scene)
+        if abs(error) > self._seek:
+            logger.debug("Sync error %.0f ms, seeking to %.0f ms", error, expected)
+            if provider.sync_correct(cue, factor=1.0, position=expected):
+                self._factor = 1.0
+                self._holdoff = now + int(SEEK_HOLDOFF * 1e9)
+                self.seeks += 1
+        elif abs(error) > (self._deadband / 2 if self._factor != 1.0 else self._deadband):
+            # once correcting, down to half the deadband so as not to stay at its edge
+            adjust = max(-self._max_adjust, min(self._max_adjust, error / self._correction))
+            self._set_factor(1.0 - adjust, cue=cue)
+        else:
+            self._set_factor(1.0)
+
+    def _run(self):
+        sock = self._socket()
+        sock.settimeout(POLL_INTERVAL)
+        buffer = bytearray(BEACON.size + 1)
+        logger.info("Sync follower of stream {} listening to {}:{}".format(self._stream, self._group, self._port))
+        try:
+            while not self._stop.is_set():
+                try:
+                    size = sock.recv_into(buffer)
+                except socket.timeout:
+                    continue
+                try:
+                    self.handle(bytes(buffer[:size]), time.monotonic_ns())
+                except Exception as e:
+                    logger.exception("Error handling sync beacon: {}".format(e))
+        finally:
+            sock.close()
+
+    def start(self):
+        """Follow the leader in a daemon thread."""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="sync_follower", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop following the leader and play at the normal rate."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._set_factor(1.0)
+
+    def status(self):
+        """Return the sync counters.
+
+        :rtype dict
+        """
+        return {
+            "role": "follower",
+            "stream": self._stream,
+            "leader": None if self._leader is None else "{:08x}".format(self._leader),
+            "beacons": self.beacons,
+            "offset_ms": None if self.offset is None else self.offset / 1e6,
+            "error_ms": self.error,
+            "rate_factor": self._factor,
+            "seeks": self.seeks,
+            "adjustments": self.adjustments,
+        }
+
+
+def sync_from_config(config, provider, stream=0):
+    """Create the sync leader or follower of an output, None if disabled.
+
+    :param dict config: sync config, with enabled, role and the options
+    :param VideoProvider provider: the provider of the output
+    :param int stream: number of the output
+    :rtype object
+    """
+    if not config or not config.get("enabled"):
+        return None
+    kwargs = dict(stream=stream, group=config.get("group", DEFAULT_GROUP),
+        port=config.get("port", DEFAULT_PORT), interface=config.get("interface", DEFAULT_INTERFACE))
+    role = config.get("role", "follower")
+    if role == "leader":
+        return SyncLeader(provider, interval=config.get("interval", DEFAULT_INTERVAL),
+            ttl=config.get("ttl", DEFAULT_TTL), **kwargs)
+    if role == "follower":
+        return SyncFollower(provider, deadband_ms=config.get("deadband_ms", DEFAULT_DEADBAND_MS),
+            seek_ms=config.get("seek_ms", DEFAULT_SEEK_MS),
+            correction_ms=config.get("correction_ms", DEFAULT_CORRECTION_MS),
+            max_adjust=config.get("max_adjust", DEFAULT_MAX_ADJUST), **kwargs)
+    raise ValueError("Unknown sync role {}".format(role))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Record DMX frames to a trace file and replay them.
+
+A trace is an append only binary file. After a header, every record is a
+frame that differs from the previous one of its universe, stored as the runs
+of changed slots:
+
+    header:  magic (8 bytes)
+    record:  time ns since start (uint64), universe (uint16),
+             frame length (uint16), number of runs (uint16)
+    run:     first slot (uint16), length (uint16), slot values
+
+Traces are read memory mapped, and replayed as a DMX input at real time,
+at any speed or as fast as possible.
+"""
+
+__author__ = "Pau Aliagas <linuxnow@gmail.com>"
+__copyright__ = "Copyright (c) 2021 Pau Aliagas"
+__license__ = "GPL 3.0"
+__all__ = ['TraceWriter', 'TraceReader', 'TraceInput', 'StubVideoProvider']
+
+import logging
+import mmap
+import struct
+import threading
+import time
+
+from dmx_trigger.dmx_input import DMXInput
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DMXTRC1\0"
+RECORD = struct.Struct("<QHHH")
+RUN = struct.Struct("<HH")
+# unchanged slots shorter than this do not split a run
+RUN_GAP = 4
+# marks every changed slot of a xored frame as 1
+CHANGED = bytes([0] + [1]*255)
+
+
+def _runs(frame, previous):
+    """Return the (start, end) runs of slots of frame that differ from previous.
+
+    The frames are xored as integers and the changed slots, the non zero
+    bytes of the result, are marked with a translate: the runs are then
+    found with a couple of bytes.find per run, all in C.
+    """
+    size = len(frame)
+    common = min(size, len(previous))
+    runs = []
+    if common:
+        changed = (int.from_bytes(frame[:common], "big") ^
+            int.from_bytes(previous[:common], "big")).to_bytes(common, "big").translate(CHANGED)
+        start = changed.find(1)
+        while start >= 0:
+            end = changed.find(0, start)
+            if end < 0:
+                end = common
+            if runs and start - runs[-1][1] <= RUN_GAP:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((start, end))
+            start = changed.find(1, end)
+    # slots past the end of previous are all changed
+    if size > common:
+        if runs and common - runs[-1][1] <= RUN_GAP:
+            runs[-1] = (runs[-1][0], size)
+        else:
+            runs.append((common, size))
+    return runs
+
+
+class TraceWriter(object):
+    """Append frames to a trace file.
+
+    It is meant to be called from the DMX input thread only. The file is
+    not buffered, every record is written at once, so that a crash does not
+    lose the last frames, the ones needed to reproduce it.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, "wb", buffering=0)
+        self._file.write(MAGIC)
+        self._start = time.monotonic_ns()
+        self._frames = {}
+        self.records = 0
+
+    def write(self, universe, frame):
+        """Record a frame.
+
+        :param int universe: universe number
+        :param bytes frame: DMX slot values
+        """
+        previous = self._frames.get(universe, b"")
+        runs = _runs(frame, previous)
+        self._frames[universe] = frame
+        parts = [RECORD.pack(time.monotonic_ns() - self._start, universe, len(frame), len(runs))]
+        for start, end in runs:
+            parts.append(RUN.pack(start, end - start))
+            parts.append(frame[start:end])
+        self._file.write(b"".join(parts))
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+        logger.info("Trace closed with {} records".format(self.records))
+
+
+class TraceReader(object):
+    """Read a trace file memory mapped.
+
+    :raises ValueError: when the file is not a trace
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError("'%s' is not a DMX trace" % filename)
+
+    def __iter__(self):
+        """Iterate over (time ns, universe, frame) tuples."""
+        data = self._map
+        offset = len(MAGIC)
+        frames = {}
+        while offset + RECORD.size <= len(data):
+            t, universe, length, nruns = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            frame = frames.setdefault(universe, bytearray())
+            # frames only grow or shrink at the end
+            if len(frame) < length:
+                frame.extend(bytes(length - len(frame)))
+            else:
+                del frame[length:]
+            for i in range(nruns):
+                start, size = RUN.unpack_from(data, offset)
+                offset += RUN.size
+                frame[start:start + size] = data[offset:offset + size]
+                offset += size
+            yield t, universe, bytes(frame)
+
+    def close(self):
+        self._map.close()
+
+
+class TraceInput(DMXInput):
+    """Replay a trace as a DMX input.
+
+    A speed of 1 replays at real time, 0 as fast as possible.
+    """
+
+    def __init__(self, filename, speed=1.0):
+        super().__init__()
+        self._reader = TraceReader(filename)
+        self._speed = speed
+        self._stop = threading.Event()
+        self.frames = 0
+
+    def _run(self):
+        dispatchers = {universe: self._dispatcher(universe) for universe in self._callbacks}
+        start = time.monotonic_ns()
+        for t, universe, frame in self._reader:
+            if self._stop.is_set():
+                break
+            if self._speed:
+                delay = (start + t / self._speed - time.monotonic_ns()) / 1e9
+                if delay > 0:
+                    time.sleep(delay)
+            if universe in dispatchers:
+                dispatchers[universe](frame)
+                self.frames += 1
+        self._reader.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+class StubVideoProvider(object):
+    """Video provider that counts calls and their time, instead of playing."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        def call(*args, **kwargs):
+            stats = self.calls.setdefault(name, [0, time.monotonic()])
+            stats[0] += 1
+            stats[1] = time.monotonic()
+            return True
+        return call
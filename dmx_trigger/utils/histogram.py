@@ -0,0 +1,112 @@
+# -*- coding: UTF-8 -*-
+"""
+The DMX Trigger latency histogram utility functions
+"""
+
+
+# significant bits kept per power of two, 5 bits is ~3% precision
+SUB_BITS = 5
+# largest value tracked, in nanoseconds roughly a minute
+MAX_BITS = 36
+
+
+class Histogram(object):
+    """Log-linear histogram of non negative integers, HDR style.
+
+    Values below 2**sub_bits are counted exactly, larger ones in buckets
+    that keep sub_bits + 1 significant bits. Recording is an index
+    computation and a list increment, with no allocation. Values above
+    2**max_bits are counted in the last bucket.
+    """
+
+    def __init__(self, sub_bits=SUB_BITS, max_bits=MAX_BITS):
+        self._sub_bits = sub_bits
+        self._sub_count = 1 << sub_bits
+        self._counts = [0]*((max_bits - sub_bits + 1) << sub_bits)
+        self._last = len(self._counts) - 1
+        self.count = 0
+        # exact sum of the recorded values
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        """Bucket index of value.
+
+        :param int value: value to record
+        :rtype int
+        """
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._sub_bits - 1
+        return min((shift << self._sub_bits) + (value >> shift), self._last)
+
+    def _value(self, index):
+        """Middle of the range of values counted in bucket index.
+
+        :param int index: bucket index
+        :rtype int
+        """
+        if index < self._sub_count:
+            return index
+        shift = (index >> self._sub_bits) - 1
+        mantissa = index - (shift << self._sub_bits)
+        return (mantissa << shift) + ((1 << shift) >> 1)
+
+    def record(self, value):
+        """Count a value, negative values are counted as zero.
+
+        :param int value: value to record
+        """
+        if value < 0:
+            value = 0
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Value below which percent of the recorded values fall.
+
+        :param float percent: percentile, from 0 to 100
+        :rtype int
+        """
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * percent / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def percentiles(self, percents):
+        """Several percentiles in a single pass.
+
+        :param list percents: increasing percentiles, from 0 to 100
+        :rtype list
+        """
+        if not self.count:
+            return [0]*len(percents)
+        result = []
+        targets = iter(max(1, int(self.count * percent / 100.0 + 0.5)) for percent in percents)
+        target = next(targets)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            if not count:
+                continue
+            seen += count
+            while target is not None and seen >= target:
+                result.append(min(self._value(index), self.max))
+                target = next(targets, None)
+            if target is None:
+                break
+        return result
+
+    def reset(self):
+        """Forget all recorded values."""
+        self._counts = [0]*len(self._counts)
+        self.count = 0
+        self.total = 0
+        self.max = 0
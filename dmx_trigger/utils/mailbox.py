@@ -0,0 +1,62 @@
+# -*- coding: UTF-8 -*-
+"""
+The DMX Trigger single slot mailbox utility functions
+"""
+
+import threading
+
+
+class LatestMailbox(object):
+    """Single slot mailbox where the latest item wins.
+
+    A producer puts items without ever blocking, a consumer gets the newest
+    one. Items that are overwritten before being consumed are coalesced and
+    counted in dropped.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._full = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Store item, replacing any item that has not been consumed yet.
+
+        :param object item: the item to publish
+        """
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+            self._item = item
+            self._full = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Wait for an item and take it out of the mailbox.
+
+        Returns None on timeout or when the mailbox has been closed.
+
+        :param float timeout: seconds to wait, None to wait forever
+        :rtype object
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._full or self._closed, timeout):
+                return None
+            if not self._full:
+                return None
+            item = self._item
+            self._item = None
+            self._full = False
+            return item
+
+    def close(self):
+        """Wake up any consumer, get returns None once the mailbox is empty."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
@@ -1,11 +1,17 @@
 from logging.config import ConvertingList, ConvertingDict, valid_ident
 from logging.handlers import QueueHandler, QueueListener
-from multiprocessing import Queue
+from collections import deque
+from queue import Empty
 import atexit
+import logging
+import threading
 
 # author
 # https://rob-blackbourn.medium.com/how-to-use-python-logging-queuehandler-with-dictconfig-1e8b1284e27a
 
+# records kept when the listener falls behind
+DEFAULT_MAXSIZE = 10000
+
 
 def _resolve_handlers(l):
     if not isinstance(l, ConvertingList):
@@ -34,12 +40,50 @@ def _resolve_queue(q):
     return result
 
 
+class RingBufferQueue(object):
+    """Bounded in-process queue that drops the oldest item when full.
+
+    Logging must never block nor slow down the caller: putting is an append
+    to a deque under a lock, with no pickling nor pipe. When the listener
+    falls behind, the oldest records are discarded and counted in dropped.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self._items = deque(maxlen=maxsize if maxsize > 0 else None)
+        self._cond = threading.Condition(threading.Lock())
+        self.dropped = 0
+
+    def put_nowait(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def put(self, item, block=True, timeout=None):
+        self.put_nowait(item)
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._items, timeout)
+            if not self._items:
+                raise Empty
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+
 class QueueListenerHandler(QueueHandler):
 
-    def __init__(self, handlers, respect_handler_level=False, auto_run=True, queue=Queue(-1)):
+    def __init__(self, handlers, respect_handler_level=False, auto_run=True, queue=None):
         queue = _resolve_queue(queue)
+        if queue is None:
+            queue = RingBufferQueue()
         super().__init__(queue)
         handlers = _resolve_handlers(handlers)
+        self._handlers = handlers
         self._listener = QueueListener(
             self.queue,
             *handlers,
@@ -48,11 +92,36 @@ class QueueListenerHandler(QueueHandler):
             self.start()
             atexit.register(self.stop)
 
+    @property
+    def dropped(self):
+        """Number of records discarded because the queue was full."""
+        return getattr(self.queue, "dropped", 0)
+
     def start(self):
         self._listener.start()
 
     def stop(self):
+        if self._listener._thread is None:
+            return
         self._listener.stop()
+        if self.dropped:
+            # the listener is gone, tell the handlers directly
+            record = logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "%d log records dropped, the log queue was full", "args": (self.dropped,)})
+            for handler in self._handlers:
+                handler.handle(record)
+
+    def prepare(self, record):
+        """Keep the record as is for in-process queues.
+
+        Records only need to be merged and pickled to cross a process
+        boundary. In process, message formatting is left to the listener
+        thread, away from the caller.
+        """
+        if isinstance(self.queue, RingBufferQueue):
+            return record
+        return super().prepare(record)
 
     def emit(self, record):
         return super().emit(record)
@@ -0,0 +1,199 @@
+# -*- coding: UTF-8 -*-
+"""
+The DMX Trigger file watching utility functions
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify flags and event masks from <sys/inotify.h>
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_EVENT = struct.Struct("iIII")
+_libc = None
+
+
+def _get_libc():
+    """Load libc once, None if it has no inotify support."""
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc
+
+
+class Inotify(object):
+    """Minimal inotify binding.
+
+    :raises OSError: when inotify is not available
+    """
+
+    def __init__(self):
+        libc = _get_libc()
+        if not libc:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path, mask):
+        """Watch path for the events in mask and return the watch descriptor.
+
+        :param str path: file or directory to watch
+        :param int mask: inotify event mask
+        :rtype int
+        :raises OSError: when the path cannot be watched
+        """
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self, timeout=None):
+        """Wait for events and return them as (wd, mask, cookie, name) tuples.
+
+        Returns an empty list on timeout.
+
+        :param float timeout: seconds to wait, None to wait forever
+        :rtype list
+        """
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self._fd, 64*1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class FileWatcher(object):
+    """Call a function in a thread each time a file changes.
+
+    The parent directory is watched with inotify, so that editors replacing
+    the file are noticed too. When inotify is not available the file
+    modification time is polled. Bursts of changes are coalesced waiting
+    for settle seconds without changes.
+    """
+
+    def __init__(self, path, callback, interval=1.0, settle=0.2):
+        self.path = os.path.abspath(path)
+        self._callback = callback
+        self._interval = interval
+        self._settle = settle
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _changed(self):
+        try:
+            self._callback()
+        except Exception as e:
+            logger.exception("Error handling change in {}: {}".format(self.path, e))
+
+    def _watch_inotify(self, inotify):
+        name = os.path.basename(self.path)
+        while not self._stop.is_set():
+            events = inotify.read(self._interval)
+            if not any(n == name for wd, mask, cookie, n in events):
+                continue
+            # wait for the burst of writes to finish
+            while inotify.read(self._settle):
+                pass
+            self._changed()
+
+    def _watch_poll(self):
+        last = self._stat()
+        while not self._stop.wait(self._interval):
+            current = self._stat()
+            if current != last and current is not None:
+                last = current
+                self._changed()
+
+    def _run(self):
+        try:
+            inotify = Inotify()
+        except OSError as e:
+            logger.debug("Polling {}: {}".format(self.path, e))
+            self._watch_poll()
+            return
+        try:
+            # a missing directory or no watches left
+            inotify.add_watch(os.path.dirname(self.path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        except OSError as e:
+            inotify.close()
+            logger.warning("Could not watch {}, polling it: {}".format(self.path, e))
+            self._watch_poll()
+            return
+        logger.debug("Watching {} with inotify".format(self.path))
+        try:
+            self._watch_inotify(inotify)
+        finally:
+            inotify.close()
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="file_watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
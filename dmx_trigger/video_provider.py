@@ -4,6 +4,8 @@
 """
 Create a playlist with videos from a folder sorted alphabetically
 and provide control with classs methods.
+
+This is the VLC backend of VideoProvider.
 """
 
 __author__ = "Pau Aliagas <linuxnow@gmail.com>"
@@ -13,42 +15,73 @@ __all__ = ['VLCVideoProviderDir']
 
 import logging
 import os
+import threading
+import time
 import vlc
 
+from dmx_trigger.media_probe import MediaProbe, DEFAULT_WORKERS
+from dmx_trigger.provider import (VideoProvider, PlayerState, State, valid_extensions,
+    DEFAULT_RATE, DEFAULT_PLAYMODE, STOPPED_STATES)
+from dmx_trigger.utils.mailbox import LatestMailbox
+
 logger = logging.getLogger(__name__)
 
-valid_extensions = [".avi", ".gif", ".mkv", ".mov", ".mp4", ".jpg", ".jpeg", ".png"]
-DEFAULT_RATE=1.0
-DELTA_RATE=0.05
-DEFAULT_PLAYMODE="default"
-
-class VLCVideoProviderDir(object):
-    def __init__(self, media_config=None, file_ext=valid_extensions, volume=0):
-        self._media_config = media_config
-        self._playlist = media_config["playlist"]
-        self._vlclist = {}
-        self._file_ext = file_ext
-        self.current_theme = None
-        self.requested_theme = 0
-        self.current_scenee = None
-        self.requested_scene = 0
-        self.current_rate = self.requested_rate = 0
-        self.requested_reset_rate = False
-        self._rewind = False
-        self.requested_release = 0
-        self._release = False
+# maximum number of repetitions accepted by vlc, used to loop preloaded media
+LOOP_REPEAT=65535
+# player events that set the cached player state
+STATE_EVENTS = (
+    (vlc.EventType.MediaPlayerOpening, State.Opening),
+    (vlc.EventType.MediaPlayerPlaying, State.Playing),
+    (vlc.EventType.MediaPlayerPaused, State.Paused),
+    (vlc.EventType.MediaPlayerStopped, State.Stopped),
+    (vlc.EventType.MediaPlayerEndReached, State.Ended),
+    (vlc.EventType.MediaPlayerEncounteredError, State.Error),
+)
+# attempts to restart a cue in error before giving up
+RECOVERY_RETRIES=3
+
+
+class VLCVideoProviderDir(VideoProvider):
+    name = "vlc"
+
+    def __init__(self, media_config=None, file_ext=valid_extensions, volume=0, latency=None):
+        super().__init__(media_config=media_config, file_ext=file_ext, latency=latency)
         self._volume = volume
+        # preload every cue at startup instead of loading it on each release
+        self._preload = self._options.get("preload", False)
+        self._probe_workers = self._options.get("probe_workers", DEFAULT_WORKERS)
+        # player state kept up to date by libvlc events, by player
+        self._player_state = {}
+        self._recovery_retries = 0
+        # plays started, to tell the cue a player event was about
+        self._plays = 0
+        # recoveries run in their own thread, never in libvlc ones
+        self._recovery = LatestMailbox()
+        # last time reported by the player in ms and monotonic_ns it was
+        # valid at, get_time only changes in coarse steps
+        self._time = None
         self.vlc = {
             "instance": None,
             "player": None,
             "list_player": None,
             "playlist": None,
+            "media_pool": None,
         }
 
         # vlc player
         self._init_vlc()
+        # file checks and metadata, in parallel and cached on disk
+        self._probe = MediaProbe(self.vlc["instance"],
+            cache_file=self._options.get("probe_cache"),
+            workers=self._probe_workers)
         # indexed access list to file names and properties
         self._vlclist = self._build_playlist_from_config()
+        self._attach_events(self.vlc["player"])
+        threading.Thread(target=self._recovery_loop, name="player_recovery", daemon=True).start()
+        if self._preload:
+            self._play_entry = self._play_direct
+        else:
+            self._play_entry = self._play_medialist
 
     def _init_vlc(self):
         """
@@ -59,68 +92,335 @@ class VLCVideoProviderDir(object):
             - A MediaList to load in the MediaListPlayer
         Documentation for these can be found here:
             http://www.olivieraubert.net/vlc/python-ctypes/doc/
+
+        In preload mode there is no MediaListPlayer: a plain MediaPlayer is
+        fed with the preloaded media, kept alive in a MediaList of all cues.
         """
         # vlc media list player
-        flags = self._media_config["vlc"]["flags"]
+        flags = self._options["flags"]
         flags.append("volume={}".format(self._volume))
+        # libvlc parses on its own preparser threads, one by default
+        if not any(flag.startswith("--preparse-threads") for flag in flags):
+            flags.append("--preparse-threads={}".format(self._probe_workers))
         logger.debug("vlc flags: {}".format(flags))
         self.vlc["instance"] = vlc.Instance(flags)
+        if self._preload:
+            self.vlc['player'] = self.vlc['instance'].media_player_new()
+            self.vlc["player"].set_fullscreen(True)
+            self.vlc['media_pool'] = self.vlc['instance'].media_list_new()
+            return
         self.vlc['list_player'] = self.vlc['instance'].media_list_player_new()
         self.vlc['player'] = self.vlc['list_player'].get_media_player()
         self.vlc["player"].set_fullscreen(True)
         self.vlc['playlist'] = self.vlc['instance'].media_list_new()
         self.vlc["list_player"].set_media_list(self.vlc["playlist"])
 
-    def _get_filename(self, theme, scene=0):
-        """Get the full path filename.
+    def close(self):
+        """Stop the recovery thread, watching and prefetching."""
+        self._recovery.close()
+        super().close()
+
+    def _probe_files(self, files):
+        """Probe the files in parallel, with the results cached on disk.
+
+        :param iter files: full path file names
+        :rtype dict
+        """
+        return self._probe.probe(files)
+
+    def _add_entry(self, vlclist, entry, previous=None):
+        """Share a parsed media for every unique file and playmode.
+
+        In preload mode the media is added to the pool, media already in a
+        previous playlist is reused.
+
+        :param MediaIndex vlclist: the playlist being built
+        :param MediaEntry entry: the new entry
+        :param MediaIndex previous: optional playlist to reuse media from
+        """
+        media_list = self.vlc["media_pool"]
+        if media_list is not None:
+            media, created = vlclist.shared_media(entry, self._new_media, previous=previous)
+            if created:
+                # the pool is changed from the watcher and library threads
+                media_list.lock()
+                media_list.add_media(media)
+                media_list.unlock()
+
+    def _entry_removed(self, vlclist, cue, entry, previous=None):
+        """Release the media no longer used.
+
+        :param MediaIndex vlclist: the playlist
+        :param tuple cue: (theme, scene) of the entry
+        :param MediaEntry entry: the entry no longer in the playlist
+        :param MediaIndex previous: optional playlist being replaced
+        """
+        media = vlclist.release_media(entry, keep=previous)
+        if media is not None and self.vlc["media_pool"] is not None:
+            pool = self.vlc["media_pool"]
+            pool.lock()
+            idx = pool.index_of_item(media)
+            if idx >= 0:
+                pool.remove_index(idx)
+            pool.unlock()
+
+    def _playlist_replaced(self, previous, added, removed, changed):
+        """Release the media no longer used.
+
+        :param MediaIndex previous: the former playlist
+        :param list added: cues added
+        :param list removed: cues removed
+        :param list changed: cues changed
+        """
+        if self.vlc["media_pool"] is not None:
+            pool = self.vlc["media_pool"]
+            pool.lock()
+            for media in previous.unshared_media(self._vlclist):
+                idx = pool.index_of_item(media)
+                if idx >= 0:
+                    pool.remove_index(idx)
+            pool.unlock()
+
+    def _new_media(self, file, playmode=DEFAULT_PLAYMODE):
+        """Create and parse a media to be reused.
+
+        Looping is set as a media option, as there is no list player to
+        handle the playmode.
+
+        :param str file: full path file name
+        :param str playmode: playmode
+        :rtype vlc.Media
+        """
+        media = self.vlc['instance'].media_new(file)
+        if playmode in ("loop", "repeat"):
+            media.add_option("input-repeat={}".format(LOOP_REPEAT))
+        # parse asynchronously, local metadata only
+        media.parse_with_options(vlc.MediaParseFlag.local, -1)
+        return media
+
+    def _get_media(self, theme, scene):
+        """Get the preloaded media or create a new one.
 
         :param int theme: theme number
         :param int scene: scene number
-        :rtype str
+        :rtype vlc.Media
+        :raises KeyError: when there is no such cue
         """
-        logger.debug("Get filename in position {}.{}".format(theme, scene))
-        try:
-            logger.debug("vlclist item {}.{}: {}".format(theme, scene, self._vlclist[theme, scene]))
-            return self._vlclist[theme, scene]["file"]
-        except KeyError:
-            msg = "No files in position {}.{}".format(theme, scene)
-            logger.warn(msg)
-            raise Exception(msg)
-
-    def _build_playlist_from_config(self, media_list = None):
+        entry = self._vlclist[theme, scene]
+        if entry.media is not None:
+            return entry.media
+        return self._new_media(entry.file, playmode=entry.playmode)
+
+    def _played(self, file):
+        """Account the start of a play, to measure time to first frame.
+
+        :param str file: full path file name
         """
-        This function is responsible for checking the media list.
+        self._recovery_retries = 0
+        self._plays += 1
+        # a cue starts at 0, it advances once its player is playing
+        self._time = (0, time.monotonic_ns())
+        super()._played(file)
 
-        It reads a yaml configuration file and adds all valid entries
-        to the returned playlist.
+    def _attach_events(self, player):
+        """Keep the cached state of player from its events.
 
-        :rtype dict
+        :param vlc.MediaPlayer player: player
+        """
+        self._player_state[player] = PlayerState()
+        events = player.event_manager()
+        for event_type, state in STATE_EVENTS:
+            events.event_attach(event_type,
+                lambda event, player=player, state=state: self._on_state(player, state))
+        events.event_attach(vlc.EventType.MediaPlayerVout,
+            lambda event, player=player: self._on_vout(player))
+        events.event_attach(vlc.EventType.MediaPlayerTimeChanged,
+            lambda event, player=player: self._on_time(player, event.u.new_time))
+
+    @property
+    def player_state(self):
+        """Cached state of the active player.
+
+        :rtype PlayerState
         """
-        logger.debug("Check load file list from config")
-        vlclist = {}
-        pos = 0
-        for p in self._playlist:
-            dir = self._playlist[p]["dir"]
-            files = self._playlist[p]["files"]
+        return self._player_state[self.vlc["player"]]
+
+    def _set_rate(self, rate):
+        """Set the rate of the active player and cache it.
+
+        :param float rate: play rate
+        """
+        self._rebase_time()
+        self.vlc["player"].set_rate(rate * self._rate_factor)
+        self._player_state[self.vlc["player"]].rate = rate
+
+    def _set_pause(self, paused):
+        """Pause or unpause the active player and cache its state.
+
+        The state is set before the player event confirms it, so that
+        another toggle in the meantime starts from it.
+
+        :param bool paused: whether to pause
+        """
+        self._rebase_time()
+        self.vlc["player"].set_pause(1 if paused else 0)
+        self.player_state.state = State.Paused if paused else State.Playing
+
+    def _resume(self):
+        """Play the active player, from the start if it ended."""
+        if self.player_state.state in STOPPED_STATES:
+            self._time = (0, time.monotonic_ns())
+        else:
+            self._rebase_time()
+        self.vlc["player"].play()
+        self.player_state.state = State.Playing
+
+    def _seek_start(self):
+        """Seek the active player to the start of its media."""
+        self.vlc["player"].set_time(0)
+        self._time = (0, time.monotonic_ns())
+
+    def _extrapolate(self, reported, now):
+        """Position at now from a reported time, advanced while playing.
+
+        No libvlc functions are called, it is used from libvlc threads.
+
+        :param tuple reported: time in ms and monotonic_ns it was valid at
+        :param int now: monotonic_ns
+        :rtype float
+        """
+        position, t = reported
+        state = self.player_state
+        if state.state == State.Playing:
+            position += (now - t) / 1e6 * state.rate * self._rate_factor
+        return position
+
+    def _rebase_time(self):
+        """Extrapolate the position up to now before the state or rate
+        change, so that the time before it is not advanced at the new one.
+        """
+        reported = self._time
+        if reported is not None:
+            now = time.monotonic_ns()
+            self._time = (self._extrapolate(reported, now), now)
+
+    def _position(self):
+        """Position of the media of the active player in ms, None when unknown.
+
+        get_time only changes every few hundred ms, so the position is
+        extrapolated from the last time change event, as mpv does from its
+        last reported time-pos. Before any cue is played get_time is used.
+
+        :rtype float
+        """
+        reported = self._time
+        if reported is None:
+            position = self.vlc["player"].get_time()
+            return position if position >= 0 else None
+        return self._extrapolate(reported, time.monotonic_ns())
+
+    def _seek(self, position):
+        """Seek the active player to position.
+
+        :param float position: position in ms
+        """
+        self.vlc["player"].set_time(int(position))
+        self._time = (position, time.monotonic_ns())
+
+    def _can_seek(self):
+        """Tell whether the media of the active player can be seeked.
+
+        :rtype bool
+        """
+        return self.vlc["player"].is_seekable()
+
+    def _on_state(self, player, state):
+        """Player state event handler, called from a libvlc thread.
+
+        No libvlc functions can be called here, recoveries are handed over
+        to the recovery thread, with the player and the play they are for.
+        """
+        if player is not self.vlc["player"]:
+            self._player_state[player].state = state
+            return
+        if state != self._player_state[player].state:
+            # the position only advances while playing
+            self._rebase_time()
+        self._player_state[player].state = state
+        if state == State.Playing:
+            if self.latency:
+                self.latency.event("playing")
+        elif state == State.Ended:
+            self.end_reached += 1
+            self._recovery.put((state, player, self._plays))
+        elif state == State.Error:
+            self.player_errors += 1
+            self._recovery.put((state, player, self._plays))
+
+    def _recovery_loop(self):
+        """Run the recoveries requested by the player events."""
+        while True:
+            request = self._recovery.get()
+            if request is None:
+                break
             try:
-                playmode = self._playlist[p]["playmode"]
-            except KeyError:
-                playmode = DEFAULT_PLAYMODE
-            for (idx, f) in enumerate(files):
-                # expand user and convert to absolute path
-                file = os.path.abspath(os.path.expanduser(os.path.join(dir, f)))
-                if os.path.isfile(file):
-                    logger.debug("File {} in pos {}.{} exists".format(file, p, idx))
-                    if os.path.splitext(f)[1] not in self._file_ext:
-                        logger.warn("File {} in pos {}.{} does not have a valid extension".format(file, p, idx))
-                    vlclist[p, idx] = {"file": file, "playmode": playmode, "pos": pos}
-                    if media_list:
-                        media_list.add_media(vlc.Media(file))
-                    pos += 1
-                    logger.debug("vlclist item {}.{}: {}".format(p, idx, vlclist[p, idx]))
-                else:
-                    logger.warn("File {} in pos {}.{} does not exist".format(file, p, idx))
-        return vlclist
+                with self._lock:
+                    self._recover(*request)
+            except Exception as e:
+                logger.exception("Error recovering player: {}".format(e))
+
+    def _recover(self, state, player, plays):
+        """Restart the current cue after an error or an unexpected end.
+
+        Clips that are not looped end normally, and the list player loops
+        by itself, so only looped media played directly is restarted on
+        end. A cue in error is retried RECOVERY_RETRIES times.
+
+        It runs with the lock held, so no cue is started meanwhile. Nothing
+        is done if another cue was started since the event.
+
+        :param str state: Ended or Error
+        :param vlc.MediaPlayer player: player of the event
+        :param int plays: plays started at the event
+        """
+        cue = (self.current_theme, self.current_scenee)
+        if (player is not self.vlc["player"] or plays != self._plays or
+                cue not in self._vlclist or self.player_state.state != state):
+            return
+        entry = self._vlclist[cue]
+        if state == State.Ended:
+            if self.vlc["list_player"] is not None or entry.playmode not in ("loop", "repeat"):
+                return
+        else:
+            if self._recovery_retries >= RECOVERY_RETRIES:
+                logger.error("Cue {}.{} keeps failing, giving up: {}".format(cue[0], cue[1], entry.file))
+                return
+            self._recovery_retries += 1
+        self.recoveries += 1
+        self._time = (0, time.monotonic_ns())
+        logger.warning("Restarting cue {}.{} in state {}, recoveries: {}".format(cue[0], cue[1], state, self.recoveries))
+        if self.vlc["list_player"] is not None:
+            self.vlc["list_player"].play_item_at_index(0)
+        else:
+            self.vlc["player"].set_media(self._get_media(*cue))
+            self.vlc["player"].play()
+
+    def _on_time(self, player, position):
+        """Time changed event handler, called from a libvlc thread.
+
+        :param vlc.MediaPlayer player: player of the event
+        :param int position: new time in ms
+        """
+        if player is self.vlc["player"] and position >= 0:
+            self._time = (position, time.monotonic_ns())
+
+    def _on_vout(self, player):
+        """Video output event handler, called from a libvlc thread.
+
+        No libvlc functions can be called here.
+        """
+        if player is self.vlc["player"]:
+            self._first_frame()
 
     def _load_media(self, file, playmode=DEFAULT_PLAYMODE):
         """Loads media
@@ -131,7 +431,7 @@ class VLCVideoProviderDir(object):
 
         :rtype bool
         """
-        logger.debug("Video load requested: {}".format(file))
+        logger.debug("Video load requested: %s", file)
 
         # check that file exists
         if not os.path.isfile(file):
@@ -144,43 +444,6 @@ class VLCVideoProviderDir(object):
         self.vlc["player"].set_media(media)
         return True
 
-    def _play_media(self):
-        """Play media unconditionally.
-
-        Loads and plays the requested media, resetting all the properties that
-        need not be executed.
-
-        Returns True if all could be executed successfully, False otherwise.
-
-        :rtype bool
-        """
-        logger.debug("Media play requested: {}.{}".format(self.requested_theme, self.requested_scene))
-        # forget rewind when asked to play media
-        self._rewind = False
-        try:
-            file = self._get_filename(self.requested_theme, scene=self.requested_scene)
-            playmode = self._vlclist[self.requested_theme, self.requested_scene]["playmode"]
-        except:
-            msg = "Error getting file name in position {}.{}".format(self.requested_theme, self.requested_scene)
-            logger.error(msg)
-            return False
-
-        # load_media
-        if self._load_media(file, playmode=playmode):
-            # update current video
-            self.current_theme = self.requested_theme
-            self.current_scenee = self.requested_scene
-            self.current_rate = self.requested_rate
-            # reset rate
-            self.vlc["player"].set_rate(DEFAULT_RATE)
-            # start playing video
-            logger.debug("Play video {} in position {}.{}".format(file, self.requested_theme, self.requested_scene))
-            self.vlc["player"].play()
-            return True
-        else:
-            logger.debug("Could not start video {} in position {}.{}".format(file, self.requested_theme, self.requested_scene))
-            return False
-
     def _load_medialist(self, file, playmode=DEFAULT_PLAYMODE):
         """Loads media
 
@@ -190,7 +453,7 @@ class VLCVideoProviderDir(object):
 
         :rtype bool
         """
-        logger.debug("Media list load requested: {}, playmode = {}".format(file, playmode))
+        logger.debug("Media list load requested: %s, playmode = %s", file, playmode)
 
         # check that file exists
         if not os.path.isfile(file):
@@ -218,165 +481,46 @@ class VLCVideoProviderDir(object):
 
         return True
 
-    def _play_medialist(self):
+    def _play_medialist(self, entry):
         """Play media unconditionally from playlist.
 
-        Loads and plays the requested media, resetting all the properties that
-        need not be executed.
+        Loads the entry as the only item of the playlist and plays it with
+        the list player, which handles the playmode.
 
         Returns True if all could be executed successfully, False otherwise.
 
+        :param MediaEntry entry: playlist entry
         :rtype bool
         """
-        # forget rewind when asked to play media
-        self._rewind = False
-        logger.debug("Media play requested: {}.{}".format(self.requested_theme, self.requested_scene))
-        try:
-            pos = self._vlclist[self.requested_theme, self.requested_scene]["pos"]
-            file = self._get_filename(self.requested_theme, scene=self.requested_scene)
-            playmode = self._vlclist[self.requested_theme, self.requested_scene]["playmode"]
-            logger.debug("Media play requested: {}.{} is in playlist position {}".format(self.requested_theme, self.requested_scene, pos))
-        except:
-            msg = "Error getting file name in position {}.{}".format(self.requested_theme, self.requested_scene)
-            logger.error(msg)
-            return False
-
         # load_media
-        if self._load_medialist(file, playmode=playmode):
-            # update current video
-            self.current_theme = self.requested_theme
-            self.current_scenee = self.requested_scene
-            self.current_rate = self.requested_rate
-            # reset rate
-            self.vlc["player"].set_rate(DEFAULT_RATE)
-            # start playing video
-            logger.debug("Play video {} in position {}.{}".format(file, self.requested_theme, self.requested_scene))
-            # we play the file in position 0
-            self.vlc["list_player"].play_item_at_index(0)
-            return True
-        else:
-            logger.debug("Could not start video {} in position {}.{}".format(file, self.requested_theme, self.requested_scene))
+        if not self._load_medialist(entry.file, playmode=entry.playmode):
+            logger.debug("Could not start video %s in position %s.%s", entry.file, self.requested_theme, self.requested_scene)
             return False
-
-    def _change_delta_rate(self):
-        """Execute the delta rate change.
-        """
-        logger.debug("Change delta rate")
-        new_rate = rate = self.vlc["player"].get_rate()
-        # change rate
-        if self.current_rate > self.requested_rate:
-            new_rate = rate - DELTA_RATE
-        elif self.current_rate < self.requested_rate:
-            new_rate = rate + DELTA_RATE
-        self.vlc["player"].set_rate(new_rate)
-        # update current rate
-        self.current_rate = self.requested_rate
-
-        logger.info("Delta rate changed from {:f} to: {:f}".format(rate, new_rate))
-
-    def exec_pending(self):
-        """Execute the pending actions.
-
-        Returns True if all could be executed successfully, False otherwise.
-
-        :rtype bool
-        """
-        logger.info("Execute pending actions: release = {}".format(self._release))
-        # do not consider playing until we have a release
-        # check for new theme and scene or rewind
-        if  (self._release and
-            (self.requested_theme != self.current_theme or
-            self.requested_scene != self.current_scenee)):
-            return self._play_medialist()
-         # check for rewind
-        elif self._rewind:
-            return self._play_medialist()
-        # check for rate reset
-        elif self.requested_reset_rate:
-            # update current rate
-            self.vlc["player"].set_rate(DEFAULT_RATE)
-            self.requested_reset_rate = False
-        # check for rate change
-        elif self.requested_rate != self.current_rate:
-            self._change_delta_rate()
+        # reset rate
+        self._set_rate(DEFAULT_RATE)
+        # start playing video
+        logger.debug("Play video %s in position %s.%s", entry.file, self.requested_theme, self.requested_scene)
+        # we play the file in position 0
+        self.vlc["list_player"].play_item_at_index(0)
         return True
 
-    def release(self, n, current=None):
-        """Allow action to be executed.
-
-        When we move from zero to a positive value, we play the video.
-
-        :param int n: value
-        """
-        logger.info("Release requested: {:d}".format(n))
-
-        # When we move from 0 to positive value, it's a release
-        logger.debug("pre: requested_release = {}, release = {}".format(self.requested_release, self._release))
-        self._release = (n > 0)
-        self.requested_release = n
-        logger.debug("post: requested_release = {}, release = {}".format(self.requested_release, self._release))
-
-    def set_theme(self, n, current=None):
-        """Set the requested theme.
+    def _play_direct(self, entry):
+        """Play media on the media player unconditionally.
 
-        Theme and scxene define the media to play.
-
-        :param int n: theme number
-        """
-        logger.info("Theme requested: {:d}".format(n))
-        self.requested_theme = n
+        Preloaded media was created and parsed at startup, so there is
+        neither allocation nor filesystem access.
 
-    def set_scene(self, n, current=None):
-        """Set the requested scene.
-
-        Theme and scxene define the media to play.
-
-        :param int n: scene number
-        """
-        logger.info("Scene requested: {:d}".format(n))
-        self.requested_scene = n
-
-    def change_delta_rate(self, n, current=None):
-        """Change delta rate.
-
-        When n increases, increase play rate by DELTA_RATE.
-        When n decreases, decrease play rate by DELTA_RATE.
-
-        :param int n: rate
-        """
-        logger.info("Delta rate change requested: {:d}".format(n))
-        self.requested_rate = n
-
-    def reset_rate(self, n, current=None):
-        """Reset rate.
-
-        Set play rate to default.
-
-        :param int n: rate
-        """
-        logger.info("Rate reset requested: {:d}".format(n))
-        self.requested_reset_rate = True
-
-    def rewind(self, n, current=None):
-        """Rewind media.
-
-        Rewind only when value changes to 0.
+        Returns True if all could be executed successfully, False otherwise.
 
-        :param int n: value
+        :param MediaEntry entry: playlist entry
+        :rtype bool
         """
-        logger.info("Video rewind requested {:d}".format(n))
-
-        # only rewind when value is zero
-        if n == 0:
-            self._rewind = True
-
-    def pause(self, n, current=None):
-        if self.vlc["player"].is_playing():
-            logger.info("Video pause requested {:d}".format(n))
-        else:
-            logger.info("Video unpause requested {:d}".format(n))
-        self.vlc["player"].pause()
-
-    def resume(self, n, current=None):
-        logger.info("Video resume requested {:d}".format(n))
+        media = entry.media
+        if media is None:
+            media = self._new_media(entry.file, playmode=entry.playmode)
+        self.vlc["player"].set_media(media)
+        # reset rate
+        self._set_rate(DEFAULT_RATE)
+        # start playing video
         self.vlc["player"].play()
+        return True